@@ -1,10 +1,13 @@
-from flask import Flask, render_template, redirect, jsonify, request, url_for, send_from_directory, abort
+from flask import Flask, Response, render_template, redirect, jsonify, request, url_for, send_from_directory, abort, current_app, g, has_request_context
+import hmac
+import json
+import math
 import os
+import random
+import threading
+import time
 import logging
 
-# Import db from models to avoid circular imports
-from models import db
-
 # Import configuration
 from config import config
 
@@ -13,6 +16,15 @@ from sentiment.emojis import emojis
 
 # Initialize sentiment model lazily when needed
 _sentiment_model = None
+# Swaps in a new model when model.h5 changes (SENTIMENT_HOT_RELOAD)
+_model_registry = None
+# Open /sentiment/api/stream sessions in this process
+_stream_hub = None
+# Profilers of this process (PROFILE_SAMPLER, PROFILE_REQUEST_RATE)
+_stack_sampler = None
+_request_profiler = None
+# Only one /debug/profile capture runs at a time per process
+_capture_lock = threading.Lock()
 
 # Plain text used for curl requests on the about and index pages
 ABOUT_TEXT = """
@@ -27,14 +39,17 @@ can reach me at 619.724.3800 or ericransomkramer@gmail.com.
 
 
 def get_sentiment_model():
-    global _sentiment_model
+    global _sentiment_model, _model_registry
     if _sentiment_model is None:
         # Import here to avoid circular imports
         from sentiment.ml import SentimentModel
+        from sentiment.metrics import metrics, phase
         try:
-            _sentiment_model = SentimentModel()
+            with phase("load"):
+                _sentiment_model = SentimentModel()
         except Exception as e:
             logging.warning(f"Error initializing sentiment model: {e}")
+            metrics.inc("sentiment_model_fallbacks_total", labels=(("kind", "dummy"),))
             # Use a fallback dummy model in case of errors
             try:
                 _sentiment_model = SentimentModel(model="dummy")
@@ -42,9 +57,223 @@ def get_sentiment_model():
                 # Handle case where the model has been mocked in tests
                 # and doesn't accept arguments
                 _sentiment_model = SentimentModel()
+
+        # Mocked models in tests don't support the serving options
+        if hasattr(_sentiment_model, "enable_cache"):
+            configure_sentiment_model(_sentiment_model, current_app.config)
+
+        # Only a model that was read from model.h5 can be reloaded from it
+        if current_app.config.get('SENTIMENT_HOT_RELOAD') and getattr(_sentiment_model, "from_file", False):
+            from sentiment.registry import ModelRegistry
+            app = current_app._get_current_object()
+            _model_registry = ModelRegistry(
+                _sentiment_model, lambda: load_sentiment_model(app),
+                watch_path=_sentiment_model.model_path,
+                check_interval=current_app.config['SENTIMENT_RELOAD_INTERVAL'],
+            )
+
+    if _model_registry is not None:
+        _sentiment_model = _model_registry.current()
+    if has_request_context():
+        # Reported in X-Model-Version for the model this request actually used
+        g.sentiment_model_version = getattr(_sentiment_model, "version", None)
     return _sentiment_model
 
 
+def load_sentiment_model(app):
+    """Build, configure and warm a new model from model.h5 for a hot reload."""
+    with app.app_context():
+        from sentiment.ml import SentimentModel
+        model = SentimentModel()
+        if not model.from_file:
+            raise RuntimeError(f"Could not load {model.model_path}")
+        configure_sentiment_model(model, app.config)
+        model.warm_up()
+        return model
+
+
+def preload_sentiment_model(app):
+    """Load, baseline and warm up the sentiment model before traffic arrives."""
+    with app.app_context():
+        start = time.perf_counter()
+        import sentiment.ml  # noqa: F401
+        import_time = time.perf_counter() - start
+
+        model = get_sentiment_model()
+        timings = dict(getattr(model, "timings", {}))
+        if hasattr(model, "warm_up"):
+            model.warm_up()
+            timings = dict(model.timings)
+
+        app.logger.info(
+            "Sentiment model ready in %.3fs (import %.3fs, load %.3fs, "
+            "baseline %.3fs, warmup %.3fs)",
+            time.perf_counter() - start, import_time,
+            timings.get("load", 0.0), timings.get("baseline", 0.0),
+            timings.get("warmup", 0.0),
+        )
+        return model
+
+
+# Decimal places a client may round scores to; more than float32 holds is noise
+MAX_SCORE_PRECISION = 10
+
+
+def parse_top_k(value):
+    """A requested ``top_k`` (None, an int or a numeric string) as ``(top_k, error)``.
+
+    ``error`` is a message for a 400 response, or None.
+    """
+    if value is None:
+        return None, None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None, "top_k must be an integer"
+    try:
+        top_k = int(value)
+    except ValueError:
+        return None, "top_k must be an integer"
+    if top_k < 1:
+        return top_k, "top_k must be at least 1"
+    return top_k, None
+
+
+def score_format_options():
+    """Response format, top-k and rounding requested for a scoring call.
+
+    Returns ``(fmt, top_k, precision, error)``; ``error`` is a message for a
+    400 response, or None.
+    """
+    from sentiment.serializers import negotiate
+    fmt = negotiate(request.args.get("format"), request.headers.get("Accept"))
+    top_k, top_k_error = parse_top_k(request.args.get("top_k"))
+    precision = request.args.get("precision", type=int)
+    if fmt is None:
+        return fmt, top_k, precision, "Unknown format"
+    if top_k_error:
+        return fmt, top_k, precision, top_k_error
+    if precision is not None and not 0 <= precision <= MAX_SCORE_PRECISION:
+        return fmt, top_k, precision, f"precision must be between 0 and {MAX_SCORE_PRECISION}"
+    if precision is not None and fmt != "array":
+        # dict, f16 and msgpack send the scores unrounded
+        return fmt, top_k, precision, "precision only applies to format=array"
+    return fmt, top_k, precision, None
+
+
+def encoded_scores_response(model, texts, fmt, top_k=None, precision=None, single=True):
+    """Score ``texts`` and encode them with ``sentiment.serializers``."""
+    from sentiment.metrics import phase
+    from sentiment.serializers import encode_scores
+    if texts:
+        scores, sentiment = model.score_arrays(texts)
+    else:
+        # Nothing to predict; running the model on zero rows fails and counts as an error
+        import numpy as np
+        scores, sentiment = np.zeros((0, len(emojis)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    try:
+        with phase("serialize"):
+            body, mimetype = encode_scores(scores, sentiment, fmt, top_k=top_k,
+                                           precision=precision, single=single)
+    except ImportError:
+        return jsonify({"error": f"The {fmt} format is not available on this server"}), 406
+    return Response(body, mimetype=mimetype)
+
+
+def sentiment_metric_samples():
+    """``/metrics`` samples for counters kept by the model's serving components."""
+    model = _sentiment_model
+    samples = []
+    if model is None:
+        return samples
+
+    def counters(prefix, stats, names, kind="counter"):
+        samples.extend((f"{prefix}_{name}", kind, (), stats[name]) for name in names)
+
+    cache = getattr(model, "cache", None)
+    if cache is not None:
+        counters("sentiment_cache", cache.stats(),
+                 ("hits", "misses", "evictions", "expirations", "invalidations"))
+    flight = getattr(model, "flight", None)
+    if flight is not None:
+        counters("sentiment_coalescing", flight.stats(), ("leaders", "coalesced"))
+    scheduler = getattr(model, "scheduler", None)
+    if scheduler is not None:
+        counters("sentiment_batching", scheduler.stats(), ("batches", "items"))
+    prefix_cache = getattr(getattr(model, "_model", None), "prefix_cache", None)
+    if prefix_cache is not None:
+        counters("sentiment_prefix_cache", prefix_cache.stats(), ("hits", "misses"))
+    if _stream_hub is not None:
+        counters("sentiment_streams", _stream_hub.stats(), ("open",), kind="gauge")
+    if _model_registry is not None:
+        counters("sentiment_model", _model_registry.stats(), ("reloads",))
+    samples.append(("sentiment_model_info", "gauge",
+                    (("baseline", getattr(model, "baseline_source", None) or "unknown"),
+                     ("version", getattr(model, "version", None) or "none")), 1))
+    return samples
+
+
+def get_stack_sampler(app):
+    """This worker's continuous stack sampler, started on first use after a fork."""
+    global _stack_sampler
+    if _stack_sampler is None or _stack_sampler._pid != os.getpid():
+        from profiling import StackSampler, profile_dir
+        path = os.path.join(profile_dir(app), f"worker-{os.getpid()}.folded")
+        _stack_sampler = StackSampler(interval=app.config['PROFILE_SAMPLE_INTERVAL'],
+                                      dump_path=path,
+                                      dump_interval=app.config['PROFILE_DUMP_INTERVAL'])
+        _stack_sampler.start()
+    return _stack_sampler
+
+
+def get_request_profiler(app):
+    global _request_profiler
+    if _request_profiler is None:
+        from profiling import RequestProfiler, profile_dir
+        _request_profiler = RequestProfiler(os.path.join(profile_dir(app), f"requests-{os.getpid()}.prof"))
+    return _request_profiler
+
+
+def cached_page(key, render, vary=()):
+    """Serve the page ``key`` from the page cache, or ``render()`` it if caching is off."""
+    cache = current_app.extensions.get("page_cache")
+    if cache is None:
+        return render()
+    return cache.serve(key, render, vary=vary)
+
+
+def wants_plain_text():
+    return "curl" in request.headers.get("User-Agent", "").lower()
+
+
+def get_stream_hub():
+    global _stream_hub
+    if _stream_hub is None:
+        from sentiment.streaming import StreamHub
+        _stream_hub = StreamHub(max_sessions=current_app.config['SENTIMENT_STREAM_MAX_SESSIONS'])
+    return _stream_hub
+
+
+def configure_sentiment_model(model, cfg):
+    """Apply the batching, threading, coalescing and caching options from the app config."""
+    if cfg.get('SENTIMENT_BATCHING'):
+        model.enable_batching(
+            max_batch_size=cfg['SENTIMENT_BATCH_MAX_SIZE'],
+            max_wait=cfg['SENTIMENT_BATCH_MAX_WAIT_MS'] / 1000.0,
+        )
+    elif cfg.get('SENTIMENT_INFERENCE_THREAD'):
+        model.enable_inference_thread()
+    if cfg.get('SENTIMENT_COALESCE'):
+        model.enable_coalescing()
+    if cfg.get('SENTIMENT_PREFIX_CACHE_SIZE', 0) > 0:
+        model.enable_prefix_cache(maxsize=cfg['SENTIMENT_PREFIX_CACHE_SIZE'],
+                                  window=cfg['SENTIMENT_PREFIX_WINDOW'])
+    if cfg.get('SENTIMENT_CACHE_SIZE', 0) > 0:
+        model.enable_cache(
+            maxsize=cfg['SENTIMENT_CACHE_SIZE'],
+            ttl=cfg.get('SENTIMENT_CACHE_TTL') or None,
+            watch_path=model.model_path,
+        )
+
+
 def create_app(config_name="default"):
     # Create Flask application
     # Define static folder as the root static folder with a static_url_path of /static
@@ -109,35 +338,90 @@ def create_app(config_name="default"):
     except OSError:
         pass
 
-    # Initialize extensions
-    db.init_app(app)
+    # Emit emoji keys as UTF-8 rather than \uXXXX surrogate-pair escapes
+    app.json.ensure_ascii = False
 
-    # Initialize SQLAlchemy within app context
-    with app.app_context():
-        # Only attempt to configure SQLite connection if not in production
-        if config_name != "production":
-            try:
-                # Set text_factory for SQLite connections
-                db.engine.raw_connection().text_factory = str
-            except Exception as e:
-                app.logger.warning(f"Could not set SQLite text_factory: {e}")
+    # Pages that render the same bytes for every request are rendered once;
+    # compiled templates are kept on disk so a new worker skips recompiling them
+    if app.config['PAGE_CACHE']:
+        from pagecache import PageCache
+        app.extensions['page_cache'] = PageCache(app)
+    if app.config['JINJA_BYTECODE_CACHE']:
+        from jinja2 import FileSystemBytecodeCache
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+    # Initialize extensions. No route reads the database, so with LAZY_DATABASE
+    # SQLAlchemy isn't even imported until a command calls models.get_db()
+    if not app.config['LAZY_DATABASE']:
+        from models import init_db
+        init_db(app)
 
     # Register all routes
     register_routes(app)
 
+    # Serve fingerprinted static files once `flask assets build` has run
+    import assets
+    if app.config.get('ASSET_MANIFEST'):
+        assets.init_app(app)
+    app.extensions['static_index'] = assets.StaticIndex(
+        app.static_folder, check_interval=app.config['STATIC_INDEX_INTERVAL'])
+
+    # Register `flask sentiment ...` maintenance commands
+    from sentiment.cli import sentiment_cli
+    app.cli.add_command(sentiment_cli)
+    app.cli.add_command(assets.assets_cli)
+
     return app
 
 
 def register_routes(app):
     """Register all application routes"""
 
+    @app.before_request
+    def start_request_trace():
+        from sentiment.metrics import start_trace
+        start_trace()
+
+    @app.before_request
+    def start_profiling():
+        if app.config.get('PROFILE_SAMPLER'):
+            get_stack_sampler(app)
+        rate = app.config.get('PROFILE_REQUEST_RATE')
+        if rate and random.random() < rate:
+            g.request_profile = get_request_profiler(app).begin()
+
+    # Teardown also runs when the view raised, so the profiler is always disabled
+    @app.teardown_request
+    def finish_profiling(exc):
+        profile = g.pop("request_profile", None)
+        if profile is not None:
+            get_request_profiler(app).end(profile)
+
+    @app.after_request
+    def record_request_metrics(response):
+        from sentiment.metrics import end_trace, metrics
+        trace = end_trace()
+        if trace is None:
+            return response
+        total = trace.elapsed()
+        metrics.record(trace, request.endpoint or "unmatched", total)
+        if app.config.get('SERVER_TIMING'):
+            response.headers["Server-Timing"] = trace.server_timing(total)
+        return response
+
+    @app.after_request
+    def add_model_version(response):
+        version = g.pop("sentiment_model_version", None)
+        if version:
+            response.headers["X-Model-Version"] = version
+        return response
+
     # Main site routes
     @app.route("/")
     def index():
-        user_agent = request.headers.get("User-Agent", "").lower()
-        if "curl" in user_agent:
-            return ABOUT_TEXT
-        return render_template("index.html")
+        if wants_plain_text():
+            return cached_page("about.txt", lambda: ABOUT_TEXT, vary=("User-Agent",))
+        return cached_page("index.html", lambda: render_template("index.html"), vary=("User-Agent",))
 
     # Serve the favicon for browsers that request /favicon.ico
     @app.route("/favicon.ico")
@@ -159,32 +443,36 @@ def register_routes(app):
 
     @app.route("/contact")
     def contact():
-        return render_template("contact.html")
+        return cached_page("contact.html", lambda: render_template("contact.html"))
 
     @app.route("/demos")
     def demos():
-        return render_template("demos.html")
+        return cached_page("demos.html", lambda: render_template("demos.html"))
 
     @app.route("/about")
     def about():
-        user_agent = request.headers.get("User-Agent", "").lower()
-        if "curl" in user_agent:
+        if wants_plain_text():
             # Plain text version for curl requests
-            return ABOUT_TEXT
-        else:
-            return render_template("about.html")
+            return cached_page("about.txt", lambda: ABOUT_TEXT, vary=("User-Agent",))
+        return cached_page("about.html", lambda: render_template("about.html"), vary=("User-Agent",))
 
     @app.route("/asteroids")
     def asteroids():
-        return render_template("asteroids.html")
+        return cached_page("asteroids.html", lambda: render_template("asteroids.html"))
 
     @app.route("/phone")
     def phone():
-        return render_template("phone.html")
+        return cached_page("phone.html", lambda: render_template("phone.html"))
 
     @app.route("/email")
     def email():
-        return render_template("email.html")
+        return cached_page("email.html", lambda: render_template("email.html"))
+
+    # App Engine calls this before routing traffic to a new instance
+    @app.route("/_ah/warmup")
+    def warmup():
+        preload_sentiment_model(app)
+        return "", 200
 
     @app.route("/resume")
     def resume():
@@ -195,135 +483,252 @@ def register_routes(app):
     # Sentiment analysis routes
     @app.route("/sentiment")
     def sentiment_index():
-        return render_template("sentiment.html")
+        return cached_page("sentiment.html", lambda: render_template("sentiment.html"))
 
     @app.route("/sentiment/api/score", methods=["POST"])
     def sentiment_score():
-        text = request.form["text"]
+        from sentiment.metrics import phase
+        with phase("parse"):
+            text = request.form["text"]
+            fmt, top_k, precision, error = score_format_options()
+        if error:
+            return jsonify({"error": error}), 400
+
+        model = get_sentiment_model()
+        if fmt == "dict" and not top_k:
+            res = model.score(text)
+            with phase("serialize"):
+                return jsonify(res)
+        if fmt == "dict":
+            res = model.score(text, top_k=top_k)
+            # Top-k dicts are ranked best first, which jsonify's key sorting would undo
+            with phase("serialize"):
+                return Response(json.dumps(res, ensure_ascii=False), mimetype="application/json")
+        return encoded_scores_response(model, [text], fmt, top_k, precision)
+
+    # Emoji vocabulary that positional score formats index into
+    @app.route("/sentiment/api/emojis")
+    def sentiment_emojis():
+        from sentiment.serializers import VOCABULARY_VERSION, vocabulary
+        response = jsonify(vocabulary())
+        response.set_etag(VOCABULARY_VERSION)
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
+
+    @app.route("/sentiment/api/score_batch", methods=["POST"])
+    def sentiment_score_batch():
+        from sentiment.metrics import phase
+        with phase("parse"):
+            payload = request.get_json(silent=True)
+        # Accept either a bare JSON array or {"texts": [...]}
+        if isinstance(payload, dict):
+            payload = payload.get("texts")
+        if not isinstance(payload, list) or not all(isinstance(t, str) for t in payload):
+            return jsonify({"error": "Expected a JSON array of strings"}), 400
+
+        max_texts = app.config['SENTIMENT_MAX_BATCH_TEXTS']
+        if len(payload) > max_texts:
+            return jsonify({"error": f"At most {max_texts} texts per request"}), 413
+
+        fmt, top_k, precision, error = score_format_options()
+        if error:
+            return jsonify({"error": error}), 400
+
         model = get_sentiment_model()
-        res = model.score(text)
-        return jsonify(res)
+        if fmt == "dict" and not top_k:
+            res = model.score_batch(payload)
+            with phase("serialize"):
+                return jsonify(res)
+        if fmt == "dict":
+            res = model.score_batch(payload, top_k=top_k)
+            with phase("serialize"):
+                return Response(json.dumps(res, ensure_ascii=False), mimetype="application/json")
+        return encoded_scores_response(model, payload, fmt, top_k, precision, single=False)
+
+    @app.route("/sentiment/api/stream")
+    def sentiment_stream():
+        from sentiment.streaming import event_stream
+
+        if not app.config['SENTIMENT_STREAM']:
+            abort(404)
+        top_k, error = parse_top_k(request.args.get("top_k"))
+        if error:
+            return jsonify({"error": error}), 400
+        if top_k is None:
+            top_k = app.config['SENTIMENT_STREAM_TOP_K']
+        delta = request.args.get("delta", "").lower() in ("1", "true", "yes")
+
+        hub = get_stream_hub()
+        session = hub.open()
+        if session is None:
+            # Clients fall back to plain /sentiment/api/score requests
+            return jsonify({"error": "Too many open streams"}), 503
+
+        model = get_sentiment_model()
+        response = Response(
+            event_stream(hub, session, model.score, top_k=top_k, delta=delta,
+                         lifetime=app.config['SENTIMENT_STREAM_LIFETIME'],
+                         heartbeat=app.config['SENTIMENT_STREAM_HEARTBEAT']),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Also frees the session if the stream is never iterated
+        response.call_on_close(lambda: hub.close(session))
+        return response
+
+    @app.route("/sentiment/api/stream/<session_id>", methods=["POST"])
+    def sentiment_stream_update(session_id):
+        if not app.config['SENTIMENT_STREAM']:
+            abort(404)
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = request.form
+        elif not isinstance(payload, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        text = payload.get("text")
+        if not isinstance(text, str):
+            return jsonify({"error": "Expected text"}), 400
+        try:
+            seq = int(payload["seq"]) if payload.get("seq") is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "seq must be an integer"}), 400
+        top_k, error = parse_top_k(payload.get("top_k"))
+        if error:
+            return jsonify({"error": error}), 400
+        if top_k is None:
+            top_k = app.config['SENTIMENT_STREAM_TOP_K']
+
+        session = get_stream_hub().get(session_id)
+        if session is None:
+            # The stream lives in another worker (or has ended): answer directly
+            from sentiment.streaming import build_frame
+            frame, _ = build_frame(seq, get_sentiment_model().score(text), top_k=top_k)
+            return jsonify(frame)
+
+        session.push(text, seq)
+        return "", 202
+
+    # Sample this worker's threads for ?seconds=N and return a folded flamegraph profile
+    @app.route("/debug/profile", methods=["POST"])
+    def debug_profile():
+        token = app.config.get('PROFILE_TOKEN')
+        if not token:
+            abort(404)
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(403)
+        # The capture sleeps on this request's thread, which it leaves out of the
+        # samples; a single-threaded worker has nothing else running to profile
+        if not request.environ.get("wsgi.multithread"):
+            return jsonify({"error": "Profiling needs a threaded worker (GUNICORN_THREADS > 1)"}), 503
+
+        max_seconds = app.config['PROFILE_MAX_SECONDS']
+        try:
+            seconds = float(request.args.get("seconds", min(10.0, max_seconds)))
+            interval = float(request.args.get("interval", 0.005))
+        except ValueError:
+            return jsonify({"error": "seconds and interval must be numbers"}), 400
+        # Comparisons are False for NaN, so it fails both checks
+        if not 0 < seconds <= max_seconds:
+            return jsonify({"error": f"seconds must be above 0 and at most {max_seconds:g}"}), 400
+        if not 0.001 <= interval < math.inf:
+            return jsonify({"error": "interval must be at least 0.001"}), 400
+        if not _capture_lock.acquire(blocking=False):
+            return jsonify({"error": "A capture is already running"}), 409
+        try:
+            from profiling import capture, profile_dir
+            sampler = capture(seconds, interval=interval, idle=request.args.get("idle", "").lower() in ("1", "true", "yes"))
+        finally:
+            _capture_lock.release()
+
+        name = f"capture-{os.getpid()}-{int(time.time())}.folded"
+        sampler.dump(os.path.join(profile_dir(app), name))
+        response = Response(sampler.folded(), mimetype="text/plain")
+        response.headers["X-Profile-File"] = name
+        response.headers["X-Profile-Samples"] = str(sampler.samples)
+        return response
+
+    # Prometheus scrape target; the values are per process
+    @app.route("/metrics")
+    def metrics_endpoint():
+        from sentiment.metrics import metrics
+        return Response(metrics.render(sentiment_metric_samples()),
+                        mimetype="text/plain; version=0.0.4")
+
+    # Debug route to inspect the sentiment model's inference stats
+    @app.route("/debug/sentiment")
+    def debug_sentiment():
+        # Don't load the model just to report on it
+        model = _sentiment_model
+        if model is None:
+            return jsonify({"loaded": False})
+        scheduler = getattr(model, "scheduler", None)
+        cache = getattr(model, "cache", None)
+        flight = getattr(model, "flight", None)
+        prefix_cache = getattr(getattr(model, "_model", None), "prefix_cache", None)
+        return jsonify({
+            "loaded": True,
+            "model": type(getattr(model, "_model", model)).__name__,
+            "baseline": getattr(model, "baseline_source", None),
+            "baseline_fallbacks": getattr(type(model), "baseline_fallbacks", 0),
+            "batching": scheduler.stats() if scheduler is not None else None,
+            "cache": cache.stats() if cache is not None else None,
+            "coalescing": flight.stats() if flight is not None else None,
+            "prefix_cache": prefix_cache.stats() if prefix_cache is not None else None,
+            "inference_thread": getattr(model, "inference_thread", None) is not None,
+            "streams": _stream_hub.stats() if _stream_hub is not None else None,
+            "version": getattr(model, "version", None),
+            "registry": _model_registry.stats() if _model_registry is not None else None,
+        })
         
     # Debug route to directly serve static files
     @app.route("/debug/file/<path:filepath>")
     def debug_file(filepath):
-        from flask import send_from_directory, abort, make_response
-        import mimetypes
-        
-        # Full path to the static file
-        full_path = os.path.join(app.static_folder, filepath)
-        
-        # Check if file exists
-        if not os.path.exists(full_path):
-            return abort(404, f"File not found: {full_path}")
-        
-        # Get MIME type
-        mime_type, encoding = mimetypes.guess_type(full_path)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
-            
-        # Read file content directly
-        try:
-            with open(full_path, 'rb') as f:
-                content = f.read()
-        except Exception as e:
-            return abort(500, f"Error reading file: {str(e)}")
-            
-        # Create response
-        response = make_response(content)
-        response.headers['Content-Type'] = mime_type
-        response.headers['Content-Length'] = str(len(content))
-        app.logger.info(f"Serving {filepath} with mime type {mime_type}, size {len(content)}")
-        return response
-        
+        # send_from_directory streams the file (sendfile through wsgi.file_wrapper
+        # under gunicorn) and answers If-None-Match and Range requests, so a large
+        # bundle like p5.js is never read into the worker's memory
+        return send_from_directory(app.static_folder, filepath)
+
     # Debug route to directly serve CSS
     @app.route("/debug/css/<path:filename>")
     def debug_css(filename):
-        from flask import send_from_directory, abort, make_response
-        
         if not filename.endswith('.css'):
             return abort(400, "Only CSS files are allowed")
-            
+
         # Determine if it's in dist or regular css folder
         if filename.startswith('dist/'):
-            css_path = os.path.join(app.static_folder, filename)
-        else:
-            css_path = os.path.join(app.static_folder, 'dist/css', filename)
-            
-        # Check if file exists
-        if not os.path.exists(css_path):
-            return abort(404, f"CSS file not found: {css_path}")
-            
-        # Read file content and return directly
-        with open(css_path, 'r') as f:
-            content = f.read()
-            
-        response = make_response(content)
-        response.headers['Content-Type'] = 'text/css'
-        return response
-    
+            return send_from_directory(app.static_folder, filename, mimetype='text/css')
+        return send_from_directory(os.path.join(app.static_folder, 'dist', 'css'), filename,
+                                   mimetype='text/css')
+
     # Debug route to check static files
     @app.route("/debug/static")
     def debug_static():
-        import os
-        import mimetypes
-        from flask import current_app, jsonify, send_from_directory, request
-        
-        static_folder = current_app.static_folder
-        static_files = []
-        
-        for root, dirs, files in os.walk(static_folder):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relpath = os.path.relpath(file_path, static_folder)
-                url = url_for('static', filename=relpath)
-                
-                # Get the size and mime type
-                size = os.path.getsize(file_path)
-                mime_type, _ = mimetypes.guess_type(file_path)
-                
-                # Check file permissions
-                readable = os.access(file_path, os.R_OK)
-                
-                static_files.append({
-                    "path": relpath,
-                    "url": url,
-                    "size": size,
-                    "mime_type": mime_type,
-                    "readable": readable
-                })
-        
-        # Sort files by path for easier reading
-        static_files.sort(key=lambda x: x["path"])
-        
-        # Detailed check for CSS files
-        css_files = [f for f in static_files if f["path"].endswith('.css')]
-        css_checks = []
-        
-        for css_file in css_files:
-            try:
-                # Try to access the file through Flask
-                full_path = os.path.join(static_folder, css_file["path"])
-                with open(full_path, 'rb') as f:
-                    content = f.read(100)  # Read just the beginning
-                css_checks.append({
-                    "path": css_file["path"],
-                    "accessible": True,
-                    "size": len(content),
-                    "content_preview": content[:20].decode('utf-8', errors='replace')
-                })
-            except Exception as e:
-                css_checks.append({
-                    "path": css_file["path"],
-                    "accessible": False,
-                    "error": str(e)
-                })
-        
+        """Page through the static file index, filtered by path prefix, extension or MIME type."""
+        index = app.extensions["static_index"]
+        offset = max(request.args.get("offset", 0, type=int), 0)
+        limit = min(max(request.args.get("limit", 100, type=int), 1),
+                    app.config['STATIC_INDEX_MAX_LIMIT'])
+        total, entries = index.query(prefix=request.args.get("prefix", ""),
+                                     ext=request.args.get("ext"),
+                                     mime=request.args.get("mime"),
+                                     offset=offset, limit=limit)
+
+        files = []
+        for entry in entries:
+            record = dict(zip(index.FIELDS, entry))
+            record["url"] = url_for('static', filename=record["path"])
+            files.append(record)
+
         return jsonify({
-            "static_folder": static_folder,
-            "files": static_files,
-            "css_checks": css_checks,
-            "app_url_map": str(app.url_map),
+            "static_folder": app.static_folder,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < total else None,
+            "files": files,
+            "index": index.stats(),
             "request_headers": dict(request.headers)
         })
 
@@ -0,0 +1,302 @@
+"""Content-hashed copies of the files under ``static/``.
+
+``flask assets build`` copies every static file to
+``static/build/<path>.<hash>.<ext>`` and records the mapping in
+``static/build/manifest.json``.
+
+With ``ASSET_MANIFEST`` enabled, ``init_app`` makes ``url_for('static', ...)``
+return the hashed names. Those files get a one-year ``immutable`` cache
+lifetime: any change to a file gives it a new name, so nothing is served
+stale. On App Engine the ``/static/build`` handler in ``app.yaml`` serves them
+without reaching Flask and compresses them itself, so no compressed copies
+are built.
+
+``StaticIndex`` keeps an in-memory listing of the same tree for
+``/debug/static``.
+"""
+import bisect
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+
+import click
+from flask import send_from_directory
+from flask.cli import AppGroup
+
+BUILD_DIR = "build"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 2
+ONE_YEAR = 31536000
+
+_CSS_URL = re.compile(rb"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+
+def hashed_name(path, digest):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest[:10]}{ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def rewrite_css_urls(data, rel, files):
+    """Point ``url(...)`` references in the stylesheet ``rel`` at their hashed copies.
+
+    A hashed stylesheet lives under ``build/`` next to the hashed copies of
+    the files it references, so relative references are rewritten relative
+    to its new location. Unknown and external URLs are left alone.
+    """
+    css_dir = posixpath.dirname(f"{BUILD_DIR}/{rel}")
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).decode("utf-8", "replace")
+        if url.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        cut = re.search(r"[?#]|$", url).start()
+        path, suffix = url[:cut], url[cut:]
+        if path.startswith("/static/"):
+            target = path[len("/static/"):]
+        else:
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), path))
+        entry = files.get(target)
+        if entry is None:
+            return match.group(0)
+        new = posixpath.relpath(entry["path"], css_dir) + suffix
+        return b"url(" + quote + new.encode("utf-8") + quote + b")"
+
+    return _CSS_URL.sub(replace, data)
+
+
+def source_files(static_dir):
+    """Paths of the files under ``static_dir`` to fingerprint, relative and with '/' separators."""
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir)
+        if rel_root == ".":
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            if not name.startswith("."):
+                yield os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+
+
+def build_assets(static_dir):
+    """Fingerprint ``static_dir`` into its build directory; returns the manifest.
+
+    Files already built for the same content are reused, and files no longer
+    referenced are removed.
+    """
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    files = {}
+    # Stylesheets last, so the files they reference already have hashed names
+    for rel in sorted(source_files(static_dir), key=lambda p: (p.endswith(".css"), p)):
+        with open(os.path.join(static_dir, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            data = rewrite_css_urls(data, rel, files)
+        target = hashed_name(rel, hashlib.sha256(data).hexdigest())
+        target_path = os.path.join(build_dir, target)
+        if not os.path.exists(target_path):
+            _write(target_path, data)
+        files[rel] = {"path": f"{BUILD_DIR}/{target}", "size": len(data)}
+
+    manifest = {"format": FORMAT_VERSION, "files": files}
+    _prune(build_dir, manifest)
+    _write(os.path.join(build_dir, MANIFEST_FILE),
+           json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def _prune(build_dir, manifest):
+    keep = {MANIFEST_FILE}
+    keep.update(entry["path"][len(BUILD_DIR) + 1:] for entry in manifest["files"].values())
+    for rel in list(source_files(build_dir)):
+        if rel not in keep:
+            os.remove(os.path.join(build_dir, rel))
+
+
+class AssetManifest(object):
+    """Lookups in a ``manifest.json`` written by ``build_assets``."""
+
+    def __init__(self, files):
+        self.files = files
+        self._built = {entry["path"]: entry for entry in files.values()}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != FORMAT_VERSION:
+            return None
+        return cls(manifest["files"])
+
+    def url_path(self, filename):
+        """The hashed path for ``filename``, or ``filename`` itself if it isn't in the manifest."""
+        entry = self.files.get(filename.lstrip("/"))
+        return entry["path"] if entry is not None else filename
+
+    def built(self, path):
+        return self._built.get(path)
+
+
+def serve_static(app, manifest, filename):
+    """Static view: hashed files get immutable caching, others are served as before."""
+    if manifest.built(filename) is None:
+        return app.send_static_file(filename)
+
+    response = send_from_directory(app.static_folder, filename, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app, manifest_path=None):
+    """Serve hashed static URLs from the manifest, if one has been built."""
+    path = manifest_path or os.path.join(app.static_folder, BUILD_DIR, MANIFEST_FILE)
+    manifest = AssetManifest.load(path)
+    if manifest is None:
+        app.logger.info("No asset manifest at %s, serving static files by name", path)
+        return None
+    app.extensions["asset_manifest"] = manifest
+
+    @app.url_defaults
+    def hashed_static_urls(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = manifest.url_path(values["filename"])
+
+    app.view_functions["static"] = lambda filename: serve_static(app, manifest, filename)
+    return manifest
+
+
+class StaticIndex(object):
+    """In-memory listing of the files under ``root``, for ``/debug/static``.
+
+    The tree is walked once when the index is created. After that, at most
+    once per ``check_interval``, only the directories are stat'ed, and a
+    directory is listed again only when its mtime changed. A file rewritten
+    in place doesn't change its directory's mtime, so its size and mtime can
+    lag until something is added to or removed from that directory.
+
+    Entries are ``(path, size, mtime, mime_type, readable)`` tuples sorted by
+    path, so prefix lookups are a bisection.
+    """
+
+    FIELDS = ("path", "size", "mtime", "mime_type", "readable")
+
+    def __init__(self, root, check_interval=5.0, clock=time.monotonic):
+        self.root = root
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Relative directory -> (mtime_ns, file entries, subdirectories)
+        self._dirs = {}
+        self._entries = ()
+        self._paths = ()
+        self._next_check = clock() + check_interval
+
+        self.scans = 0
+        self.dirs_listed = 0
+        self.refresh()
+
+    def _list(self, rel):
+        files, subdirs = [], []
+        with os.scandir(os.path.join(self.root, rel)) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                path = posixpath.join(rel, entry.name) if rel else entry.name
+                try:
+                    if entry.is_dir():
+                        subdirs.append(path)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((path, st.st_size, int(st.st_mtime), mimetypes.guess_type(entry.name)[0],
+                              os.access(entry.path, os.R_OK)))
+        self.dirs_listed += 1
+        return files, subdirs
+
+    def refresh(self):
+        """Re-list the directories that changed since the last refresh."""
+        with self._lock:
+            dirs, changed, pending = {}, False, [""]
+            while pending:
+                rel = pending.pop()
+                try:
+                    mtime = os.stat(os.path.join(self.root, rel)).st_mtime_ns
+                    cached = self._dirs.get(rel)
+                    if cached is not None and cached[0] == mtime:
+                        files, subdirs = cached[1], cached[2]
+                    else:
+                        files, subdirs = self._list(rel)
+                        changed = True
+                except OSError:
+                    continue
+                dirs[rel] = (mtime, files, subdirs)
+                pending.extend(subdirs)
+
+            self.scans += 1
+            if changed or dirs.keys() != self._dirs.keys():
+                entries = sorted(entry for _, files, _ in dirs.values() for entry in files)
+                # Readers take these two without the lock; they are replaced, never mutated
+                self._entries, self._paths = tuple(entries), tuple(e[0] for e in entries)
+            self._dirs = dirs
+            self._next_check = self._clock() + self.check_interval
+
+    def poll(self):
+        if self._clock() >= self._next_check:
+            self.refresh()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def query(self, prefix="", ext=None, mime=None, offset=0, limit=100):
+        """Return ``(total, entries)``: matching entries ``offset:offset + limit``.
+
+        ``prefix`` matches the start of the relative path, ``ext`` the file
+        extension (with or without the dot), and ``mime`` the start of the
+        MIME type, so ``text/`` matches ``text/css``.
+        """
+        self.poll()
+        entries, paths = self._entries, self._paths
+        start = bisect.bisect_left(paths, prefix)
+        end = bisect.bisect_left(paths, prefix + "\U0010ffff") if prefix else len(paths)
+        if ext:
+            ext = "." + ext.lstrip(".").lower()
+        matches = [entry for entry in entries[start:end]
+                   if (not ext or entry[0].lower().endswith(ext))
+                   and (not mime or (entry[3] or "").startswith(mime))]
+        return len(matches), matches[offset:offset + limit]
+
+    def stats(self):
+        return {
+            "files": len(self._entries),
+            "directories": len(self._dirs),
+            "scans": self.scans,
+            "directories_listed": self.dirs_listed,
+        }
+
+
+assets_cli = AppGroup("assets", help="Static asset build commands.")
+
+
+@assets_cli.command("build")
+def build_command():
+    """Fingerprint static/ into static/build with a manifest."""
+    from flask import current_app
+    manifest = build_assets(current_app.static_folder)
+
+    size = sum(e["size"] for e in manifest["files"].values())
+    click.echo(f"Built {len(manifest['files'])} files: {size / 1e6:.1f} MB")
@@ -0,0 +1,72 @@
+"""Micro-benchmark: per-Tweet featurization vs. the vectorized batch encoder.
+
+Usage: python benchmarks/bench_encoding.py [--n 10000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sentiment.emojis import emojis  # noqa: E402
+from sentiment.encoder import encode_labels, encode_texts  # noqa: E402
+
+
+def legacy_x(raw):
+    """The original Tweet.x: one str.replace per emoji, then a Python list."""
+    text = raw
+    for e in emojis:
+        text = text.replace(e, "")
+    x = []
+    if len(text) < 140:
+        x += [0] * (140 - len(text))
+    x += [ord(c) % 5000 for c in text]
+    return np.array(x[0:140])
+
+
+def legacy_y(raw):
+    """The original Tweet.y: a substring scan plus emojis.index per emoji."""
+    y = np.zeros(len(emojis))
+    for e in [e for e in emojis if e in raw]:
+        y[emojis.index(e)] = 1
+    return y
+
+
+def sample_texts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["love", "this", "we", "have", "to", "talk", "crying", "beautiful", "so", "much"]
+    texts = []
+    for _ in range(n):
+        parts = list(rng.choice(words, size=rng.integers(3, 20)))
+        parts += list(rng.choice(emojis, size=rng.integers(0, 3)))
+        rng.shuffle(parts)
+        texts.append(" ".join(parts)[:140])
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=10000, help="texts per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method (best is reported)")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.n)
+    runs = {
+        "legacy x": lambda: np.stack([legacy_x(t) for t in texts]),
+        "encode_texts": lambda: encode_texts(texts),
+        "legacy y": lambda: np.stack([legacy_y(t) for t in texts]),
+        "encode_labels": lambda: encode_labels(texts),
+    }
+
+    best = {name: min(timeit.repeat(fn, number=1, repeat=args.repeat)) for name, fn in runs.items()}
+    for name, seconds in best.items():
+        print(f"{name:>14}: {seconds * 1000:9.2f} ms  ({args.n / seconds:12,.0f} texts/s)")
+    print(f"x speedup: {best['legacy x'] / best['encode_texts']:.1f}x")
+    print(f"y speedup: {best['legacy y'] / best['encode_labels']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
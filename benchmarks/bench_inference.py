@@ -0,0 +1,354 @@
+"""Benchmark suite for the sentiment inference path, with regression checks.
+
+Measures ``Tweet.x``/``Tweet.y`` encoding throughput, single-row and batched
+``predict`` latency for every backend available here (the dummy model, the
+NumPy model, its memory-mapped bundle and Keras), and end-to-end
+``/sentiment/api/score`` requests through the Flask test client and a local
+gunicorn. Results are written as JSON; ``--compare`` checks them against a
+stored baseline and exits with status 1 on a regression.
+
+Usage:
+  python benchmarks/bench_inference.py [--quick] [--output results.json]
+  python benchmarks/bench_inference.py --compare benchmarks/baseline.json [--threshold 0.15]
+  python benchmarks/bench_inference.py --diff old.json new.json
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_encoding import sample_texts  # noqa: E402
+
+FORMAT_VERSION = 1
+# Metrics compared against a baseline, and whether a larger value is better
+METRICS = {"p50_ms": False, "p95_ms": False, "per_second": True}
+# Latency changes smaller than this are timer noise, whatever the ratio
+MIN_DELTA_MS = 0.05
+
+
+def summarize(samples, items=1):
+    """Latency percentiles in ms for per-call ``samples`` (seconds)."""
+    s = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(len(s)),
+        "mean_ms": float(s.mean()),
+        "p50_ms": float(np.percentile(s, 50)),
+        "p95_ms": float(np.percentile(s, 95)),
+        "p99_ms": float(np.percentile(s, 99)),
+        "per_second": float(items * len(s) / (s.sum() / 1000.0)),
+    }
+
+
+def time_calls(fn, n, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_encoding(texts, repeat):
+    """Per-tweet ``Tweet.x``/``Tweet.y`` against the batch encoders; per_second is texts/s."""
+    from sentiment.encoder import encode_labels, encode_texts
+    from sentiment.models import Tweet
+
+    tweets = [Tweet(raw_tweet=t) for t in texts[:2000]]
+    runs = {
+        "encode.tweet_x": (lambda: [t.x for t in tweets], len(tweets)),
+        "encode.tweet_y": (lambda: [t.y for t in tweets], len(tweets)),
+        "encode.texts": (lambda: encode_texts(texts), len(texts)),
+        "encode.labels": (lambda: encode_labels(texts), len(texts)),
+    }
+    return {name: summarize(time_calls(fn, repeat, warmup=1), items)
+            for name, (fn, items) in runs.items()}
+
+
+def load_backends(app, names):
+    """``{name: model}`` for the requested backends that can be loaded here."""
+    from sentiment.ml import SentimentModel
+
+    models = {}
+    with app.app_context():
+        probe = SentimentModel(model="dummy")
+        for name in names:
+            try:
+                if name == "dummy":
+                    model = SentimentModel(model="dummy")
+                elif name == "keras":
+                    import tensorflow  # noqa: F401
+                    app.config['SENTIMENT_BACKEND'] = "keras"
+                    model = SentimentModel()
+                    if not model.from_file:
+                        raise FileNotFoundError(f"could not load {model.model_path}")
+                elif name == "numpy":
+                    from sentiment.numpy_model import NumpyLSTMModel
+                    model = SentimentModel(model=NumpyLSTMModel.from_h5(probe.model_path))
+                elif name == "bundle":
+                    from sentiment.bundle import bundle_matches, load_bundle
+                    if not bundle_matches(probe.bundle_path, probe.model_path):
+                        raise FileNotFoundError("no up to date model bundle")
+                    model = SentimentModel(model=load_bundle(probe.bundle_path))
+                else:
+                    raise ValueError(f"unknown backend {name!r}")
+            except Exception as e:
+                print(f"skipping {name} backend: {e}", file=sys.stderr)
+                continue
+            models[name] = model
+    return models
+
+
+def bench_predict(models, texts, n, batch_size):
+    from sentiment.encoder import encode_texts
+
+    x = encode_texts(texts)
+    results = {}
+    for name, model in models.items():
+        # The raw model, so the cache and other serving options don't skew it
+        predict = model._model.predict
+        if name == "keras":
+            predict = functools.partial(predict, verbose=0)
+        rows = iter(range(10 ** 9))
+        results[f"predict.{name}.single"] = summarize(
+            time_calls(lambda: predict(x[[next(rows) % len(x)]]), n))
+        batch = x[:batch_size]
+        results[f"predict.{name}.batch{batch_size}"] = summarize(
+            time_calls(lambda: predict(batch), max(5, n // 10)), len(batch))
+    return results
+
+
+def bench_test_client(app, texts, n):
+    """``/sentiment/api/score`` through the Flask test client, with a cold cache per text."""
+    client = app.test_client()
+    texts = iter(texts * (n // len(texts) + 2))
+
+    def call():
+        response = client.post('/sentiment/api/score', data={'text': next(texts)})
+        assert response.status_code == 200, response.status_code
+
+    return {"endpoint.test_client": summarize(time_calls(call, n))}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up in {timeout:.0f}s")
+
+
+def bench_gunicorn(texts, n, concurrency, env):
+    """``/sentiment/api/score`` over HTTP against a local gunicorn started from gunicorn.conf.py."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "app:app"],
+        cwd=ROOT, env=dict(os.environ, **env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(base + "/about", timeout=120)
+        pool = iter(texts * (n // len(texts) + 2))
+
+        def call(text=None):
+            body = urllib.parse.urlencode({"text": text or next(pool)}).encode()
+            urllib.request.urlopen(base + "/sentiment/api/score", data=body, timeout=30).read()
+
+        results = {"endpoint.gunicorn": summarize(time_calls(call, n))}
+
+        # Throughput with concurrent clients (latencies include queueing)
+        def timed(text):
+            start = time.perf_counter()
+            call(text)
+            return time.perf_counter() - start
+
+        batch = [next(pool) for _ in range(n)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = list(executor.map(timed, batch))
+        elapsed = time.perf_counter() - start
+        concurrent = summarize(samples)
+        concurrent["per_second"] = n / elapsed
+        results[f"endpoint.gunicorn.c{concurrency}"] = concurrent
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, threshold=0.15):
+    """Regressions of ``current`` against ``baseline`` results, worst first.
+
+    A latency regresses when it grew by more than ``threshold`` (and by more
+    than ``MIN_DELTA_MS``); a throughput when it shrank by more than
+    ``threshold``. Benchmarks missing from either side, or with calls
+    shorter than ``MIN_DELTA_MS``, are ignored.
+    """
+    regressions = []
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            continue
+        if max(before["p50_ms"], after["p50_ms"]) < MIN_DELTA_MS:
+            # Calls this short are dominated by timer overhead
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse <= threshold:
+                continue
+            if not higher_is_better and new - old < MIN_DELTA_MS:
+                continue
+            regressions.append({"benchmark": name, "metric": metric, "baseline": old,
+                                "current": new, "change": change})
+    return sorted(regressions, key=lambda r: -abs(r["change"]))
+
+
+def print_results(results):
+    for name, r in results.items():
+        print(f"{name:>32}: p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  "
+              f"p99 {r['p99_ms']:9.3f} ms  {r['per_second']:12,.1f}/s")
+
+
+def print_regressions(regressions, threshold):
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%}")
+        return
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%}:")
+    for r in regressions:
+        print(f"  {r['benchmark']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} "
+              f"({r['change']:+.1%})")
+
+
+def run(args):
+    os.environ.setdefault("FLASK_CONFIG", "testing")
+    from app import create_app
+
+    texts = sample_texts(args.texts)
+    results = {}
+    results.update(bench_encoding(texts, args.repeat))
+
+    app = create_app("testing")
+    models = load_backends(app, args.backends)
+    results.update(bench_predict(models, texts, args.n, args.batch_size))
+
+    # Serve the endpoint with the first backend that loaded, without its cache
+    backend = next((b for b in ("bundle", "numpy", "keras") if b in models), "dummy")
+    app.config['SENTIMENT_BACKEND'] = "keras" if backend == "keras" else "numpy"
+    app.config['SENTIMENT_CACHE_SIZE'] = 0
+    import app as app_module
+    if backend in models:
+        with app.app_context():
+            app_module.configure_sentiment_model(models[backend], app.config)
+        app_module._sentiment_model = models[backend]
+    results.update(bench_test_client(app, texts, args.n))
+
+    if args.gunicorn:
+        env = {"FLASK_CONFIG": "testing", "SENTIMENT_CACHE_SIZE": "0",
+               "SENTIMENT_BACKEND": app.config['SENTIMENT_BACKEND'],
+               "GUNICORN_WORKERS": str(args.workers), "GUNICORN_THREADS": str(args.threads)}
+        try:
+            results.update(bench_gunicorn(texts, args.n, args.concurrency, env))
+        except Exception as e:
+            print(f"skipping gunicorn benchmark: {e}", file=sys.stderr)
+
+    return {"meta": dict(metadata(), endpoint_backend=backend), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this results file")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two stored results files without running anything")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change counted as a regression")
+    parser.add_argument("--backends", nargs="+", default=["dummy", "numpy", "bundle", "keras"])
+    parser.add_argument("--n", type=int, default=300, help="timed calls per latency benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per encoding benchmark")
+    parser.add_argument("--texts", type=int, default=5000, help="synthetic texts to encode")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-gunicorn", dest="gunicorn", action="store_false")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent gunicorn clients")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for smoke runs")
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as f, open(args.diff[1]) as g:
+            regressions = compare(json.load(f), json.load(g), args.threshold)
+        print_regressions(regressions, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    if args.quick:
+        args.n, args.repeat, args.texts = 30, 2, 500
+
+    report = run(args)
+    print_results(report["results"])
+    # Compare first, so the stored results include the regressions this run fails on
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(baseline, report, args.threshold)
+        print_regressions(report["regressions"], args.threshold)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark: streaming training batches from a synthetic tweets database.
+
+Usage: python benchmarks/bench_pipeline.py [--tweets 200000] [--batches 500] [--batch-size 100]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sentiment.models import Tweet  # noqa: E402
+from sentiment.pipeline import measure_throughput, stream_batches  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_encoding import sample_texts  # noqa: E402
+
+
+def build_db(path, n, chunk=50000):
+    engine = create_engine(f"sqlite:///{path}")
+    Tweet.__table__.create(engine)
+    with Session(engine) as session:
+        for start in range(0, n, chunk):
+            texts = sample_texts(min(chunk, n - start), seed=start)
+            session.execute(insert(Tweet.__table__), [{"raw_tweet": t} for t in texts])
+        session.commit()
+    return engine
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tweets", type=int, default=200000, help="rows in the synthetic table")
+    parser.add_argument("--batches", type=int, default=500, help="batches to pull")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--prefetch", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_db(os.path.join(tmp, "tweets.db"), args.tweets)
+        before = peak_rss_mb()
+        batches = stream_batches(engine, batch_size=args.batch_size, prefetch=args.prefetch)
+        rate = measure_throughput(batches, args.batches)
+        if hasattr(batches, "close"):
+            batches.close()
+        print(f"{rate:,.1f} batches/s ({rate * args.batch_size:,.0f} tweets/s)")
+        print(f"peak RSS {peak_rss_mb():.1f} MB (+{peak_rss_mb() - before:.1f} MB while streaming)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
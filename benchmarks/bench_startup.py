@@ -0,0 +1,104 @@
+"""Cold-start report: import cost and time to the first request.
+
+Starts a fresh interpreter with ``python -X importtime``, imports ``app`` under
+the given config and sends the first request through the test client. Prints
+the slowest top-level imports, the time from interpreter start to the first
+response, and which heavy modules (TensorFlow, NumPy, SQLAlchemy, the
+sentiment model) ended up loaded. The best of ``--runs`` is reported, since
+the first run also pays for a cold page cache.
+
+Usage:
+  python benchmarks/bench_startup.py [--config production] [--path /] [--runs 3]
+  python benchmarks/bench_startup.py --path /sentiment --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules whose presence after the first request is worth calling out
+HEAVY_MODULES = ("tensorflow", "keras", "numpy", "sqlalchemy", "flask_sqlalchemy", "sentiment.ml")
+
+# Runs in the child interpreter; prints one JSON line after the first response
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get(sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_seconds": imported - start,
+    "first_request_seconds": done - imported,
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """``(module, self_seconds, cumulative_seconds, depth)`` for each ``-X importtime`` line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return entries
+
+
+def top_imports(entries, top=15):
+    """The slowest imports made directly by the top level, by cumulative seconds."""
+    roots = [(name, cumulative) for name, _, cumulative, depth in entries if depth <= 1]
+    return sorted(roots, key=lambda r: r[1], reverse=True)[:top]
+
+
+def run_once(config, path):
+    env = dict(os.environ, FLASK_CONFIG=config, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD, path, *HEAVY_MODULES],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Everything from exec to the first response, including interpreter start-up
+    result["time_to_first_request_seconds"] = wall
+    result["imports"] = top_imports(parse_importtime(proc.stderr))
+    return result
+
+
+def print_report(result):
+    print(f"time to first request: {result['time_to_first_request_seconds'] * 1000:8.1f} ms")
+    print(f"  import app:          {result['import_seconds'] * 1000:8.1f} ms")
+    print(f"  first request:       {result['first_request_seconds'] * 1000:8.1f} ms "
+          f"(status {result['status']})")
+    print(f"heavy modules loaded: {', '.join(result['loaded']) or 'none'}")
+    print("slowest imports:")
+    for name, seconds in result["imports"]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="production",
+                        help="FLASK_CONFIG for the child process (default: production).")
+    parser.add_argument("--path", default="/", help="URL of the first request (default: /).")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start.")
+    parser.add_argument("--output", help="Also write the best run as JSON here.")
+    args = parser.parse_args()
+
+    runs = [run_once(args.config, args.path) for _ in range(args.runs)]
+    best = min(runs, key=lambda r: r["time_to_first_request_seconds"])
+    best.update(config=args.config, path=args.path, runs=args.runs)
+    print_report(best)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(best, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,84 @@ class Config:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Inference backend for the sentiment model: 'keras' or 'numpy' (no TensorFlow)
+    SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'keras')
+
+    # Load and warm the sentiment model at server start (see gunicorn.conf.py)
+    SENTIMENT_PRELOAD = os.environ.get('SENTIMENT_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+    # Micro-batch concurrent sentiment predictions (pays off with threaded workers)
+    SENTIMENT_BATCHING = os.environ.get('SENTIMENT_BATCHING', '').lower() in ('1', 'true', 'yes')
+    SENTIMENT_BATCH_MAX_SIZE = int(os.environ.get('SENTIMENT_BATCH_MAX_SIZE', 32))
+    SENTIMENT_BATCH_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_BATCH_MAX_WAIT_MS', 5))
+
+    # LRU cache of sentiment predictions (size 0 disables, TTL 0 never expires)
+    SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 1024))
+    SENTIMENT_CACHE_TTL = float(os.environ.get('SENTIMENT_CACHE_TTL', 0))
+
+    # Reuse LSTM states when a text extends a recently scored one (NumPy backend;
+    # size 0 disables). The window is how many appended characters one entry covers.
+    SENTIMENT_PREFIX_CACHE_SIZE = int(os.environ.get('SENTIMENT_PREFIX_CACHE_SIZE', 128))
+    SENTIMENT_PREFIX_WINDOW = int(os.environ.get('SENTIMENT_PREFIX_WINDOW', 32))
+
+    # Share one prediction between concurrent requests for the same text
+    SENTIMENT_COALESCE = os.environ.get('SENTIMENT_COALESCE', 'true').lower() in ('1', 'true', 'yes')
+    # Run the model on one dedicated thread (implied by batching)
+    SENTIMENT_INFERENCE_THREAD = os.environ.get('SENTIMENT_INFERENCE_THREAD', '').lower() in ('1', 'true', 'yes')
+
+    # Server-Sent Events scoring stream: whether the sentiment page uses it, open
+    # streams per process (each holds a
+    # worker thread, so two of gunicorn's threads are always left for other
+    # requests and the sync worker gets none), seconds before a stream is
+    # recycled (kept under gunicorn's 30s timeout), seconds between keep-alive
+    # comments, default top-k emojis
+    SENTIMENT_STREAM = os.environ.get('SENTIMENT_STREAM', 'true').lower() in ('1', 'true', 'yes')
+    SENTIMENT_STREAM_MAX_SESSIONS = int(os.environ.get(
+        'SENTIMENT_STREAM_MAX_SESSIONS', max(int(os.environ.get('GUNICORN_THREADS', 4)) - 2, 0)))
+    SENTIMENT_STREAM_LIFETIME = float(os.environ.get('SENTIMENT_STREAM_LIFETIME', 25))
+    SENTIMENT_STREAM_HEARTBEAT = float(os.environ.get('SENTIMENT_STREAM_HEARTBEAT', 10))
+    SENTIMENT_STREAM_TOP_K = int(os.environ.get('SENTIMENT_STREAM_TOP_K', 10))
+
+    # Reload the model in the background when model.h5 changes, checking at
+    # most every SENTIMENT_RELOAD_INTERVAL seconds
+    SENTIMENT_HOT_RELOAD = os.environ.get('SENTIMENT_HOT_RELOAD', 'true').lower() in ('1', 'true', 'yes')
+    SENTIMENT_RELOAD_INTERVAL = float(os.environ.get('SENTIMENT_RELOAD_INTERVAL', 5))
+
+    # Per-phase request timings in a Server-Timing response header
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+
+    # Opt-in profiling (see profiling.py), written to instance/profiles:
+    # continuous stack sampling per worker, cProfile for a random fraction of
+    # requests, and POST /debug/profile (only enabled when PROFILE_TOKEN is set)
+    PROFILE_SAMPLER = os.environ.get('PROFILE_SAMPLER', '').lower() in ('1', 'true', 'yes')
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.01))
+    PROFILE_DUMP_INTERVAL = float(os.environ.get('PROFILE_DUMP_INTERVAL', 60))
+    PROFILE_REQUEST_RATE = float(os.environ.get('PROFILE_REQUEST_RATE', 0))
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+    # Kept under gunicorn's 30s worker timeout
+    PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 20))
+
+    # Resolve url_for('static', ...) to the hashed files of `flask assets build`
+    # (left off by default so edited files show up without a rebuild)
+    ASSET_MANIFEST = os.environ.get('ASSET_MANIFEST', '').lower() in ('1', 'true', 'yes')
+
+    # /debug/static lists an in-memory index of static/, re-checked at most this
+    # often (seconds), and returns at most STATIC_INDEX_MAX_LIMIT files per page
+    STATIC_INDEX_INTERVAL = float(os.environ.get('STATIC_INDEX_INTERVAL', 5))
+    STATIC_INDEX_MAX_LIMIT = int(os.environ.get('STATIC_INDEX_MAX_LIMIT', 1000))
+
+    # Cache the rendered bytes of the template-only pages (emptied when a template
+    # changes in debug mode), and compiled Jinja templates in the temp directory
+    PAGE_CACHE = os.environ.get('PAGE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    JINJA_BYTECODE_CACHE = os.environ.get('JINJA_BYTECODE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+
+    # Register the database only when something asks for it (models.get_db), keeping
+    # SQLAlchemy's import off the start-up path
+    LAZY_DATABASE = os.environ.get('LAZY_DATABASE', '').lower() in ('1', 'true', 'yes')
+
+    # Upper bound on the number of texts accepted by /sentiment/api/score_batch
+    SENTIMENT_MAX_BATCH_TEXTS = int(os.environ.get('SENTIMENT_MAX_BATCH_TEXTS', 1000))
+
 
 class DevelopmentConfig(Config):
     """Development config."""
@@ -31,6 +109,15 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///:memory:')
     SECRET_KEY = os.environ.get('SECRET_KEY', 'production-key-required')
 
+    # Serve real predictions without importing TensorFlow
+    SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'numpy')
+    SENTIMENT_PRELOAD = os.environ.get('SENTIMENT_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+    ASSET_MANIFEST = os.environ.get('ASSET_MANIFEST', 'true').lower() in ('1', 'true', 'yes')
+    LAZY_DATABASE = os.environ.get('LAZY_DATABASE', 'true').lower() in ('1', 'true', 'yes')
+    # App Engine buffers streamed responses and spreads posts over instances
+    # that don't hold the session, so the page sends plain scoring requests
+    SENTIMENT_STREAM = os.environ.get('SENTIMENT_STREAM', 'false').lower() in ('1', 'true', 'yes')
+
     # Production-specific security settings
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
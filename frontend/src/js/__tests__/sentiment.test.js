@@ -35,7 +35,7 @@ beforeEach(() => {
 });
 
 // Import module after setting up mocks
-import '../sentiment.js';
+import { applyFrame } from '../sentiment.js';
 
 describe('Sentiment Module', () => {
   test('DOM elements are properly selected', () => {
@@ -85,4 +85,22 @@ describe('Sentiment Module', () => {
     // Check fetch wasn't called
     expect(global.fetch).not.toHaveBeenCalled();
   });
-});
\ No newline at end of file
+
+  test('Stream delta frames merge into the previous scores', () => {
+    const log = jest.spyOn(console, 'log').mockImplementation(() => {});
+
+    applyFrame({ seq: 1, emoji: { '😊': 0.5, '😢': 0.2 }, sentiment: 0.3 });
+    applyFrame({ seq: 2, delta: true, emoji: { '😂': 0.9 }, drop: ['😢'], sentiment: 0.4 });
+
+    expect(log).toHaveBeenCalledWith('Sentiment data received:', {
+      emoji: { '😊': 0.5, '😂': 0.9 },
+      sentiment: 0.4,
+    });
+
+    // Frames for older text are ignored
+    log.mockClear();
+    applyFrame({ seq: 1, emoji: { '😢': 1.0 }, sentiment: 0.1 });
+    expect(log).not.toHaveBeenCalledWith('Sentiment data received:', expect.anything());
+    log.mockRestore();
+  });
+});
@@ -29,6 +29,9 @@ function setupEventListeners() {
   const textarea = document.getElementById('target');
   
   if (textarea) {
+    // The server only offers the stream where it is delivered incrementally
+    if ('stream' in textarea.dataset) openScoreStream();
+
     textarea.addEventListener('input', debounce(function() {
       submitTextForAnalysis(textarea.value);
     }, 500));
@@ -43,12 +46,86 @@ function setupEventListeners() {
   }
 }
 
+// Persistent Server-Sent Events channel for scores (see sentiment/streaming.py)
+const STREAM_TOP_K = 10;
+const stream = {
+  source: null,
+  sessionId: null,
+  seq: 0,
+  lastSeq: 0,
+  emoji: {},
+};
+
+export function openScoreStream() {
+  if (typeof EventSource === 'undefined') return null;
+
+  const source = new EventSource(`/sentiment/api/stream?top_k=${STREAM_TOP_K}&delta=1`);
+  stream.source = source;
+
+  source.addEventListener('session', event => {
+    // A new session starts from scratch (also after an automatic reconnect)
+    stream.sessionId = JSON.parse(event.data).id;
+    stream.emoji = {};
+  });
+  source.addEventListener('score', event => {
+    applyFrame(JSON.parse(event.data));
+  });
+  source.onerror = () => {
+    // Fall back to plain requests until EventSource reconnects
+    stream.sessionId = null;
+    // A refused stream (503 when the server has no thread to spare) is not retried
+    if (source.readyState === EventSource.CLOSED) stream.source = null;
+  };
+  return source;
+}
+
+// Merge a full or delta stream frame into the scores the page shows
+export function applyFrame(frame) {
+  // Deltas always build on the stream's own previous frame
+  if (!frame.delta) stream.emoji = {};
+  Object.assign(stream.emoji, frame.emoji);
+  (frame.drop || []).forEach(emoji => delete stream.emoji[emoji]);
+
+  showFrame({ seq: frame.seq, emoji: { ...stream.emoji }, sentiment: frame.sentiment });
+}
+
+// Only show scores for text at least as new as what is on screen
+function showFrame(frame) {
+  if (frame.seq < stream.lastSeq) return;
+  stream.lastSeq = frame.seq;
+  updateVisualization({ emoji: frame.emoji, sentiment: frame.sentiment });
+}
+
+function sendToStream(text) {
+  stream.seq += 1;
+  fetch(`/sentiment/api/stream/${stream.sessionId}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ text, seq: stream.seq, top_k: STREAM_TOP_K }),
+  })
+    .then(response => {
+      // 200 means the stream lives in another worker, which scored it directly
+      if (response.status === 200) {
+        return response.json().then(frame => showFrame(frame));
+      }
+      return null;
+    })
+    .catch(error => {
+      console.error('Error:', error);
+    });
+}
+
 // Export for testing
 export function submitTextForAnalysis(text) {
   if (!text.trim()) return;
   
   // Truncate very long inputs to 280 chars (Twitter-like limit)
   const processedText = truncateText(text, 280);
+
+  if (stream.sessionId) {
+    sendToStream(processedText);
+    return;
+  }
   
   const formData = new FormData();
   formData.append('text', processedText);
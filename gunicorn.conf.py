@@ -0,0 +1,54 @@
+# Gunicorn settings, used by the App Engine entrypoint in app.yaml
+import os
+
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# Threaded workers let concurrent sentiment requests be batched and coalesced;
+# GUNICORN_THREADS=1 falls back to the sync worker, where requests never overlap
+worker_class = "gthread" if threads > 1 else "sync"
+# Seconds a sync worker may spend on one request before it is killed
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def _should_preload(flask_app):
+    return flask_app.config.get("SENTIMENT_PRELOAD")
+
+
+def when_ready(server):
+    """Warm the model in the master so every forked worker inherits it.
+
+    Only the NumPy backend is safe to fork; TensorFlow's thread pools don't
+    survive a fork, so the Keras backend is loaded per worker instead.
+    """
+    from app import app as flask_app, preload_sentiment_model
+
+    if _should_preload(flask_app) and flask_app.config.get("SENTIMENT_BACKEND") == "numpy":
+        server.log.info("Preloading sentiment model in master")
+        preload_sentiment_model(flask_app)
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master process."""
+    from app import app as flask_app
+
+    # Nothing to drop if the database was never registered (LAZY_DATABASE)
+    if "sqlalchemy" not in flask_app.extensions:
+        return
+    from models import db
+
+    with flask_app.app_context():
+        # close=False leaves the parent's sockets alone; the worker just
+        # stops using them and opens its own on demand
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Load the model in each worker when it could not be shared by the master."""
+    import app as app_module
+
+    if _should_preload(app_module.app) and app_module._sentiment_model is None:
+        worker.log.info("Preloading sentiment model in worker %s", worker.pid)
+        app_module.preload_sentiment_model(app_module.app)
@@ -1,4 +1,28 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 # Setup shared DB instance
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def _sqlite_text_factory(dbapi_connection, connection_record):
+    # Return TEXT columns as str for every pooled connection, not just the first
+    dbapi_connection.text_factory = str
+
+
+def init_db(app):
+    """Register ``db`` with ``app``; no connection is opened until one is used."""
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _sqlite_text_factory)
+    return db
+
+
+def get_db(app=None):
+    """``db``, registered with ``app`` (the current app by default) on first use."""
+    app = app or current_app._get_current_object()
+    if "sqlalchemy" not in app.extensions:
+        init_db(app)
+    return db
@@ -0,0 +1,106 @@
+"""Whole-response cache for pages that render the same bytes for every request.
+
+``PageCache.serve(key, render)`` renders a page once per process, keeps its
+UTF-8 body and a gzip copy, and answers later requests from those bytes with
+a strong ``ETag`` (``304`` when it matches ``If-None-Match``). Keys name the
+variant as well as the page, e.g. ``about.html`` and ``about.txt`` for the
+HTML and curl views of ``/about``.
+
+When the app runs with template auto-reload (debug mode), the template
+folder's mtimes are compared on each request and the cache is emptied when
+one changes, so edits show up as before.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from flask import Response, request
+
+# Below this the gzip framing costs more than it saves
+MIN_GZIP_SIZE = 512
+
+
+class CachedPage(object):
+    __slots__ = ("body", "gzip_body", "etag", "gzip_etag", "mimetype")
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        compressed = gzip.compress(body, compresslevel=9, mtime=0) if len(body) >= MIN_GZIP_SIZE else None
+        if compressed is not None and len(compressed) < len(body):
+            self.gzip_body = compressed
+            # A strong ETag identifies the exact bytes, so each encoding gets its own
+            self.gzip_etag = self.etag + "-gz"
+        else:
+            self.gzip_body = self.gzip_etag = None
+
+
+class PageCache(object):
+    """Rendered pages by key, for one app."""
+
+    def __init__(self, app):
+        self.app = app
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._template_mtimes = None
+        self.hits = 0
+        self.renders = 0
+
+    def _template_signature(self):
+        signature = {}
+        for root, _, files in os.walk(os.path.join(self.app.root_path, self.app.template_folder)):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    signature[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+        return signature
+
+    def check_templates(self):
+        """Empty the cache if a template changed; returns True if it did."""
+        signature = self._template_signature()
+        with self._lock:
+            changed = self._template_mtimes is not None and signature != self._template_mtimes
+            self._template_mtimes = signature
+            if changed:
+                self._pages.clear()
+        return changed
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def get(self, key, render, mimetype="text/html"):
+        if self.app.jinja_env.auto_reload:
+            self.check_templates()
+        page = self._pages.get(key)
+        if page is None:
+            body = render()
+            page = CachedPage(body.encode("utf-8") if isinstance(body, str) else body, mimetype)
+            with self._lock:
+                # Concurrent first requests may both render; either result is the same
+                page = self._pages.setdefault(key, page)
+                self.renders += 1
+        else:
+            self.hits += 1
+        return page
+
+    def serve(self, key, render, mimetype="text/html", vary=()):
+        """A response with the cached bytes of ``key``, rendering them on the first call."""
+        page = self.get(key, render, mimetype)
+        use_gzip = page.gzip_body is not None and request.accept_encodings["gzip"] > 0
+        response = Response(page.gzip_body if use_gzip else page.body, mimetype=page.mimetype)
+        response.set_etag(page.gzip_etag if use_gzip else page.etag)
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        if page.gzip_body is not None:
+            response.vary.add("Accept-Encoding")
+        for header in vary:
+            response.vary.add(header)
+        return response.make_conditional(request)
+
+    def stats(self):
+        return {"pages": len(self._pages), "hits": self.hits, "renders": self.renders}
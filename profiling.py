@@ -0,0 +1,217 @@
+"""Opt-in profiling for running workers.
+
+Two collectors, both off by default:
+
+- ``StackSampler`` snapshots every thread's Python stack with
+  ``sys._current_frames()`` at a fixed interval and counts identical stacks.
+  The output is the "folded" format read by ``flamegraph.pl``, speedscope
+  and inferno: one ``frame;frame;frame count`` line per distinct stack. If a
+  sampling pass takes more than ``max_overhead`` of the interval, the
+  interval is stretched, so the sampler's cost stays bounded.
+- ``RequestProfiler`` runs ``cProfile`` on a random fraction of requests and
+  merges the results into a ``.prof`` file for ``pstats`` or snakeviz.
+
+Output goes to ``<instance_path>/profiles``.
+"""
+import cProfile
+import collections
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Leaf frames of threads blocked waiting for work, dropped unless idle=True
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def profile_dir(app):
+    path = os.path.join(app.instance_path, "profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _frame_name(code):
+    # Folded stacks separate frames with ';', so keep it out of names
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+class StackSampler(object):
+    """Count the Python stacks of all threads, sampled every ``interval`` seconds.
+
+    With ``dump_path`` the folded output is rewritten there every
+    ``dump_interval`` seconds while sampling runs. Threads whose ids are in
+    ``exclude`` are not sampled.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64, max_overhead=0.05, idle=False,
+                 dump_path=None, dump_interval=60.0, exclude=()):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_overhead = max_overhead
+        self.idle = idle
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.exclude = set(exclude)
+
+        self._counts = collections.Counter()
+        self._names = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.started = None
+
+    @property
+    def running(self):
+        return (self._thread is not None and self._pid == os.getpid()
+                and self._thread.is_alive())
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self._pid = os.getpid()
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self
+
+    def _run(self):
+        interval = self.interval
+        next_dump = time.monotonic() + self.dump_interval
+        while not self._stop.wait(interval):
+            start = time.perf_counter()
+            self.sample()
+            spent = time.perf_counter() - start
+            self.sampling_seconds += spent
+            # Back off rather than let sampling eat into request handling
+            interval = max(self.interval, spent / self.max_overhead)
+            if self.dump_path and time.monotonic() >= next_dump:
+                self.dump(self.dump_path)
+                next_dump = time.monotonic() + self.dump_interval
+
+    def sample(self):
+        """Take one snapshot of every other thread's stack."""
+        skip = self.exclude | {threading.get_ident()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident in skip:
+                continue
+            codes = []
+            while frame is not None and len(codes) < self.max_depth:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if not codes:
+                continue
+            leaf = codes[0]
+            if not self.idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+                continue
+            stacks.append(tuple(reversed(codes)))
+        with self._lock:
+            self._counts.update(stacks)
+            self.samples += 1
+
+    def folded(self):
+        """The collected stacks in folded format, most frequent first."""
+        with self._lock:
+            counts = self._counts.most_common()
+        lines = []
+        for codes, count in counts:
+            names = []
+            for code in codes:
+                name = self._names.get(code)
+                if name is None:
+                    name = self._names[code] = _frame_name(code)
+                names.append(name)
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def dump(self, path):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        os.replace(path + ".tmp", path)
+        return path
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": len(self._counts),
+            # Fraction of wall time spent taking samples
+            "overhead": self.sampling_seconds / elapsed if elapsed else 0.0,
+        }
+
+
+def capture(seconds, interval=0.005, idle=False):
+    """Sample the other threads for ``seconds`` and return the sampler."""
+    sampler = StackSampler(interval=interval, idle=idle,
+                           exclude=[threading.get_ident()]).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler
+
+
+class RequestProfiler(object):
+    """Merge ``cProfile`` runs of sampled requests into one ``pstats`` file.
+
+    ``cProfile`` only sees the thread that enables it, so each profiled
+    request gets its own profiler; finished ones are merged under a lock.
+    """
+
+    def __init__(self, path, dump_every=10):
+        self.path = path
+        self.dump_every = dump_every
+        self._lock = threading.Lock()
+        self._stats = None
+        self._pending = 0
+        self.requests = 0
+
+    def begin(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end(self, profile):
+        profile.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.requests += 1
+            self._pending += 1
+            if self._pending >= self.dump_every:
+                self._dump()
+
+    def _dump(self):
+        # Called with the lock held
+        self._stats.dump_stats(self.path)
+        self._pending = 0
+
+    def dump(self):
+        with self._lock:
+            if self._stats is not None:
+                self._dump()
+        return self.path
@@ -0,0 +1,215 @@
+from concurrent.futures import Future
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Queued by close() to let a worker thread exit once earlier work is done
+_STOP = object()
+
+
+def _run_inline(fn, *args):
+    """A future already holding ``fn(*args)``, for calls made after close()."""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class BatchScheduler(object):
+    """Collect concurrent predictions and run them through the model as one batch.
+
+    Callers submit single encoded tweets (rows of shape ``(140,)``). A
+    background thread waits up to ``max_wait`` seconds (or until
+    ``max_batch_size`` rows are queued), stacks the rows into one
+    ``(N, 140)`` array, calls ``predict`` once and hands every caller its
+    own slice of the outputs.
+    """
+
+    def __init__(self, predict, max_batch_size=32, max_wait=0.005):
+        self._predict = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+        self._sizes = collections.Counter()
+
+    def _ensure_started(self):
+        # Called with the lock held. Threads do not survive a fork, so restart
+        # the worker in each process
+        if self._thread is None or self._pid != os.getpid():
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run,
+                                            args=(self._queue,),
+                                            name="sentiment-batcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def submit(self, x):
+        """Queue a single encoded tweet and return a future for its outputs."""
+        x = np.asarray(x)
+        with self._lock:
+            if not self.closed:
+                self._ensure_started()
+                future = Future()
+                self._queue.put((x, future))
+                return future
+        # A request still holding a replaced model: don't start a thread nobody will stop
+        return _run_inline(lambda: tuple(out[0] for out in self._predict(x[np.newaxis])))
+
+    def predict(self, x):
+        """Drop-in replacement for ``model.predict`` that goes through the queue."""
+        futures = [self.submit(row) for row in x]
+        results = [f.result() for f in futures]
+        scores = np.stack([r[0] for r in results])
+        sentiment = np.stack([r[1] for r in results])
+        return scores, sentiment
+
+    def close(self):
+        """Stop the worker thread after it has answered everything already queued.
+
+        Later submits run on the caller's thread.
+        """
+        with self._lock:
+            self.closed = True
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(_STOP)
+            self._thread = None
+
+    def _collect(self, q):
+        """Up to ``max_batch_size`` queued items, and whether close() was called."""
+        item = q.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self, q):
+        stop = False
+        while not stop:
+            batch, stop = self._collect(q)
+            if not batch:
+                continue
+            futures = [f for _, f in batch]
+            try:
+                x = np.stack([row for row, _ in batch])
+                scores, sentiment = self._predict(x)
+            except Exception as e:
+                logging.error("Batched prediction failed: %s", str(e))
+                for f in futures:
+                    f.set_exception(e)
+                continue
+
+            self._record(len(batch))
+            for i, f in enumerate(futures):
+                f.set_result((scores[i], sentiment[i]))
+
+    def _record(self, size):
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._largest = max(self._largest, size)
+            self._sizes[size] += 1
+
+    def stats(self):
+        """Return batch-size statistics collected so far."""
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest,
+                "batch_sizes": {str(k): v for k, v in sorted(self._sizes.items())},
+            }
+
+
+class InferenceThread(object):
+    """Run every model call on one dedicated thread.
+
+    Request threads (e.g. gunicorn gthread workers) only wait on a future,
+    so TensorFlow always sees the same thread and no request thread is held
+    inside it when the model is busy.
+    """
+
+    def __init__(self, predict):
+        self._predict = predict
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self.closed = False
+        self.calls = 0
+
+    def _ensure_started(self):
+        # Same locking and fork handling as BatchScheduler
+        if self._thread is None or self._pid != os.getpid():
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run,
+                                            args=(self._queue,),
+                                            name="sentiment-inference",
+                                            daemon=True)
+            self._thread.start()
+
+    def submit(self, x):
+        with self._lock:
+            if not self.closed:
+                self._ensure_started()
+                future = Future()
+                self._queue.put((x, future))
+                return future
+        return _run_inline(self._predict, x)
+
+    def predict(self, x):
+        return self.submit(x).result()
+
+    def close(self):
+        """Stop the thread once the calls already queued have run; later calls run inline."""
+        with self._lock:
+            self.closed = True
+            if self._thread is not None and self._pid == os.getpid():
+                self._queue.put(_STOP)
+            self._thread = None
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            x, future = item
+            try:
+                result = self._predict(x)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.calls += 1
+            future.set_result(result)
@@ -0,0 +1,182 @@
+"""Flat, memory-mappable weight bundles for the NumPy sentiment model.
+
+A bundle is a directory holding ``weights.bin`` (every array back to back,
+each aligned to 64 bytes) and ``manifest.json`` (offsets, shapes, dtypes and
+the activations). Workers open ``weights.bin`` with ``np.memmap``, so the
+pages are shared through the OS page cache instead of each gunicorn worker
+parsing HDF5 and holding its own copy.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from .numpy_model import NumpyLSTMModel
+
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+WEIGHTS_FILE = "weights.bin"
+MANIFEST_FILE = "manifest.json"
+DTYPES = ("float32", "float16", "int8")
+
+# Arrays needed at inference time; the embedding and input kernel are folded
+# into the precomputed projection table.
+SMALL_ARRAYS = ("lstm_recurrent_kernel", "emoji_kernel", "emoji_bias",
+                "sentiment_kernel", "sentiment_bias")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_sha_cache = {}
+
+
+def cached_sha256(path):
+    """``file_sha256`` memoized on the file's size and mtime."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_ino, st.st_size, st.st_mtime_ns)
+    if key in _sha_cache:
+        return _sha_cache[key]
+    digest = file_sha256(path)
+    # Like git's racy-clean check: a file modified within the timestamp
+    # granularity could change again without its mtime moving
+    if time.time() - st.st_mtime > 2:
+        _sha_cache[key] = digest
+    return digest
+
+
+def quantize_rows(a):
+    """Symmetric per-row int8 quantization, returning ``(values, scales)``."""
+    a = np.asarray(a, dtype=np.float32)
+    scale = np.abs(a).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.round(a / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+def _bundle_arrays(model, dtype):
+    projection = np.asarray(model.projection, dtype=np.float32)
+    arrays = {}
+    if dtype == "int8":
+        arrays["projection"], arrays["projection_scale"] = quantize_rows(projection)
+    else:
+        arrays["projection"] = projection.astype(dtype)
+
+    # The small matrices stay float32 unless everything is stored as float16
+    small_dtype = "float16" if dtype == "float16" else "float32"
+    for name in SMALL_ARRAYS:
+        arrays[name] = np.asarray(model.weights[name]).astype(small_dtype)
+    return arrays
+
+
+def sample_inputs(n=256, length=140, vocab=5000, seed=0):
+    """Deterministic left-padded token sequences for accuracy checks."""
+    rng = np.random.default_rng(seed)
+    x = rng.integers(1, vocab, size=(n, length))
+    lengths = rng.integers(0, length + 1, size=n)
+    x[np.arange(length)[None, :] < (length - lengths)[:, None]] = 0
+    return x
+
+
+def accuracy_delta(reference, candidate, x=None):
+    """Max absolute output difference between two models on sample inputs."""
+    x = sample_inputs() if x is None else x
+    ref_emoji, ref_sentiment = reference.predict(x)
+    emoji, sentiment = candidate.predict(x)
+    return {
+        "emoji_max_abs_error": float(np.abs(ref_emoji - emoji).max()),
+        "sentiment_max_abs_error": float(np.abs(ref_sentiment - sentiment).max()),
+    }
+
+
+def write_bundle(model, out_dir, dtype="float32", source=None):
+    """Write ``model`` (a NumpyLSTMModel) as a bundle and return its manifest."""
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported bundle dtype {dtype!r}, expected one of {DTYPES}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = _bundle_arrays(model, dtype)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "dtype": dtype,
+        "activation": model.activation,
+        "recurrent_activation": model.recurrent_activation,
+        "source": source,
+        "arrays": {},
+    }
+
+    weights_path = os.path.join(out_dir, WEIGHTS_FILE)
+    tmp_path = weights_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for name, a in arrays.items():
+            pad = -f.tell() % ALIGNMENT
+            f.write(b"\0" * pad)
+            manifest["arrays"][name] = {
+                "offset": f.tell(),
+                "shape": list(a.shape),
+                "dtype": a.dtype.str,
+            }
+            f.write(np.ascontiguousarray(a).tobytes())
+    os.replace(tmp_path, weights_path)
+
+    if dtype != "float32":
+        manifest["accuracy"] = accuracy_delta(model, load_bundle(out_dir, manifest))
+
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+def export_bundle(h5_path, out_dir, dtype="float32"):
+    """Compile a Keras ``.h5`` model into a bundle directory."""
+    model = NumpyLSTMModel.from_h5(h5_path)
+    source = {"path": os.path.basename(h5_path), "sha256": file_sha256(h5_path)}
+    return write_bundle(model, out_dir, dtype=dtype, source=source)
+
+
+def read_manifest(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format in {bundle_dir}")
+    return manifest
+
+
+def load_bundle(bundle_dir, manifest=None):
+    """Open a bundle as a NumpyLSTMModel backed by a read-only memory map."""
+    manifest = manifest or read_manifest(bundle_dir)
+    raw = np.memmap(os.path.join(bundle_dir, WEIGHTS_FILE), dtype=np.uint8, mode="r")
+
+    weights = {}
+    for name, spec in manifest["arrays"].items():
+        a = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]),
+                       buffer=raw, offset=spec["offset"])
+        # Only the large projection table is used straight from the mapping;
+        # the small matrices are cheap to upcast into private float32 copies.
+        if name in SMALL_ARRAYS and a.dtype != np.float32:
+            a = a.astype(np.float32)
+        weights[name] = a
+
+    return NumpyLSTMModel(weights,
+                          activation=manifest["activation"],
+                          recurrent_activation=manifest["recurrent_activation"])
+
+
+def bundle_matches(bundle_dir, h5_path):
+    """True if ``bundle_dir`` holds a bundle compiled from ``h5_path``."""
+    try:
+        manifest = read_manifest(bundle_dir)
+    except (OSError, ValueError):
+        return False
+    source = manifest.get("source") or {}
+    return os.path.exists(h5_path) and source.get("sha256") == cached_sha256(h5_path)
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class PredictionCache(object):
+    """Bounded LRU cache of raw model outputs keyed on encoded tweets.
+
+    Keys are the bytes of the 140-int feature vector from ``Tweet.x`` rather
+    than the raw text, so inputs that only differ by stripped emojis share an
+    entry. Entries optionally expire after ``ttl`` seconds, and the whole
+    cache is dropped when the watched model file changes on disk.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, watch_path=None,
+                 check_interval=1.0, clock=time.monotonic):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl if ttl else None
+        self.watch_path = watch_path
+        self.check_interval = check_interval
+        self._clock = clock
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._next_check = clock() + check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(x):
+        return np.ascontiguousarray(x, dtype=np.int64).tobytes()
+
+    def _stat(self):
+        if not self.watch_path:
+            return None
+        try:
+            st = os.stat(self.watch_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _check_source(self, now):
+        # Called with the lock held; stat the model file at most once per interval
+        if self.watch_path is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._stat()
+        if signature != self._signature:
+            self._signature = signature
+            self._data.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        """Return the cached ``(scores, sentiment)`` rows for ``key`` or None."""
+        with self._lock:
+            now = self._clock()
+            self._check_source(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires is not None and expires <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            expires = self._clock() + self.ttl if self.ttl else None
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,100 @@
+# Command line tools for the sentiment module, available as `flask sentiment ...`
+import click
+from flask.cli import AppGroup
+
+sentiment_cli = AppGroup("sentiment", help="Sentiment model maintenance commands.")
+
+
+@sentiment_cli.command("export-bundle")
+@click.option("--dtype", type=click.Choice(["float32", "float16", "int8"]),
+              default="float32", show_default=True,
+              help="Storage type for the weights.")
+@click.option("--output", type=click.Path(file_okay=False), default=None,
+              help="Bundle directory (defaults to data/model_bundle).")
+def export_bundle_command(dtype, output):
+    """Compile data/model.h5 into a memory-mappable weight bundle."""
+    from .bundle import export_bundle
+    from .ml import data_path
+
+    output = output or data_path("model_bundle")
+    manifest = export_bundle(data_path("model.h5"), output, dtype=dtype)
+
+    click.echo(f"Wrote {dtype} bundle to {output}")
+    for name, error in manifest.get("accuracy", {}).items():
+        click.echo(f"  {name}: {error:.3g}")
+
+
+@sentiment_cli.command("build-features")
+@click.option("--chunk-size", type=int, default=10000, show_default=True,
+              help="Tweets encoded per database query.")
+def build_features_command(chunk_size):
+    """Encode new tweets from the database into data/features."""
+    from models import get_db
+    from .feature_store import FeatureStore
+    from .ml import data_path
+
+    store = FeatureStore(data_path("features"))
+    added = store.update(get_db().session, chunk_size=chunk_size)
+    click.echo(f"Encoded {added} new tweets ({store.rows} total, last id {store.last_id})")
+
+
+@sentiment_cli.command("ingest")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), default=None,
+              help="Input format (guessed from the file extension by default).")
+@click.option("--chunk-size", type=int, default=20000, show_default=True,
+              help="Lines per worker task and per database transaction.")
+@click.option("--workers", type=int, default=None,
+              help="Featurization processes (defaults to the CPU count, 0 runs inline).")
+@click.option("--features/--no-features", default=True, show_default=True,
+              help="Also append the encoded tweets to data/features.")
+@click.option("--restart", is_flag=True,
+              help="Ignore the saved checkpoint and read the file from the start.")
+def ingest_command(path, fmt, chunk_size, workers, features, restart):
+    """Bulk load raw tweets from a JSONL or CSV file, resuming where the last run stopped."""
+    import time
+
+    from models import get_db
+    from .feature_store import FeatureStore
+    from .ingest import ingest
+    from .ml import data_path
+
+    last_report = [time.perf_counter()]
+
+    def progress(stats):
+        now = time.perf_counter()
+        if now - last_report[0] >= 5:
+            last_report[0] = now
+            click.echo(f"  {stats['rows']:,} rows  {stats['rows_per_second']:,.0f} rows/s")
+
+    store = FeatureStore(data_path("features")) if features else None
+    stats = ingest(get_db().engine, path, fmt=fmt, chunk_size=chunk_size, workers=workers,
+                   store=store, restart=restart, progress=progress)
+    click.echo(f"Loaded {stats['rows']:,} tweets in {stats['seconds']:.1f}s "
+               f"({stats['rows_per_second']:,.0f} rows/s, {stats['skipped']:,} skipped, "
+               f"{stats['total']:,} from this file in total)")
+
+
+@sentiment_cli.command("export-stats")
+def export_stats_command():
+    """Store the baseline and corpus emoji priors for data/model.h5 beside it."""
+    from sqlalchemy import inspect
+
+    from models import get_db
+    from .feature_store import FeatureStore
+    from .ml import SentimentModel, data_path
+    from .models import Tweet
+    from .pipeline import iter_tweets
+
+    db = get_db()
+    # The NumPy backend reproduces Keras without importing TensorFlow
+    model = SentimentModel(model="numpy")
+    if FeatureStore.exists(data_path("features")):
+        stats = model.export_stats(store=FeatureStore(data_path("features")))
+    elif inspect(db.engine).has_table(Tweet.__tablename__):
+        stats = model.export_stats(texts=iter_tweets(db.engine))
+    else:
+        stats = model.export_stats()
+
+    click.echo(f"Wrote {model.stats_path} for model {stats['model_sha256'][:12]} "
+               f"({stats['corpus_rows']:,} tweets in the emoji priors)")
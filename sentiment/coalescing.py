@@ -0,0 +1,54 @@
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight(object):
+    """Share one in-flight prediction between concurrent callers with the same key.
+
+    The first caller to ``claim`` a key owns it and must ``resolve`` (or
+    ``fail``) it; callers that claim the same key meanwhile get a future for
+    the owner's result instead of running the model again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def claim(self, keys):
+        """Split ``keys`` into ones this caller computes and futures for the rest."""
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is None:
+                    self._inflight[key] = Future()
+                    owned.append(key)
+                else:
+                    waiting[key] = future
+            self.leaders += len(owned)
+            self.coalesced += len(waiting)
+        return owned, waiting
+
+    def resolve(self, results):
+        """Publish ``{key: result}`` for keys this caller owns."""
+        with self._lock:
+            futures = [(self._inflight.pop(key), result) for key, result in results.items()]
+        for future, result in futures:
+            future.set_result(result)
+
+    def fail(self, keys, error):
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys if key in self._inflight]
+        for future in futures:
+            future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,132 @@
+"""Vectorized featurization of raw tweets.
+
+Encodes whole batches of strings in one pass: the concatenated batch is
+turned into code points with a single ``str.encode``, emojis are found with
+one sorted lookup over those code points, and every result is scattered
+straight into a preallocated NumPy buffer. ``Tweet.x``/``Tweet.y`` and the
+training generators are thin wrappers around these functions.
+"""
+import numpy as np
+
+from .emojis import emojis, positive_emojis, negative_emojis
+
+SEQUENCE_LENGTH = 140
+VOCAB_SIZE = 5000
+
+# The code-point lookups and translate table below rely on this
+assert all(len(e) == 1 for e in emojis), "emojis must be single code points"
+
+EMOJI_INDEX = {e: i for i, e in enumerate(emojis)}
+_STRIP_TABLE = {ord(e): None for e in emojis}
+
+# Sorted emoji code points and the emoji index for each, for searchsorted lookups
+_EMOJI_CODES = np.array(sorted(ord(e) for e in emojis), dtype=np.uint32)
+_EMOJI_CODE_INDEX = np.array([EMOJI_INDEX[chr(c)] for c in _EMOJI_CODES], dtype=np.intp)
+
+# Sentiment class per emoji index: 0 positive, 1 neutral, 2 negative
+SENTIMENT_CLASS = np.array([0 if e in positive_emojis else 2 if e in negative_emojis else 1
+                            for e in emojis], dtype=np.intp)
+
+
+def strip_emojis(text):
+    return text.translate(_STRIP_TABLE)
+
+
+def _code_points(texts):
+    """Concatenated code points of ``texts`` and the length of each text."""
+    lengths = np.fromiter(map(len, texts), dtype=np.intp, count=len(texts))
+    joined = "".join(texts).encode("utf-32-le", "surrogatepass")
+    return np.frombuffer(joined, dtype=np.uint32), lengths
+
+
+def _emoji_lookup(codes):
+    """Mask of code points that are emojis, and their positions in the sorted lookup."""
+    pos = np.searchsorted(_EMOJI_CODES, codes)
+    pos[pos == len(_EMOJI_CODES)] = 0
+    return _EMOJI_CODES[pos] == codes, pos
+
+
+def encode_texts(texts, length=SEQUENCE_LENGTH, out=None):
+    """Encode raw tweets as left-padded ``(N, length)`` int32 character ids.
+
+    Matches ``Tweet.x``: emojis are removed, the first ``length`` characters
+    are kept and right-aligned, and each character becomes ``ord(c) % 5000``.
+    """
+    n = len(texts)
+    if out is None:
+        out = np.zeros((n, length), dtype=np.int32)
+    else:
+        out[...] = 0
+
+    if n == 1:
+        # Scoring a single request: plain string ops beat the batch machinery
+        text = texts[0].translate(_STRIP_TABLE)[:length]
+        if text:
+            codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+            out[0, length - len(codes):] = codes % VOCAB_SIZE
+        return out
+
+    codes, lengths = _code_points(texts)
+    if len(codes) == 0:
+        return out
+
+    # Drop emojis, then find each remaining character's offset within its text
+    is_emoji, _ = _emoji_lookup(codes)
+    rows = np.repeat(np.arange(n), lengths)[~is_emoji]
+    codes = codes[~is_emoji]
+    kept = np.bincount(rows, minlength=n)
+    offsets = np.arange(len(codes)) - (np.cumsum(kept) - kept)[rows]
+
+    # Keep the first `length` characters and right-align them
+    keep = offsets < length
+    rows, offsets, codes = rows[keep], offsets[keep], codes[keep]
+    padding = length - np.minimum(kept, length)
+    out[rows, offsets + padding[rows]] = codes % VOCAB_SIZE
+    return out
+
+
+def encode_labels(texts, out=None):
+    """Multi-hot ``(N, n_emojis)`` float32 matrix of the emojis in each tweet."""
+    n = len(texts)
+    if out is None:
+        out = np.zeros((n, len(emojis)), dtype=np.float32)
+    else:
+        out[...] = 0
+
+    codes, lengths = _code_points(texts)
+    if len(codes) == 0:
+        return out
+
+    hit, pos = _emoji_lookup(codes)
+    rows = np.repeat(np.arange(n), lengths)
+    out[rows[hit], _EMOJI_CODE_INDEX[pos[hit]]] = 1
+    return out
+
+
+def emoji_indices(text):
+    """Sorted indices into ``emojis`` of the emojis present in ``text``."""
+    return sorted(EMOJI_INDEX[c] for c in set(text) if c in EMOJI_INDEX)
+
+
+def encode_sentiment(labels, rng=np.random, out=None):
+    """One-hot sentiment from a random emoji of each tweet, like ``Tweet.sentiment``.
+
+    ``labels`` is the multi-hot matrix from ``encode_labels``. Rows without
+    any emoji are all zeros.
+    """
+    n = len(labels)
+    if out is None:
+        out = np.zeros((n, 3), dtype=np.float32)
+    else:
+        out[...] = 0
+
+    rows, cols = np.nonzero(labels)
+    counts = np.bincount(rows, minlength=n)
+    has = np.flatnonzero(counts)
+    if len(has) == 0:
+        return out
+
+    starts = np.cumsum(counts) - counts
+    pick = starts[has] + (rng.random(len(has)) * counts[has]).astype(np.intp)
+    out[has, SENTIMENT_CLASS[cols[pick]]] = 1
+    return out
@@ -0,0 +1,202 @@
+"""Precomputed, memory-mapped training features for the tweets table.
+
+The store is a directory of flat arrays encoded once from ``tweets.db``:
+
+- ``ids.int64``            (N,)      tweet ids, ascending
+- ``x.int32``              (N, 140)  ``encode_texts`` output
+- ``y.bits``               (N, 13)   emoji labels packed with ``np.packbits``
+- ``emoji_offsets.int64``  (N + 1,)  CSR offsets into ``emoji_index``
+- ``emoji_index.uint8``    (M,)      emoji indices per tweet, for sentiment sampling
+- ``manifest.json``        row counts and the last encoded id
+
+``update`` only encodes rows with ids above the last one already stored and
+appends them, so rebuilding after new tweets arrive is incremental. The
+manifest is written last, so an interrupted update is rolled back the next
+time the store is opened for writing.
+"""
+import json
+import os
+
+import numpy as np
+from sqlalchemy import select
+
+from .emojis import emojis
+from .encoder import SENTIMENT_CLASS, SEQUENCE_LENGTH, encode_labels, encode_texts
+from .models import Tweet
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+LABEL_BYTES = (len(emojis) + 7) // 8
+
+# name -> (dtype, trailing shape)
+ARRAYS = {
+    "ids.int64": (np.int64, ()),
+    "x.int32": (np.int32, (SEQUENCE_LENGTH,)),
+    "y.bits": (np.uint8, (LABEL_BYTES,)),
+    "emoji_offsets.int64": (np.int64, ()),
+    "emoji_index.uint8": (np.uint8, ()),
+}
+
+
+class FeatureStore(object):
+    """Packed on-disk training features, streamed through ``np.memmap``."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = self._read_manifest()
+        self._maps = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path(MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"format": FORMAT_VERSION, "rows": 0, "emoji_count": 0, "last_id": 0}
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store format in {self.directory}")
+        return manifest
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+    @property
+    def rows(self):
+        return self.manifest["rows"]
+
+    @property
+    def last_id(self):
+        return self.manifest["last_id"]
+
+    def __len__(self):
+        return self.rows
+
+    def _lengths(self):
+        """Number of elements each file should hold according to the manifest."""
+        rows, emoji_count = self.manifest["rows"], self.manifest["emoji_count"]
+        return {
+            "ids.int64": rows,
+            "x.int32": rows,
+            "y.bits": rows,
+            "emoji_offsets.int64": rows + 1,
+            "emoji_index.uint8": emoji_count,
+        }
+
+    def _prepare_for_append(self):
+        """Create missing files and cut off anything past the manifest.
+
+        A new offsets file is zero-filled to one entry, which is its leading 0.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for name, count in self._lengths().items():
+            dtype, shape = ARRAYS[name]
+            size = count * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(self._path(name), "ab") as f:
+                f.truncate(size)
+
+    def append(self, ids, raw_tweets):
+        """Encode ``raw_tweets`` and append them with their (increasing) ``ids``."""
+        if len(ids) == 0:
+            return 0
+        return self.append_encoded(ids, encode_texts(raw_tweets), encode_labels(raw_tweets))
+
+    def append_encoded(self, ids, x, labels):
+        """Append rows already run through ``encode_texts`` and ``encode_labels``."""
+        if len(ids) == 0:
+            return 0
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids[0] <= self.last_id or np.any(np.diff(ids) <= 0):
+            raise ValueError("Feature store ids must be strictly increasing")
+
+        self._prepare_for_append()
+        rows, emoji_index = np.nonzero(labels)
+        offsets = np.cumsum(np.bincount(rows, minlength=len(ids))) + self.manifest["emoji_count"]
+
+        chunks = {
+            "ids.int64": ids,
+            "x.int32": x,
+            "y.bits": np.packbits(labels.astype(np.uint8), axis=1),
+            "emoji_offsets.int64": offsets.astype(np.int64),
+            "emoji_index.uint8": emoji_index.astype(np.uint8),
+        }
+        for name, a in chunks.items():
+            with open(self._path(name), "ab") as f:
+                f.write(np.ascontiguousarray(a, dtype=ARRAYS[name][0]).tobytes())
+
+        self.manifest["rows"] += len(ids)
+        self.manifest["emoji_count"] += len(emoji_index)
+        self.manifest["last_id"] = int(ids[-1])
+        self._write_manifest()
+        self._maps = None
+        return len(ids)
+
+    def _write_manifest(self):
+        path = self._path(MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def update(self, session, chunk_size=10000):
+        """Encode tweets newer than ``last_id`` from the database. Returns rows added."""
+        added = 0
+        while True:
+            query = (select(Tweet.id, Tweet.raw_tweet)
+                     .where(Tweet.id > self.last_id)
+                     .order_by(Tweet.id)
+                     .limit(chunk_size))
+            result = session.execute(query).all()
+            if not result:
+                return added
+            ids = [row[0] for row in result]
+            texts = [row[1] or "" for row in result]
+            added += self.append(ids, texts)
+
+    def arrays(self):
+        """Read-only memory maps of every array, sized by the manifest."""
+        if self._maps is None:
+            maps = {}
+            for name, count in self._lengths().items():
+                dtype, shape = ARRAYS[name]
+                if count == 0:
+                    maps[name] = np.zeros((0,) + shape, dtype=dtype)
+                else:
+                    maps[name] = np.memmap(self._path(name), dtype=dtype, mode="r",
+                                           shape=(count,) + shape)
+            self._maps = maps
+        return self._maps
+
+    def features(self, idx):
+        return np.asarray(self.arrays()["x.int32"][idx])
+
+    def labels(self, idx):
+        bits = self.arrays()["y.bits"][idx]
+        return np.unpackbits(bits, axis=1, count=len(emojis)).astype(np.float32)
+
+    def sentiment(self, idx, rng=np.random):
+        """One-hot sentiment from a randomly chosen emoji of each row."""
+        arrays = self.arrays()
+        offsets, emoji_index = arrays["emoji_offsets.int64"], arrays["emoji_index.uint8"]
+        start, end = offsets[idx], offsets[np.asarray(idx) + 1]
+        counts = end - start
+
+        out = np.zeros((len(start), 3), dtype=np.float32)
+        has = np.flatnonzero(counts)
+        pick = start[has] + (rng.random(len(has)) * counts[has]).astype(np.int64)
+        out[has, SENTIMENT_CLASS[emoji_index[pick]]] = 1
+        return out
+
+    def batches(self, batch_size=100, rng=np.random, epochs=None):
+        """Yield shuffled ``(x, [y, sentiment])`` training batches forever (or ``epochs`` times)."""
+        if self.rows < batch_size:
+            raise ValueError(f"Feature store has {self.rows} rows, fewer than one batch")
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            order = rng.permutation(self.rows)
+            for start in range(0, self.rows - batch_size + 1, batch_size):
+                # Sorted indices read the memory maps front to back
+                idx = np.sort(order[start:start + batch_size])
+                yield self.features(idx), [self.labels(idx), self.sentiment(idx, rng)]
+            epoch += 1
@@ -0,0 +1,251 @@
+"""Bulk loading of raw tweets into the tweets table.
+
+A JSONL or CSV file is read in chunks of lines, and the chunks are parsed
+and featurized on a process pool. The main process only reads the file and
+writes each chunk to the database in a single ``executemany`` transaction.
+Alongside every batch it records the byte offset reached in
+``ingest_checkpoint``, so an interrupted load resumes after the last
+committed chunk. Tweets are given explicit ids, which lets the feature
+store be extended in the same pass.
+
+Input files must hold one record per line. CSV records can't contain
+newlines inside quoted fields.
+"""
+import collections
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .encoder import encode_labels, encode_texts
+from .models import IngestCheckpoint, Tweet
+
+FORMATS = ("jsonl", "csv")
+TEXT_FIELDS = ("text", "full_text", "raw_tweet")
+
+_decode_json = json.JSONDecoder().decode
+
+
+def detect_format(path):
+    name = path.lower()
+    if name.endswith(".gz"):
+        raise ValueError("Decompress the input first; resuming needs byte offsets")
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ValueError(f"Can't tell the format of {path}, pass --format")
+
+
+def _json_text(line):
+    record = _decode_json(line.decode("utf-8", "replace"))
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        for field in TEXT_FIELDS:
+            if isinstance(record.get(field), str):
+                return record[field]
+    return None
+
+
+def parse_lines(lines, fmt, column=None):
+    """Tweet texts in ``lines`` (bytes) and the number of records skipped."""
+    texts, skipped = [], 0
+    if fmt == "csv":
+        rows = csv.reader(line.decode("utf-8", "replace") for line in lines)
+        for row in rows:
+            if column < len(row) and row[column]:
+                texts.append(row[column])
+            elif row:
+                skipped += 1
+        return texts, skipped
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            text = _json_text(line)
+        except ValueError:
+            text = None
+        if text:
+            texts.append(text)
+        else:
+            skipped += 1
+    return texts, skipped
+
+
+def featurize_chunk(lines, fmt, column=None, encode=True):
+    """Worker task: parse a chunk of lines and optionally encode its features."""
+    texts, skipped = parse_lines(lines, fmt, column)
+    if not encode or not texts:
+        return texts, None, None, skipped
+    return texts, encode_texts(texts), encode_labels(texts).astype(bool), skipped
+
+
+def csv_text_column(header):
+    row = next(csv.reader([header.decode("utf-8-sig")]))
+    for field in TEXT_FIELDS:
+        if field in row:
+            return row.index(field)
+    raise ValueError(f"CSV header needs one of the columns {', '.join(TEXT_FIELDS)}")
+
+
+def read_chunks(f, chunk_size):
+    """Yield ``(lines, end_offset)`` chunks of up to ``chunk_size`` lines from a binary file."""
+    while True:
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) == chunk_size:
+                break
+        if not lines:
+            return
+        yield lines, f.tell()
+
+
+def _in_order(pool, chunks, in_flight, *args):
+    """Featurize ``chunks`` on ``pool`` with at most ``in_flight`` pending, in file order."""
+    pending = collections.deque()
+    for lines, end in chunks:
+        pending.append((pool.submit(featurize_chunk, lines, *args), end))
+        if len(pending) >= in_flight:
+            future, end = pending.popleft()
+            yield future.result() + (end,)
+    while pending:
+        future, end = pending.popleft()
+        yield future.result() + (end,)
+
+
+def fast_load(connection):
+    """WAL journaling and no fsync per commit while bulk loading into SQLite.
+
+    Returns the ``(journal_mode, synchronous)`` settings to hand back to
+    ``finish_load``, or None for other databases.
+    """
+    if connection.dialect.name != "sqlite":
+        return None
+    previous = (connection.exec_driver_sql("PRAGMA journal_mode").scalar(),
+                connection.exec_driver_sql("PRAGMA synchronous").scalar())
+    connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+    connection.exec_driver_sql("PRAGMA synchronous=OFF")
+    connection.commit()
+    return previous
+
+
+def finish_load(connection, previous):
+    """Checkpoint the WAL and restore the settings ``fast_load`` replaced.
+
+    A database left in WAL mode needs to create ``-wal``/``-shm`` files next
+    to it, which fails on a read-only deploy such as App Engine's.
+    """
+    if previous is None:
+        return
+    journal_mode, synchronous = previous
+    connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.exec_driver_sql(f"PRAGMA journal_mode={journal_mode}")
+    connection.exec_driver_sql(f"PRAGMA synchronous={int(synchronous)}")
+    connection.commit()
+
+
+def insert_tweets(connection, ids, texts):
+    """``executemany`` insert; positional driver SQL skips per-row Core compilation."""
+    if connection.dialect.paramstyle == "qmark":
+        sql = str(insert(Tweet.__table__).compile(dialect=connection.dialect))
+        connection.exec_driver_sql(sql, list(zip(ids, texts)))
+    else:
+        connection.execute(insert(Tweet.__table__),
+                           [{"id": i, "raw_tweet": t} for i, t in zip(ids, texts)])
+
+
+def read_checkpoint(connection, source):
+    return connection.execute(
+        select(IngestCheckpoint.offset, IngestCheckpoint.rows, IngestCheckpoint.last_id)
+        .where(IngestCheckpoint.source == source)).one_or_none()
+
+
+def _save_checkpoint(connection, source, offset, rows, last_id):
+    values = {"offset": offset, "rows": rows, "last_id": last_id}
+    result = connection.execute(update(IngestCheckpoint)
+                                .where(IngestCheckpoint.source == source).values(**values))
+    if result.rowcount == 0:
+        connection.execute(insert(IngestCheckpoint).values(source=source, **values))
+
+
+def ingest(engine, path, fmt=None, chunk_size=20000, workers=None, store=None,
+           restart=False, progress=None):
+    """Load the tweets in ``path`` into the database behind ``engine``.
+
+    ``workers`` processes parse and encode the chunks (``0`` does it inline).
+    When ``store`` is a ``FeatureStore`` the encoded features are appended to
+    it as well. ``progress`` is called with a stats dict after every chunk.
+    Returns the final stats.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}")
+    source = os.path.abspath(path)
+
+    Tweet.__table__.create(engine, checkfirst=True)
+    IngestCheckpoint.__table__.create(engine, checkfirst=True)
+
+    with engine.connect() as connection:
+        previous = fast_load(connection)
+        checkpoint = None if restart else read_checkpoint(connection, source)
+        offset, total = (checkpoint.offset, checkpoint.rows) if checkpoint else (0, 0)
+        last_id = connection.execute(select(func.max(Tweet.id))).scalar() or 0
+        connection.commit()
+
+        if store is not None:
+            # Catch up on rows committed after the last features were written
+            with Session(connection) as session:
+                store.update(session)
+
+        stats = {"rows": 0, "skipped": 0, "total": total, "offset": offset,
+                 "seconds": 0.0, "rows_per_second": 0.0}
+        start = time.perf_counter()
+
+        with open(path, "rb") as f:
+            column = csv_text_column(f.readline()) if fmt == "csv" else None
+            f.seek(max(offset, f.tell()))
+            chunks = read_chunks(f, chunk_size)
+
+            args = (fmt, column, store is not None)
+            pool = None
+            if workers == 0:
+                results = (featurize_chunk(lines, *args) + (end,) for lines, end in chunks)
+            else:
+                workers = workers or os.cpu_count() or 1
+                pool = ProcessPoolExecutor(max_workers=workers)
+                results = _in_order(pool, chunks, 2 * workers, *args)
+
+            try:
+                for texts, x, labels, skipped, end in results:
+                    ids = range(last_id + 1, last_id + 1 + len(texts))
+                    with connection.begin():
+                        if texts:
+                            insert_tweets(connection, ids, texts)
+                        _save_checkpoint(connection, source, end, total + len(texts),
+                                         last_id + len(texts))
+                    if store is not None and texts:
+                        store.append_encoded(ids, x, labels)
+
+                    last_id += len(texts)
+                    total += len(texts)
+                    stats["rows"] += len(texts)
+                    stats["skipped"] += skipped
+                    stats["total"] = total
+                    stats["offset"] = end
+                    stats["seconds"] = time.perf_counter() - start
+                    stats["rows_per_second"] = stats["rows"] / max(stats["seconds"], 1e-9)
+                    if progress is not None:
+                        progress(stats)
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+                finish_load(connection, previous)
+
+    return stats
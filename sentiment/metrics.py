@@ -0,0 +1,240 @@
+"""Low-overhead request timing and Prometheus-style metrics.
+
+Code on the scoring path wraps its steps in ``phase("predict")`` and so on.
+While a request is being traced (``start_trace``), each phase adds its
+``perf_counter`` duration to the request's ``Trace``; outside a request a
+phase does nothing but the two timer reads. Finished traces are folded into
+histograms per route and phase.
+
+Histograms and counters are kept per thread, so recording never takes a
+lock; ``Metrics.render`` merges the per-thread shards when ``/metrics`` is
+scraped. Shards of threads that have exited are folded into one shared
+shard at that point, so servers that start a thread per request don't
+accumulate them. Values are per process: with several gunicorn workers each one
+reports its own.
+"""
+import bisect
+import os
+import threading
+import time
+import weakref
+
+# Upper bounds in seconds, from sub-millisecond featurization to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+
+class Trace(object):
+    """Seconds spent in each phase of one request."""
+
+    __slots__ = ("start", "phases")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total=None):
+        """``Server-Timing`` header value, durations in milliseconds."""
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+def start_trace():
+    _local.trace = Trace()
+    return _local.trace
+
+
+def end_trace():
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+class phase(object):
+    """Context manager adding the time spent in its block to the current trace."""
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.add(self.name, time.perf_counter() - self._start)
+        return False
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class _Shard(object):
+    """One thread's histograms and counters; only that thread writes to it."""
+
+    def __init__(self, thread=None):
+        self.pid = os.getpid()
+        self.histograms = {}
+        self.counters = {}
+        self._thread = weakref.ref(thread) if thread is not None else None
+
+    def alive(self):
+        thread = self._thread() if self._thread is not None else None
+        return thread is not None and thread.is_alive()
+
+    def merge(self, other, size):
+        """Add ``other``'s values into this shard."""
+        for key, h in list(other.histograms.items()):
+            merged = self.histograms.get(key)
+            if merged is None:
+                merged = self.histograms[key] = _Histogram(size)
+            merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+            merged.sum += h.sum
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                     for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Metrics(object):
+    """Histograms and counters aggregated per thread, rendered in the Prometheus text format.
+
+    Labels are passed as tuples of ``(name, value)`` pairs.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        # Values recorded by threads that have exited
+        self._retired = _Shard()
+        self._pid = os.getpid()
+        self.help = {}
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        # The forking thread keeps its thread-local shard in the child
+        if shard is None or shard.pid != os.getpid():
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Counts inherited through a fork belong to the parent
+                    self._shards, self._retired, self._pid = [], _Shard(), os.getpid()
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def observe(self, name, seconds, labels=()):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        h = histograms.get(key)
+        if h is None:
+            h = histograms[key] = _Histogram(len(self.buckets) + 1)
+        h.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        h.sum += seconds
+
+    def inc(self, name, n=1, labels=()):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + n
+
+    def record(self, trace, route, total):
+        """Fold a finished request trace into the per-route histograms."""
+        route = (("route", route),)
+        self.observe("sentiment_request_seconds", total, route)
+        for name, seconds in trace.phases.items():
+            self.observe("sentiment_phase_seconds", seconds, route + (("phase", name),))
+
+    def snapshot(self):
+        """Merged ``(histograms, counters)`` over every thread."""
+        size = len(self.buckets) + 1
+        total = _Shard()
+        with self._lock:
+            if self._pid != os.getpid():
+                return {}, {}
+            # A thread that has exited can't write to its shard any more
+            live = []
+            for shard in self._shards:
+                if shard.alive():
+                    live.append(shard)
+                else:
+                    self._retired.merge(shard, size)
+            self._shards = live
+            total.merge(self._retired, size)
+        for shard in live:
+            # Copying a dict is atomic under the GIL, so this can't race a writer
+            total.merge(shard, size)
+        return total.histograms, total.counters
+
+    def shard_count(self):
+        with self._lock:
+            return len(self._shards)
+
+    def count(self, name, labels=()):
+        return self.snapshot()[1].get((name, labels), 0)
+
+    def render(self, extra=()):
+        """Everything in the Prometheus text format.
+
+        ``extra`` adds ``(name, type, labels, value)`` samples for values that
+        are kept elsewhere, such as cache hit counts.
+        """
+        histograms, counters = self.snapshot()
+        lines, typed = [], set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), h in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), h.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        samples = [(name, "counter", labels, value) for (name, labels), value in counters.items()]
+        samples.extend(extra)
+        for name, kind, labels, value in sorted(samples, key=lambda s: (s[0], s[2])):
+            header(name, kind)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry used by the app
+metrics = Metrics()
+metrics.help.update({
+    "sentiment_request_seconds": "Request latency by route.",
+    "sentiment_phase_seconds": "Time spent in each phase of a request, by route.",
+    "sentiment_model_fallbacks_total": "Load failures, by what replaced the model (dummy) or its baseline (baseline).",
+    "sentiment_score_failures_total": "Predictions that failed and returned the baseline instead.",
+})
@@ -1,80 +1,110 @@
-import tensorflow as tf
-from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Input, Dense, Dropout, Embedding, LSTM
 from flask import current_app
 
-# Import db from models module to avoid circular imports
-from models import db
 from .emojis import emojis
-from .models import Tweet
+from .encoder import encode_texts
+from .bundle import cached_sha256
+from .cache import PredictionCache
+from .metrics import metrics, phase
+from .serializers import score_dict, top_k_indices
+from .stats import STATS_FILE, compute_baseline, compute_stats, load_stats, write_stats
 
 import os
+import time
 import numpy as np
 import logging
 
-def data_gen(batch_size=100):
-    # loading all tweets into memory for speed
-    tweets = db.session.query(Tweet).all()
+# Texts used to exercise the model before it serves real traffic
+WARMUP_TEXTS = ["Everything is beautiful", "We have to talk", "I'm crying", ""]
 
-    xs = []
-    ys = []
-    ss = []
+def data_path(*parts):
+    """Path under the app's data directory."""
+    return os.path.join(current_app.config['BASE_DIR'], 'data', *parts)
 
-    while True:
-        np.random.shuffle(tweets)
-
-        for tweet in tweets:
-            xs.append(tweet.x)
-            ys.append(tweet.y)
-            ss.append(tweet.sentiment)
-
-            if len(xs) == batch_size:
-                yield np.stack(xs), [np.stack(ys), np.stack(ss)]
-                xs = []
-                ys = []
-                ss = []
+def data_gen(batch_size=100, chunk_size=10000, shuffle_size=50000, prefetch=2):
+    # stream from the database in bounded memory, prefetching the next batch
+    # Both import SQLAlchemy, which serving never needs
+    from models import get_db
+    from .pipeline import stream_batches
+    return stream_batches(get_db().engine, batch_size=batch_size, chunk_size=chunk_size,
+                          shuffle_size=shuffle_size, prefetch=prefetch)
 
 class SentimentModel(object):
 
+    # Number of models that fell back to an all-ones baseline in this process
+    baseline_fallbacks = 0
+
     def __init__(self, model=None):
+        start = time.perf_counter()
+        # Whether the weights came from model.h5, so its stored stats apply
+        from_file = model in ("numpy", None)
         if model == "dummy":
             # Explicitly use dummy model
             self._model = self._build_dummy_model()
             logging.info("Using dummy sentiment model")
+        elif model == "numpy":
+            logging.info(f"Loading NumPy model from {self.model_path}")
+            self._model = self._load_numpy_model()
         elif model is None:
             try:
-                # Check if we're in App Engine production environment
-                if os.environ.get('GAE_ENV', '').startswith('standard'):
-                    logging.info("Running in App Engine environment, using dummy model")
-                    self._model = self._build_dummy_model()
+                # Serve with NumPy where TensorFlow is too heavy (e.g. App Engine)
+                if current_app.config.get('SENTIMENT_BACKEND') == 'numpy':
+                    logging.info(f"Loading NumPy model from {self.model_path}")
+                    self._model = self._load_numpy_model()
                 elif os.path.exists(self.model_path):
                     logging.info(f"Loading model from {self.model_path}")
                     self._model = self._load_model()
                 else:
                     logging.info("Building new model")
                     self._model = self._build_model()
+                    from_file = False
             except Exception as e:
                 # For testing and CI environments, create a dummy model
                 logging.warning(f"Failed to load or build model: {e}")
+                metrics.inc("sentiment_model_fallbacks_total", labels=(("kind", "dummy"),))
                 self._model = self._build_dummy_model()
+                from_file = False
         else:
             self._model = model
 
-        try:
-            self._set_baseline()
-        except Exception as e:
-            logging.warning(f"Failed to set baseline: {e}")
-            # Set a default baseline for testing
-            import numpy as np
-            self.baseline = np.ones((1, len(emojis)))
+        # Optional BatchScheduler that predictions are routed through
+        self.scheduler = None
+        # Optional PredictionCache consulted before running the model
+        self.cache = None
+        # Optional SingleFlight sharing predictions between concurrent requests
+        self.flight = None
+        # Optional InferenceThread the model runs on when not batching
+        self.inference_thread = None
+        # Seconds spent in each start-up phase
+        self.timings = {"load": time.perf_counter() - start}
+
+        self.from_file = from_file
+        # Short sha256 of the model.h5 these weights came from (None for built models)
+        self.version = cached_sha256(self.model_path)[:12] if from_file else None
+
+        start = time.perf_counter()
+        self._set_baseline(from_file)
+        self.timings["baseline"] = time.perf_counter() - start
 
     @property
     def model_path(self):
         # Use BASE_DIR from config with consistent path handling
-        return os.path.join(current_app.config['BASE_DIR'], 'data', 'model.h5')
+        return data_path('model.h5')
+
+    @property
+    def stats_path(self):
+        # Baseline and corpus statistics computed at export time (see sentiment/stats.py)
+        return data_path(STATS_FILE)
+
+    @property
+    def bundle_path(self):
+        # Memory-mappable weights compiled from model.h5 (see sentiment/bundle.py)
+        return data_path('model_bundle')
 
     def _build_model(self):
         """Build a real LSTM model for sentiment analysis."""
+        from tensorflow.keras.models import Model
+        from tensorflow.keras.layers import Input, Dense, Dropout, Embedding, LSTM
+
         text = Input(shape=(140,))
 
         x = Embedding(input_dim=5000, output_dim=64)(text)
@@ -100,9 +130,10 @@ class SentimentModel(object):
             def predict(self, x):
                 """Return dummy predictions for testing."""
                 import numpy as np
-                # Return dummy emoji probabilities and sentiment
-                emoji_scores = np.ones((1, len(emojis))) * 0.5
-                sentiment = np.array([[0.7]])
+                # Return dummy emoji probabilities and sentiment, one row per input
+                n = len(x)
+                emoji_scores = np.ones((n, len(emojis))) * 0.5
+                sentiment = np.full((n, 1), 0.7)
                 return emoji_scores, sentiment
                 
             def save(self, path):
@@ -112,18 +143,172 @@ class SentimentModel(object):
         return DummyModel()
 
     def _load_model(self):
+        import tensorflow as tf
         return tf.keras.models.load_model(self.model_path)
 
-    def _set_baseline(self):
-        tweet = Tweet("")
-        x = tweet.x.reshape(1, -1)
-        scores, sentiment = self._model.predict(x)
-        self.baseline = scores
+    def _load_numpy_model(self):
+        from .bundle import bundle_matches, load_bundle
+        from .numpy_model import NumpyLSTMModel
+
+        if bundle_matches(self.bundle_path, self.model_path):
+            logging.info(f"Memory-mapping weight bundle from {self.bundle_path}")
+            return load_bundle(self.bundle_path)
+        return NumpyLSTMModel.from_h5(self.model_path)
+
+    def _set_baseline(self, from_file=False):
+        """Load the stored normalization stats, or compute the baseline here.
+
+        ``baseline_source`` records which happened: ``"stats"``, ``"computed"``
+        or ``"fallback"`` when even computing it failed and scores are left
+        unnormalized.
+        """
+        self.emoji_priors = None
+        stats = load_stats(self.stats_path, self.model_path) if from_file else None
+        if stats is not None:
+            self.baseline = np.array([stats["baseline"]])
+            if stats.get("emoji_priors") is not None:
+                self.emoji_priors = np.array(stats["emoji_priors"])
+            self.baseline_source = "stats"
+            return
+
+        if from_file:
+            logging.warning("No up to date %s, computing the baseline; run "
+                            "`flask sentiment export-stats` to store it", self.stats_path)
+        try:
+            scores, _ = compute_baseline(self._model)
+            self.baseline = scores.reshape(1, -1)
+            self.baseline_source = "computed"
+        except Exception as e:
+            logging.error(f"Failed to compute baseline, scores will not be normalized: {e}")
+            SentimentModel.baseline_fallbacks += 1
+            metrics.inc("sentiment_model_fallbacks_total", labels=(("kind", "baseline"),))
+            self.baseline = np.ones((1, len(emojis)))
+            self.baseline_source = "fallback"
+
+    def export_stats(self, store=None, texts=None):
+        """Compute normalization stats for this model and write them beside model.h5."""
+        stats = write_stats(self.stats_path,
+                            compute_stats(self._model, self.model_path, store=store, texts=texts))
+        self.baseline = np.array([stats["baseline"]])
+        self.baseline_source = "stats"
+        return stats
+
+    def warm_up(self, texts=WARMUP_TEXTS):
+        """Run a few predictions so graph tracing happens before real traffic."""
+        start = time.perf_counter()
+        x = encode_texts(texts)
+        # Exercise both the single-row and batched shapes, bypassing the cache
+        self._model.predict(x[:1])
+        self._model.predict(x)
+        self.timings["warmup"] = time.perf_counter() - start
+        return self.timings["warmup"]
+
+    def enable_batching(self, max_batch_size=32, max_wait=0.005):
+        """Route predictions through a micro-batching queue."""
+        from .batching import BatchScheduler
+        self.scheduler = BatchScheduler(self._model.predict,
+                                        max_batch_size=max_batch_size,
+                                        max_wait=max_wait)
+        return self.scheduler
+
+    def enable_cache(self, maxsize=1024, ttl=None, watch_path=None):
+        """Memoize raw predictions keyed on the encoded tweet."""
+        self.cache = PredictionCache(maxsize=maxsize, ttl=ttl,
+                                     watch_path=watch_path)
+        return self.cache
+
+    def enable_prefix_cache(self, maxsize=128, window=32):
+        """Reuse LSTM states for texts that extend recently scored ones (NumPy backend)."""
+        if not hasattr(self._model, "enable_prefix_cache"):
+            return None
+        return self._model.enable_prefix_cache(maxsize=maxsize, window=window)
+
+    def enable_coalescing(self):
+        """Let concurrent requests for the same input share one prediction."""
+        from .coalescing import SingleFlight
+        self.flight = SingleFlight()
+        return self.flight
+
+    def enable_inference_thread(self):
+        """Run the model on a dedicated thread instead of the request threads."""
+        from .batching import InferenceThread
+        self.inference_thread = InferenceThread(self._model.predict)
+        return self.inference_thread
+
+    def close(self):
+        """Stop the model's background threads once their queued work is done."""
+        if self.scheduler is not None:
+            self.scheduler.close()
+        if self.inference_thread is not None:
+            self.inference_thread.close()
+
+    def predict(self, x):
+        """Run the model on an ``(N, 140)`` array of encoded tweets."""
+        if self.cache is None and self.flight is None:
+            return self._predict(x)
+
+        keys = [PredictionCache.key(row) for row in x]
+        if self.cache is not None:
+            rows = [self.cache.get(key) for key in keys]
+        else:
+            rows = [None] * len(keys)
+
+        # Predict each distinct missing input once
+        missing = {}
+        for i, row in enumerate(rows):
+            if row is None:
+                missing.setdefault(keys[i], i)
+
+        if missing:
+            fresh = self._predict_missing(x, missing)
+            rows = [row if row is not None else fresh[key]
+                    for row, key in zip(rows, keys)]
+
+        return np.stack([r[0] for r in rows]), np.stack([r[1] for r in rows])
+
+    def _predict_missing(self, x, missing):
+        """Outputs for ``{key: row index}``, joining identical in-flight requests."""
+        owned, waiting = list(missing), {}
+        if self.flight is not None:
+            owned, waiting = self.flight.claim(owned)
+
+        fresh = {}
+        if owned:
+            try:
+                scores, sentiment = self._predict(x[[missing[key] for key in owned]])
+            except BaseException as e:
+                if self.flight is not None:
+                    self.flight.fail(owned, e)
+                raise
+            for j, key in enumerate(owned):
+                fresh[key] = (np.array(scores[j]), np.array(sentiment[j]))
+                if self.cache is not None:
+                    self.cache.put(key, fresh[key])
+            if self.flight is not None:
+                self.flight.resolve({key: fresh[key] for key in owned})
+
+        for key, future in waiting.items():
+            fresh[key] = future.result()
+        return fresh
+
+    def _predict(self, x):
+        if self.scheduler is not None:
+            return self.scheduler.predict(x)
+        if self.inference_thread is not None:
+            return self.inference_thread.predict(x)
+        return self._model.predict(x)
 
     def fit(self, batch_size=100, steps_per_epoch=1e3,
             nb_epoch=10, save=True):
 
-        gen = data_gen(batch_size)
+        # Stream precomputed features when `flask sentiment build-features` has run
+        from .feature_store import FeatureStore
+        store = None
+        if FeatureStore.exists(data_path('features')):
+            store = FeatureStore(data_path('features'))
+            gen = store.batches(batch_size)
+        else:
+            gen = data_gen(batch_size)
 
         self._model.fit(gen,
                 steps_per_epoch=steps_per_epoch,
@@ -131,25 +316,79 @@ class SentimentModel(object):
 
         if save:
             self._model.save(self.model_path)
+            self.export_stats(store=store)
 
-    def score(self, text, normalize = True):
+    def score(self, text, normalize = True, top_k = None):
         logging.info("Scoring tweet: %s ", text)
 
-        tweet = Tweet(text)
-        x = tweet.x.reshape(1, -1)
+        with phase("featurize"):
+            x = encode_texts([text])
 
         try:
-            scores, sentiment = self._model.predict(x)
+            with phase("predict"):
+                scores, sentiment = self.predict(x)
 
             if normalize:
-                scores /= self.baseline
+                with phase("normalize"):
+                    scores = scores / self.baseline
         except Exception as e:
             logging.error("Failed on tweet: %s. Error: %s", text, str(e))
+            metrics.inc("sentiment_score_failures_total")
             scores = self.baseline
             sentiment = np.array([[0.0]])
 
+        with phase("serialize"):
+            if top_k:
+                idx = top_k_indices(scores, top_k)[0]
+                return self._format(np.asarray(scores)[0, idx], sentiment[0], idx)
+            return self._format(scores[0], sentiment[0])
+
+    def score_batch(self, texts, normalize = True, top_k = None):
+        """Score many texts with a single vectorized predict call.
+
+        With ``top_k`` each result only holds the ``k`` best emojis, ranked
+        for the whole ``(N, n_emojis)`` matrix at once.
+        """
+        if len(texts) == 0:
+            return []
+        scores, sentiment = self.score_arrays(texts, normalize)
+        with phase("serialize"):
+            if top_k:
+                idx = top_k_indices(scores, top_k)
+                scores = np.take_along_axis(scores, idx, axis=1)
+                return [self._format(scores[i], sentiment[i:i + 1], idx[i])
+                        for i in range(len(texts))]
+            return [self._format(scores[i], sentiment[i:i + 1]) for i in range(len(texts))]
+
+    def score_arrays(self, texts, normalize = True):
+        """``(N, n_emojis)`` emoji scores and ``(N,)`` sentiment for raw texts.
+
+        The array form behind ``score_batch``, for the compact response formats.
+        """
+        logging.info("Scoring batch of %d tweets", len(texts))
+        with phase("featurize"):
+            x = encode_texts(texts)
+
+        try:
+            with phase("predict"):
+                scores, sentiment = self.predict(x)
+
+            if normalize:
+                # baseline is (1, n_emojis) so this broadcasts over the batch
+                with phase("normalize"):
+                    scores = scores / self.baseline
+        except Exception as e:
+            logging.error("Failed on batch of %d tweets. Error: %s", len(texts), str(e))
+            metrics.inc("sentiment_score_failures_total", len(texts))
+            scores = np.repeat(self.baseline, len(texts), axis=0)
+            sentiment = np.zeros((len(texts), 1))
+
+        return np.asarray(scores), np.asarray(sentiment)[:, 0]
+
+    def _format(self, scores, sentiment, indices=None):
+        """Turn one row of model output into the API's response dict.
 
-        scores = [float(s) for s in scores[0, :]]
-        scores = dict(zip(emojis, scores))
-        sentiment = float(sentiment[0, 0])
-        return {"emoji":scores, "sentiment": sentiment}
+        ``indices`` marks a top-k row: ``scores`` are then the selected
+        values, best first, and the indices are included in the result.
+        """
+        return score_dict(scores, sentiment[0], indices)
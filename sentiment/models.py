@@ -1,6 +1,7 @@
 from models import db
 from .emojis import *
-import numpy as np
+from .encoder import (encode_labels, encode_sentiment, encode_texts,
+                      emoji_indices, strip_emojis)
 
 class Tweet(db.Model):
     id = db.Column(db.Integer, primary_key=True,
@@ -12,43 +13,35 @@ class Tweet(db.Model):
 
     @property
     def text(self):
-        text = self.raw_tweet
-        for e in emojis:
-            text = text.replace(e, "")
-        return text
+        return strip_emojis(self.raw_tweet)
 
     @property
     def emojis(self):
-        return [e for e in emojis if e in self.raw_tweet]
+        return [emojis[i] for i in emoji_indices(self.raw_tweet)]
 
     @property
     def sentiment(self):
-        x = np.zeros(3)
-        if len(self.emojis) > 0:
-            e = np.random.choice(self.emojis)
-            if e in positive_emojis:
-                x[0] = 1
-                return x
-            elif e in negative_emojis:
-                x[2] = 1
-                return x
-            else:
-                x[1] = 1
-                return x
-        return x
+        return encode_sentiment(self.y.reshape(1, -1))[0]
 
     @property
     def x(self):
-        # left-pad with zeros
-        x = []
-        if len(self.text) < 140:
-            x += [0] * (140 - len(self.text))
-        x += [ord(c) % 5000 for c in self.text]
-        return np.array(x[0:140])
+        # left-padded with zeros
+        return encode_texts([self.raw_tweet])[0]
 
     @property
     def y(self):
-        y = np.zeros(len(emojis))
-        for e in self.emojis:
-            y[emojis.index(e)] = 1
-        return y
+        return encode_labels([self.raw_tweet])[0]
+
+
+class IngestCheckpoint(db.Model):
+    """How far `flask sentiment ingest` got through a source file.
+
+    Updated in the same transaction as each batch of inserted tweets, so an
+    interrupted load resumes exactly after the last committed batch.
+    """
+    __tablename__ = "ingest_checkpoint"
+
+    source = db.Column(db.String(1024), primary_key=True)
+    offset = db.Column(db.BigInteger, nullable=False, default=0)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,291 @@
+from collections import OrderedDict
+import json
+import threading
+
+import numpy as np
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    # Keras' piecewise-linear approximation of the sigmoid
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+    "tanh": np.tanh,
+    "linear": lambda x: x,
+}
+
+
+def read_h5_layers(path):
+    """Read layer configs and weights from a Keras ``.h5`` model file.
+
+    Returns a list of ``(class_name, config, weights)`` tuples in model order.
+    """
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        if "model_config" not in f.attrs:
+            raise ValueError(f"{path} does not contain a Keras model config")
+        config = json.loads(_decode(f.attrs["model_config"]))
+        group = f["model_weights"] if "model_weights" in f else f
+
+        layers = []
+        for layer in config["config"]["layers"]:
+            name = layer["config"]["name"]
+            weights = []
+            if name in group:
+                g = group[name]
+                weights = [np.array(g[_decode(n)]) for n in g.attrs["weight_names"]]
+            layers.append((layer["class_name"], layer["config"], weights))
+    return layers
+
+
+class PrefixStateCache(object):
+    """LRU of LSTM states keyed on the (unpadded) tokens they have consumed.
+
+    Tweets are left-padded, so the state after a prefix depends on how much
+    padding preceded it, i.e. on the final length of the text. Each entry
+    therefore holds one state row per possible final length: row ``j`` is
+    the state after the prefix for a text that will end up ``j`` tokens
+    longer. Row 0 is the prefix's own exact state.
+
+    A text seen for the first time only gets row 0. The extra rows are built
+    once a text extends a cached one, i.e. when someone is typing.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = max(1, int(maxsize))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.steps = 0
+
+    def longest_prefix(self, tokens, max_back):
+        """The longest cached prefix of ``tokens`` at most ``max_back`` shorter."""
+        with self._lock:
+            for k in range(len(tokens), max(-1, len(tokens) - max_back - 1), -1):
+                key = tokens[:k].tobytes()
+                entry = self._data.get(key)
+                if entry is not None and len(tokens) - k < len(entry[0]):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return k, entry
+            self.misses += 1
+            return None
+
+    def extends_cached(self, tokens, max_back):
+        """Whether a proper prefix of ``tokens``, at most ``max_back`` shorter, is cached."""
+        with self._lock:
+            return any(tokens[:k].tobytes() in self._data
+                       for k in range(len(tokens) - 1, max(-1, len(tokens) - max_back - 1), -1))
+
+    def put(self, tokens, h, c, steps):
+        with self._lock:
+            self._data[tokens.tobytes()] = (h, c)
+            self._data.move_to_end(tokens.tobytes())
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self.steps += steps
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "steps": self.steps,
+            }
+
+
+class NumpyLSTMModel(object):
+    """Inference-only NumPy implementation of the sentiment LSTM.
+
+    Mirrors ``SentimentModel._build_model``: Embedding -> LSTM -> Dropout ->
+    two sigmoid Dense heads (``emoji`` and ``sentiment``). Dropout is a no-op
+    at inference time. ``predict`` matches the Keras model's signature and
+    returns ``(emoji_scores, sentiment)`` for an ``(N, T)`` batch.
+    """
+
+    def __init__(self, weights, activation="tanh",
+                 recurrent_activation="hard_sigmoid"):
+        self.weights = weights
+        self.activation = activation
+        self.recurrent_activation = recurrent_activation
+        self._act = ACTIVATIONS[activation]
+        self._rec_act = ACTIVATIONS[recurrent_activation]
+
+        self.units = weights["lstm_recurrent_kernel"].shape[0]
+        # Project the whole vocabulary through the input kernel once, so each
+        # timestep is a row gather instead of an (N, 64) x (64, 512) matmul.
+        # Weight bundles ship this table precomputed (and possibly quantized).
+        if "projection" in weights:
+            self._projection = weights["projection"]
+        else:
+            self._projection = (weights["embeddings"].astype(np.float32)
+                                @ weights["lstm_kernel"].astype(np.float32)
+                                + weights["lstm_bias"].astype(np.float32))
+        self._projection_scale = weights.get("projection_scale")
+        self._zero_states = {}
+        # Optional PrefixStateCache for single-text predictions
+        self.prefix_cache = None
+        self.prefix_window = 0
+
+    @classmethod
+    def from_h5(cls, path):
+        """Pull the weights out of a Keras ``.h5`` file."""
+        layers = read_h5_layers(path)
+
+        weights = {}
+        lstm_config = None
+        for class_name, config, values in layers:
+            if class_name == "Embedding":
+                weights["embeddings"], = values
+            elif class_name == "LSTM":
+                lstm_config = config
+                (weights["lstm_kernel"], weights["lstm_recurrent_kernel"],
+                 weights["lstm_bias"]) = values
+            elif class_name == "Dense" and config["name"] in ("emoji", "sentiment"):
+                name = config["name"]
+                weights[f"{name}_kernel"], weights[f"{name}_bias"] = values
+
+        missing = {"embeddings", "lstm_kernel", "emoji_kernel",
+                   "sentiment_kernel"} - set(weights)
+        if missing or lstm_config is None:
+            raise ValueError(f"{path} is missing weights for: {sorted(missing)}")
+
+        return cls(weights,
+                   activation=lstm_config.get("activation", "tanh"),
+                   recurrent_activation=lstm_config.get("recurrent_activation",
+                                                        "hard_sigmoid"))
+
+    @property
+    def projection(self):
+        """The ``(vocab, 4 * units)`` input projection table."""
+        return self._projection
+
+    def _project(self, tokens):
+        z = self._projection[tokens]
+        if self._projection_scale is not None:
+            # int8 rows are stored with one float32 scale per vocabulary entry
+            return z * self._projection_scale[tokens, None]
+        return z.astype(np.float32, copy=False)
+
+    def _step(self, z, h, c):
+        u = self.units
+        z = z + h @ self.weights["lstm_recurrent_kernel"]
+        i = self._rec_act(z[:, :u])
+        f = self._rec_act(z[:, u:2 * u])
+        g = self._act(z[:, 2 * u:3 * u])
+        o = self._rec_act(z[:, 3 * u:])
+        c = f * c + i * g
+        h = o * self._act(c)
+        return h, c
+
+    def zero_states(self, length):
+        """LSTM states after 0..length padding tokens, computed once."""
+        if length not in self._zero_states:
+            h = np.zeros((1, self.units), dtype=np.float32)
+            c = np.zeros((1, self.units), dtype=np.float32)
+            hs, cs = [h[0]], [c[0]]
+            z = self._project(np.zeros(1, dtype=np.int64))
+            for _ in range(length):
+                h, c = self._step(z, h, c)
+                hs.append(h[0])
+                cs.append(c[0])
+            self._zero_states[length] = (np.stack(hs), np.stack(cs))
+        return self._zero_states[length]
+
+    def run_lstm(self, x):
+        """Return the final LSTM hidden and cell states for an ``(N, T)`` batch."""
+        x = np.asarray(x, dtype=np.int64)
+        n, t = x.shape
+
+        # Every row starts with a run of zeros (the left padding); the state
+        # after k zeros is the same for all rows, so start each row from the
+        # precomputed state and only recur over the remaining timesteps.
+        nonzero = x != 0
+        leading = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), t)
+        order = np.argsort(leading, kind="stable")
+        x = x[order]
+        leading = leading[order]
+
+        zero_h, zero_c = self.zero_states(t)
+        h = zero_h[leading].copy()
+        c = zero_c[leading].copy()
+
+        # Rows are sorted by padding, so the rows active at a step are a prefix
+        active = np.searchsorted(leading, np.arange(t), side="right")
+        for step in range(int(leading[0]) if n else t, t):
+            m = active[step]
+            z = self._project(x[:m, step])
+            h[:m], c[:m] = self._step(z, h[:m], c[:m])
+
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(n)
+        return h[inverse], c[inverse]
+
+    def heads(self, h):
+        """Apply the emoji and sentiment heads to LSTM outputs."""
+        w = self.weights
+        emoji = _sigmoid(h @ w["emoji_kernel"] + w["emoji_bias"])
+        sentiment = _sigmoid(h @ w["sentiment_kernel"] + w["sentiment_bias"])
+        return emoji.astype(np.float32), sentiment.astype(np.float32)
+
+    def enable_prefix_cache(self, maxsize=128, window=32):
+        """Reuse LSTM states across single-text predictions that extend a cached text.
+
+        Typing one more character then costs one recurrence step instead of a
+        pass over the whole text. Up to ``window`` appended tokens are covered
+        before a cached entry runs out and a full pass is needed again.
+        """
+        self.prefix_cache = PrefixStateCache(maxsize)
+        self.prefix_window = max(0, int(window))
+        return self.prefix_cache
+
+    def incremental_state(self, row):
+        """Final hidden state for one encoded tweet, reusing cached prefix states."""
+        row = np.asarray(row, dtype=np.int64)
+        t = len(row)
+        nonzero = np.flatnonzero(row)
+        tokens = row[nonzero[0]:] if len(nonzero) else row[:0]
+        n = len(tokens)
+
+        found = self.prefix_cache.longest_prefix(tokens, self.prefix_window)
+        if found is None:
+            # Full pass. A one-off text only needs its own state; a text that
+            # extends a cached one is being typed, so also compute one row per
+            # final length up to n + window, each after its own amount of padding
+            k = 0
+            extra = self.prefix_window if self.prefix_cache.extends_cached(tokens, self.prefix_window) else 0
+            pads = t - n - np.arange(min(extra, t - n) + 1)
+            zero_h, zero_c = self.zero_states(t)
+            h, c = zero_h[pads], zero_c[pads]
+        else:
+            # Rows for final lengths below n are of no further use
+            k, (h, c) = found
+            h, c = h[n - k:], c[n - k:]
+
+        for step in range(k, n):
+            h, c = self._step(self._project(tokens[step:step + 1]), h, c)
+        return h, c, tokens, n - k
+
+    def predict(self, x, **kwargs):
+        if self.prefix_cache is not None and len(x) == 1:
+            h, c, tokens, steps = self.incremental_state(x[0])
+            self.prefix_cache.put(tokens, h, c, steps)
+            return self.heads(h[:1])
+        h, _ = self.run_lstm(x)
+        return self.heads(h)
@@ -0,0 +1,163 @@
+"""Streaming, bounded-memory training input pipeline over the tweets table.
+
+Tweets are read in id-ranged chunks (visited in a random order each epoch)
+with streamed result sets, mixed through a fixed-size shuffle buffer,
+encoded into a small ring of preallocated batch arrays and prefetched on a
+background thread while the current batch trains. Memory use depends on
+``chunk_size``, ``shuffle_size`` and ``batch_size``, not on corpus size.
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+
+from .emojis import emojis
+from .encoder import SEQUENCE_LENGTH, encode_labels, encode_sentiment, encode_texts
+from .models import Tweet
+
+
+def id_ranges(connection, chunk_size):
+    """Split the id space of the tweets table into ``[start, end)`` ranges."""
+    low, high = connection.execute(select(func.min(Tweet.id), func.max(Tweet.id))).one()
+    if low is None:
+        return []
+    return [(start, start + chunk_size) for start in range(low, high + 1, chunk_size)]
+
+
+def iter_tweets(engine, chunk_size=10000, rng=np.random):
+    """Yield raw tweet texts one id-range chunk at a time, chunks in random order."""
+    with engine.connect() as connection:
+        ranges = id_ranges(connection, chunk_size)
+        streaming = connection.execution_options(stream_results=True, yield_per=chunk_size)
+        for i in rng.permutation(len(ranges)):
+            start, end = ranges[i]
+            query = (select(Tweet.raw_tweet)
+                     .where(Tweet.id >= start, Tweet.id < end))
+            for raw, in streaming.execute(query):
+                yield raw or ""
+
+
+def shuffle_buffer(items, buffer_size, rng=np.random):
+    """Approximately shuffle a stream while holding at most ``buffer_size`` items."""
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        j = rng.randint(buffer_size)
+        yield buffer[j]
+        buffer[j] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+class BatchRing(object):
+    """A fixed set of preallocated ``(x, [y, sentiment])`` buffers used in rotation.
+
+    A batch's arrays are overwritten ``size`` batches later, so consumers
+    must copy anything they keep longer than that (Keras copies every batch
+    into tensors as it arrives).
+    """
+
+    def __init__(self, batch_size, size):
+        self.buffers = [(np.zeros((batch_size, SEQUENCE_LENGTH), dtype=np.int32),
+                         np.zeros((batch_size, len(emojis)), dtype=np.float32),
+                         np.zeros((batch_size, 3), dtype=np.float32))
+                        for _ in range(size)]
+        self._next = 0
+
+    def fill(self, texts, rng=np.random):
+        x, y, s = self.buffers[self._next]
+        self._next = (self._next + 1) % len(self.buffers)
+        encode_texts(texts, out=x)
+        encode_labels(texts, out=y)
+        encode_sentiment(y, rng=rng, out=s)
+        return x, [y, s]
+
+
+class Prefetcher(object):
+    """Run an iterator on a background thread, keeping up to ``size`` items ready."""
+
+    _DONE = object()
+
+    def __init__(self, iterable, size=2):
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterable,),
+                                        name="sentiment-prefetch", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((item, None)):
+                    return
+        except Exception as e:
+            self._put((self._DONE, e))
+            return
+        self._put((self._DONE, None))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item, error = self._queue.get()
+        if item is self._DONE:
+            self._stop.set()
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def close(self):
+        self._stop.set()
+
+
+def stream_batches(engine, batch_size=100, chunk_size=10000, shuffle_size=50000,
+                   prefetch=2, epochs=None, rng=None):
+    """Yield ``(x, [y, sentiment])`` training batches streamed from the database.
+
+    Loops over the corpus ``epochs`` times (forever by default). Leftover
+    tweets that don't fill a batch carry over into the next epoch.
+    """
+    rng = rng or np.random.RandomState()
+    # Batches in the prefetch queue, the one being consumed and the one being filled
+    ring = BatchRing(batch_size, prefetch + 2)
+
+    def produce():
+        pending = []
+        epoch = 0
+        while epochs is None or epoch < epochs:
+            seen = 0
+            for raw in shuffle_buffer(iter_tweets(engine, chunk_size, rng), shuffle_size, rng):
+                seen += 1
+                pending.append(raw)
+                if len(pending) == batch_size:
+                    yield ring.fill(pending, rng)
+                    pending = []
+            if seen == 0:
+                raise ValueError("No tweets to train on")
+            epoch += 1
+
+    if prefetch <= 0:
+        return produce()
+    return Prefetcher(produce(), size=prefetch)
+
+
+def measure_throughput(batches, n=100):
+    """Pull ``n`` batches and return batches per second."""
+    start = time.perf_counter()
+    for _ in range(n):
+        next(batches)
+    return n / (time.perf_counter() - start)
@@ -0,0 +1,122 @@
+"""Hot reloading of the sentiment model when ``model.h5`` changes on disk.
+
+``ModelRegistry.current()`` is what requests call to get the model. At most
+once per ``check_interval`` it stats the watched file; when the file has
+changed, a background thread loads, warms and baselines the new version
+while requests keep being served by the old one. The new model is then
+swapped in with a single assignment. Requests that already hold the old
+model finish on it, and its batching threads are stopped once their queues
+drain, so nothing keeps it alive after the last of them returns.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+
+
+class ModelRegistry(object):
+    """The active model, replaced in the background when ``watch_path`` changes.
+
+    ``load`` builds a ready-to-serve model and raises if the file can't be
+    used; the current model is kept in that case.
+    """
+
+    def __init__(self, model, load, watch_path, check_interval=5.0, clock=time.monotonic):
+        self.model = model
+        self.watch_path = watch_path
+        self.check_interval = check_interval
+        self._load = load
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._next_check = clock() + check_interval
+        self._loader = None
+        # Replaced models, so stats can show whether any are still referenced
+        self._retired = weakref.WeakSet()
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.watch_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def current(self):
+        """The model to serve this request with."""
+        self.poll()
+        return self.model
+
+    def poll(self):
+        """Start a background reload if the watched file changed; returns the thread."""
+        now = self._clock()
+        if now < self._next_check:
+            return None
+        with self._lock:
+            if now < self._next_check or self._loader is not None:
+                return None
+            self._next_check = now + self.check_interval
+            signature = self._stat()
+            # A missing file is usually a deploy midway through replacing it
+            if signature is None or signature == self._signature:
+                return None
+            self._loader = threading.Thread(target=self.reload, args=(signature,),
+                                            name="sentiment-reload", daemon=True)
+            self._loader.start()
+            return self._loader
+
+    def reload(self, signature=None):
+        """Load the watched file and swap it in; returns the new model or None."""
+        signature = signature or self._stat()
+        start = time.perf_counter()
+        try:
+            model = self._load()
+        except Exception as e:
+            logging.error("Reloading %s failed, keeping the current model: %s",
+                          self.watch_path, e)
+            with self._lock:
+                # Don't retry until the file changes again
+                self._signature = signature
+                self._loader = None
+                self.failures += 1
+                self.last_error = str(e)
+            return None
+
+        if self._stat() != signature:
+            # Still being written; the next poll sees the new signature and retries
+            model.close()
+            with self._lock:
+                self._loader = None
+            return None
+
+        with self._lock:
+            old, self.model = self.model, model
+            self._signature = signature
+            self._loader = None
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - start
+        logging.info("Reloaded %s as version %s in %.3fs", self.watch_path,
+                     getattr(model, "version", None), self.last_reload_seconds)
+
+        old.close()
+        self._retired.add(old)
+        return model
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": getattr(self.model, "version", None),
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_reload_seconds": self.last_reload_seconds,
+                "loading": self._loader is not None,
+                "retired_alive": len(self._retired),
+            }
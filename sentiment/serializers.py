@@ -0,0 +1,128 @@
+"""Response encodings for emoji score payloads.
+
+``dict`` is the original ``{"emoji": {emoji: score}, "sentiment": s}``
+shape. The compact formats send scores positionally, in the order of the
+emoji vocabulary served once by ``/sentiment/api/emojis``, and tag each
+payload with the vocabulary ``version`` so clients can tell when to refetch
+it:
+
+- ``array``    JSON float lists, rounded to ``precision`` decimals
+- ``f16``      JSON with the scores as base64 little-endian float16
+- ``msgpack``  MessagePack with float32 scores (needs the ``msgpack`` package)
+
+With ``top_k`` only the best ``k`` scores are sent, together with their
+vocabulary indices.
+"""
+import base64
+import hashlib
+import json
+
+import numpy as np
+
+from .emojis import emojis
+from .encoder import SENTIMENT_CLASS
+
+FORMATS = ("dict", "array", "f16", "msgpack")
+MIMETYPES = {"msgpack": "application/msgpack"}
+DEFAULT_PRECISION = 4
+
+# Changes whenever the emoji list (and so the meaning of positions) changes
+VOCABULARY_VERSION = hashlib.sha256(json.dumps(emojis).encode("utf-8")).hexdigest()[:12]
+
+
+def vocabulary():
+    return {
+        "version": VOCABULARY_VERSION,
+        "emojis": emojis,
+        "sentiment_class": SENTIMENT_CLASS.tolist(),
+    }
+
+
+def negotiate(fmt=None, accept=None):
+    """Pick a format from an explicit ``format`` value or the Accept header."""
+    if fmt:
+        return fmt if fmt in FORMATS else None
+    if accept and ("application/msgpack" in accept or "application/x-msgpack" in accept):
+        return "msgpack"
+    return "dict"
+
+
+def top_k_indices(scores, k):
+    """Indices of the ``k`` largest scores in each row, best first.
+
+    ``np.argpartition`` finds the top ``k`` of every row in O(98), and only
+    those ``k`` are sorted.
+    """
+    scores = np.atleast_2d(scores)
+    k = min(int(k), scores.shape[1])
+    if k <= 0:
+        return np.zeros((len(scores), 0), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _select(scores, top_k):
+    """``(indices or None, scores)`` after optional top-k truncation."""
+    if not top_k:
+        return None, scores
+    idx = top_k_indices(scores, top_k)
+    return idx, np.take_along_axis(scores, idx, axis=1)
+
+
+def score_dict(scores, sentiment, indices=None):
+    """The ``dict`` format for one text, as returned by ``SentimentModel.score``.
+
+    ``indices`` marks a top-k row: ``scores`` are then the selected values,
+    best first, and the indices are included in the result.
+    """
+    scores = np.asarray(scores, dtype=float).tolist()
+    if indices is None:
+        return {"emoji": dict(zip(emojis, scores)), "sentiment": float(sentiment)}
+    indices = np.asarray(indices).tolist()
+    return {"emoji": {emojis[i]: v for i, v in zip(indices, scores)},
+            "indices": indices,
+            "sentiment": float(sentiment)}
+
+
+def _dict_rows(scores, sentiment, idx):
+    if idx is None:
+        return [score_dict(row, s) for row, s in zip(scores, sentiment)]
+    return [score_dict(row, s, ids) for ids, row, s in zip(idx, scores, sentiment)]
+
+
+def encode_scores(scores, sentiment, fmt="dict", top_k=None, precision=None, single=True):
+    """Encode ``(N, 98)`` scores and ``(N,)`` sentiment; returns ``(body, mimetype)``.
+
+    ``single`` unwraps the one-row case for ``/sentiment/api/score``.
+    ``precision`` only applies to ``array``; the other formats are unrounded.
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    sentiment = np.asarray(sentiment, dtype=np.float64).reshape(-1)
+    idx, scores = _select(scores, top_k)
+
+    if fmt == "dict":
+        rows = _dict_rows(scores, sentiment, idx)
+        return json.dumps(rows[0] if single else rows, ensure_ascii=False), "application/json"
+
+    payload = {"version": VOCABULARY_VERSION}
+    if idx is not None:
+        payload["indices"] = idx[0].tolist() if single else idx.tolist()
+
+    if fmt == "array":
+        precision = DEFAULT_PRECISION if precision is None else precision
+        scores, sentiment = np.round(scores, precision), np.round(sentiment, precision)
+        payload["scores"] = scores[0].tolist() if single else scores.tolist()
+    elif fmt == "f16":
+        payload["scores_f16"] = base64.b64encode(scores.astype("<f2").tobytes()).decode("ascii")
+        payload["shape"] = list(scores.shape[1:] if single else scores.shape)
+    elif fmt == "msgpack":
+        import msgpack
+        payload["scores"] = scores[0].tolist() if single else scores.tolist()
+        payload["sentiment"] = float(sentiment[0]) if single else sentiment.tolist()
+        return msgpack.packb(payload, use_single_float=True), MIMETYPES["msgpack"]
+    else:
+        raise ValueError(f"Unknown format {fmt!r}")
+
+    payload["sentiment"] = float(sentiment[0]) if single else sentiment.tolist()
+    return json.dumps(payload, separators=(",", ":")), "application/json"
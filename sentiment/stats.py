@@ -0,0 +1,88 @@
+"""Normalization statistics computed once per model and stored beside it.
+
+``model_stats.json`` holds the empty-tweet baseline that scores are divided
+by, plus optional per-emoji prior frequencies over the training corpus.
+It records the sha256 of the ``model.h5`` it was computed from, and is
+ignored once that file changes. Workers then load a few hundred floats
+instead of running a prediction at start-up.
+"""
+import datetime
+import json
+import os
+
+import numpy as np
+
+from .bundle import cached_sha256
+from .emojis import emojis
+from .encoder import encode_labels, encode_texts
+
+FORMAT_VERSION = 1
+STATS_FILE = "model_stats.json"
+
+def compute_baseline(model):
+    """Emoji scores and sentiment the model gives an empty tweet."""
+    scores, sentiment = model.predict(encode_texts([""]))
+    return np.asarray(scores, dtype=np.float64)[0], float(np.asarray(sentiment)[0, 0])
+
+
+def emoji_priors(store=None, texts=None):
+    """Fraction of corpus tweets containing each emoji, and the corpus size.
+
+    Counts come from a ``FeatureStore`` when one is given, otherwise from
+    an iterable of raw ``texts``.
+    """
+    counts = np.zeros(len(emojis), dtype=np.int64)
+    rows = 0
+    if store is not None:
+        rows = store.rows
+        index = store.arrays()["emoji_index.uint8"]
+        counts += np.bincount(index, minlength=len(emojis))[:len(emojis)]
+    else:
+        chunk = []
+        for text in texts or ():
+            chunk.append(text or "")
+            if len(chunk) == 10000:
+                counts += encode_labels(chunk).sum(axis=0).astype(np.int64)
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            counts += encode_labels(chunk).sum(axis=0).astype(np.int64)
+            rows += len(chunk)
+    if rows == 0:
+        return None, 0
+    return counts / rows, rows
+
+
+def compute_stats(model, h5_path, store=None, texts=None):
+    baseline, sentiment = compute_baseline(model)
+    priors, rows = emoji_priors(store=store, texts=texts)
+    return {
+        "format": FORMAT_VERSION,
+        "model_sha256": cached_sha256(h5_path),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "emojis": emojis,
+        "baseline": baseline.tolist(),
+        "baseline_sentiment": sentiment,
+        "emoji_priors": priors.tolist() if priors is not None else None,
+        "corpus_rows": rows,
+    }
+
+
+def write_stats(path, stats):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+    return stats
+
+
+def load_stats(path, h5_path):
+    """The stats in ``path`` if they were computed from ``h5_path``, else None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            stats = json.load(f)
+        if (stats.get("format") != FORMAT_VERSION or stats.get("emojis") != emojis
+                or stats.get("model_sha256") != cached_sha256(h5_path)):
+            return None
+    except (OSError, ValueError):
+        return None
+    return stats
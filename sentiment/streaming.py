@@ -0,0 +1,179 @@
+"""Server-Sent Events channel for scoring text as it is typed.
+
+A browser opens ``GET /sentiment/api/stream`` with ``EventSource`` and is
+given a session id. It then posts each edit to
+``/sentiment/api/stream/<id>``. The stream only ever scores the newest text
+of a session; edits that arrive while the model is busy replace the pending
+one, and a result is dropped if newer text arrived while it was computed.
+Frames can be limited to the ``top_k`` emojis and to the emojis that
+changed since the previous frame.
+
+Sessions live in memory in the process that opened the stream. A post
+that lands on another worker is scored directly and answered in the
+response body instead.
+"""
+import heapq
+import json
+import secrets
+import threading
+import time
+
+# Scores closer than this to the last frame's value are not resent in delta mode
+DELTA_EPSILON = 1e-3
+
+
+class StreamSession(object):
+    """The latest text a client wants scored, and who is waiting for it."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self._cond = threading.Condition()
+        self._text = None
+        self._seq = 0
+        self._scored = 0
+        self.closed = False
+
+    def push(self, text, seq=None):
+        """Replace the pending text; out-of-order (older) edits are ignored."""
+        with self._cond:
+            seq = self._seq + 1 if seq is None else int(seq)
+            if seq <= self._seq:
+                return False
+            self._text, self._seq = text, seq
+            self._cond.notify_all()
+            return True
+
+    def wait(self, timeout):
+        """Block until there is unscored text; returns ``(seq, text)`` or None."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed or self._seq > self._scored, timeout)
+            if self.closed or self._seq <= self._scored:
+                return None
+            self._scored = self._seq
+            return self._seq, self._text
+
+    def is_stale(self, seq):
+        with self._cond:
+            return self._seq > seq
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StreamHub(object):
+    """Open stream sessions in this process, capped at ``max_sessions``."""
+
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+        self.opened = 0
+        self.rejected = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def open(self):
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                return None
+            session = StreamSession(secrets.token_urlsafe(12))
+            self._sessions[session.id] = session
+            self.opened += 1
+            return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session):
+        session.close()
+        with self._lock:
+            self._sessions.pop(session.id, None)
+
+    def count(self, frames=0, dropped=0):
+        with self._lock:
+            self.frames += frames
+            self.dropped += dropped
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "frames": self.frames,
+                "dropped": self.dropped,
+            }
+
+
+def top_emojis(scores, k):
+    """The ``k`` highest scoring emojis of a ``{emoji: score}`` dict (all if k <= 0)."""
+    if k <= 0 or k >= len(scores):
+        return dict(scores)
+    return dict(heapq.nlargest(k, scores.items(), key=lambda item: item[1]))
+
+
+def build_frame(seq, result, top_k=0, previous=None):
+    """The payload for one scored text, and the emoji state the client now holds.
+
+    With ``previous`` (the state after the last frame), only emojis that are
+    new or moved by more than ``DELTA_EPSILON`` are sent, and ``drop`` lists
+    the ones the client should forget.
+    """
+    current = top_emojis(result["emoji"], top_k)
+    frame = {"seq": seq, "sentiment": result["sentiment"]}
+    if previous is None:
+        frame["emoji"] = current
+    else:
+        frame["delta"] = True
+        frame["emoji"] = {e: s for e, s in current.items()
+                          if e not in previous or abs(previous[e] - s) > DELTA_EPSILON}
+        frame["drop"] = [e for e in previous if e not in current]
+        # Track what the client actually holds so small drifts can't accumulate
+        current = {e: frame["emoji"].get(e, previous.get(e)) for e in current}
+    return frame, current
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(hub, session, score, top_k=0, delta=False, lifetime=300.0, heartbeat=15.0):
+    """Yield SSE messages for ``session`` until the client leaves or ``lifetime`` ends.
+
+    ``score`` maps a text to the ``{"emoji": ..., "sentiment": ...}`` dict of
+    ``SentimentModel.score``. The stream closes itself after ``lifetime``
+    seconds; ``EventSource`` reconnects and gets a fresh session.
+    """
+    deadline = time.monotonic() + lifetime
+    state = None
+    try:
+        yield sse("session", {"id": session.id, "top_k": top_k, "delta": delta})
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            pending = session.wait(min(heartbeat, remaining))
+            if pending is None:
+                if session.closed:
+                    break
+                # Comments keep proxies from timing out and reveal closed clients
+                yield ": ping\n\n"
+                continue
+
+            seq, text = pending
+            result = score(text)
+            if session.is_stale(seq):
+                hub.count(dropped=1)
+                continue
+            frame, new_state = build_frame(seq, result, top_k, state if delta else None)
+            state = new_state
+            hub.count(frames=1)
+            yield sse("score", frame)
+    finally:
+        hub.close(session)
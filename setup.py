@@ -10,9 +10,12 @@ setup(
         "flask-sqlalchemy",
         "tensorflow>=2.12.0,<2.14.0",
         "numpy>=1.22.0,<1.25.0",
+        "h5py>=3.8.0",
         "python-dotenv",
     ],
     extras_require={
+        # Optional MessagePack encoding for /sentiment/api/score
+        "msgpack": ["msgpack>=1.0"],
         "dev": [
             "pytest",
             "pytest-flask",
@@ -11,6 +11,22 @@ from app import create_app
 from models import db as _db
 from sentiment.models import Tweet
 
+class FakeClock(object):
+    """A stand-in for ``time.monotonic`` that only moves when a test sets ``now``."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A fresh :class:`FakeClock` starting at zero."""
+    return FakeClock()
+
+
 @pytest.fixture(scope='session')
 def app():
     """Create and configure a Flask app for testing."""
@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+import assets
+
+pytestmark = [pytest.mark.unit]
+
+P5 = b"function p5() { return 'sketch'; }\n" * 200
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / "static"
+    (root / "js").mkdir(parents=True)
+    (root / "css").mkdir()
+    (root / "images").mkdir()
+    (root / "js" / "p5.js").write_bytes(P5)
+    (root / "js" / "tiny.js").write_bytes(b"var a;")
+    (root / "images" / "logo.png").write_bytes(os.urandom(4096))
+    (root / "css" / "main.css").write_bytes(
+        b"body { background: url('../images/logo.png?v=1'); }\n"
+        b".x { background: url(data:image/png;base64,AAAA); }\n"
+        b".y { background: url(/static/images/logo.png); }\n")
+    return root
+
+
+def make_app(static_dir):
+    assets.build_assets(str(static_dir))
+    app = Flask(__name__, static_folder=str(static_dir), static_url_path="/static")
+    assets.init_app(app)
+    return app
+
+
+def test_build_fingerprints(static_dir):
+    manifest = assets.build_assets(str(static_dir))
+
+    p5 = manifest["files"]["js/p5.js"]
+    assert p5["path"].startswith("build/js/p5.") and p5["path"].endswith(".js")
+    assert (static_dir / p5["path"]).read_bytes() == P5
+    assert p5["size"] == len(P5)
+    # App Engine compresses static files itself, so no .gz/.br siblings are written
+    assert sorted(os.listdir(static_dir / "build" / "js")) == sorted(
+        os.path.basename(manifest["files"][f"js/{name}"]["path"]) for name in ("p5.js", "tiny.js"))
+    assert json.loads((static_dir / "build" / "manifest.json").read_text()) == manifest
+
+
+def test_css_references_point_at_hashed_files(static_dir):
+    manifest = assets.build_assets(str(static_dir))
+    css = (static_dir / manifest["files"]["css/main.css"]["path"]).read_text()
+    logo = os.path.basename(manifest["files"]["images/logo.png"]["path"])
+
+    assert f"url('../images/{logo}?v=1')" in css
+    assert f"url(../images/{logo})" in css
+    assert "url(data:image/png;base64,AAAA)" in css
+
+
+def test_rebuild_prunes_stale_files(static_dir):
+    old = assets.build_assets(str(static_dir))["files"]["js/p5.js"]["path"]
+    (static_dir / "js" / "p5.js").write_bytes(P5 + b"// v2\n")
+
+    new = assets.build_assets(str(static_dir))["files"]["js/p5.js"]["path"]
+
+    assert new != old
+    assert not (static_dir / old).exists()
+    assert (static_dir / new).exists()
+
+
+def test_rebuild_prunes_compressed_copies_from_older_builds(static_dir):
+    path = assets.build_assets(str(static_dir))["files"]["js/p5.js"]["path"]
+    (static_dir / (path + ".gz")).write_bytes(b"old")
+
+    assets.build_assets(str(static_dir))
+
+    assert not (static_dir / (path + ".gz")).exists()
+
+
+def test_url_for_and_immutable_serving(static_dir):
+    app = make_app(static_dir)
+    client = app.test_client()
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='js/p5.js') }}")
+        assert url.startswith("/static/build/js/p5.")
+        assert render_template_string("{{ url_for('static', filename='js/missing.js') }}") == "/static/js/missing.js"
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert "Content-Encoding" not in response.headers
+    assert response.mimetype == "text/javascript"
+    assert response.data == P5
+    assert response.cache_control.immutable and response.cache_control.max_age == 31536000
+
+    etag = response.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # Files requested by their plain name are still served as before
+    response = client.get("/static/js/tiny.js")
+    assert response.status_code == 200 and not response.cache_control.immutable
+
+
+def test_without_manifest_nothing_changes(tmp_path):
+    app = Flask(__name__, static_folder=str(tmp_path), static_url_path="/static")
+    assert assets.init_app(app) is None
+    with app.test_request_context():
+        assert render_template_string("{{ url_for('static', filename='a.js') }}") == "/static/a.js"
+
+
+def test_static_index_filters_and_pages(static_dir):
+    index = assets.StaticIndex(str(static_dir))
+
+    assert len(index) == 4
+    total, entries = index.query(prefix="js/")
+    assert total == 2 and [e[0] for e in entries] == ["js/p5.js", "js/tiny.js"]
+    assert index.query(ext="css")[1][0][0] == "css/main.css"
+    assert index.query(ext=".PNG")[0] == 1
+    assert [e[0] for e in index.query(mime="image/")[1]] == ["images/logo.png"]
+
+    total, page = index.query(offset=1, limit=2)
+    assert total == 4 and [e[0] for e in page] == ["images/logo.png", "js/p5.js"]
+    path, size, _, mime, readable = index.query(prefix="js/p5.js")[1][0]
+    assert size == len(P5) and mime == "text/javascript" and readable
+
+
+def test_static_index_only_relists_changed_directories(static_dir, clock):
+    index = assets.StaticIndex(str(static_dir), check_interval=5.0, clock=clock)
+    listed = index.dirs_listed
+
+    (static_dir / "js" / "new.js").write_bytes(b"var b;")
+    # Nothing is checked until the interval has passed
+    assert index.query(prefix="js/")[0] == 2
+
+    clock.now = 10.0
+    assert index.query(prefix="js/")[0] == 3
+    assert index.dirs_listed == listed + 1
+    assert index.stats()["scans"] == 2
+
+    (static_dir / "js" / "new.js").unlink()
+    clock.now = 20.0
+    assert index.query(prefix="js/")[0] == 2
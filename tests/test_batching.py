@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from sentiment.batching import BatchScheduler
+from sentiment.emojis import emojis
+from sentiment.ml import SentimentModel
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+class RecordingModel:
+    """Fake model that echoes the first feature and records batch shapes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.shapes = []
+
+    def predict(self, x):
+        self.shapes.append(x.shape)
+        time.sleep(self.delay)
+        scores = np.repeat(x[:, :1].astype(float), len(emojis), axis=1)
+        sentiment = x[:, :1].astype(float)
+        return scores, sentiment
+
+
+def test_scheduler_returns_each_caller_its_slice():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model.predict, max_batch_size=8, max_wait=0.05)
+
+    futures = [scheduler.submit(np.full(140, i)) for i in range(5)]
+    results = [f.result(timeout=5) for f in futures]
+
+    for i, (scores, sentiment) in enumerate(results):
+        assert scores.shape == (len(emojis),)
+        assert scores[0] == i
+        assert sentiment[0] == i
+
+
+def test_scheduler_batches_concurrent_requests():
+    model = RecordingModel(delay=0.01)
+    scheduler = BatchScheduler(model.predict, max_batch_size=4, max_wait=0.05)
+
+    results = {}
+
+    def worker(i):
+        scores, _ = scheduler.predict(np.full((1, 140), i))
+        results[i] = scores[0, 0]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert results == {i: i for i in range(10)}
+    assert all(shape[0] <= 4 for shape in model.shapes)
+    assert len(model.shapes) < 10
+
+    stats = scheduler.stats()
+    assert stats["items"] == 10
+    assert stats["batches"] == len(model.shapes)
+    assert stats["largest_batch"] <= 4
+    assert stats["mean_batch_size"] > 1
+
+
+def test_scheduler_propagates_errors():
+    def failing_predict(x):
+        raise ValueError("boom")
+
+    scheduler = BatchScheduler(failing_predict, max_batch_size=2, max_wait=0)
+    with pytest.raises(ValueError):
+        scheduler.submit(np.zeros(140)).result(timeout=5)
+
+
+def test_sentiment_model_scores_through_scheduler():
+    model = SentimentModel(model="dummy")
+    model.enable_batching(max_batch_size=4, max_wait=0.001)
+
+    res = model.score("Hello world")
+    assert set(res["emoji"]) == set(emojis)
+    assert res["sentiment"] == pytest.approx(0.7)
+    assert model.scheduler.stats()["items"] == 1
+
+
+def test_scheduler_close_answers_queued_requests_first():
+    scheduler = BatchScheduler(RecordingModel(delay=0.05).predict, max_batch_size=2, max_wait=0.01)
+
+    futures = [scheduler.submit(np.full(140, i)) for i in range(5)]
+    thread = scheduler._thread
+    scheduler.close()
+
+    assert [f.result(timeout=5)[0][0] for f in futures] == list(range(5))
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    # A straggler still holding the scheduler is answered inline, without a new worker
+    assert scheduler.submit(np.full(140, 7)).result(timeout=5)[0][0] == 7
+    assert scheduler._thread is None
@@ -0,0 +1,93 @@
+import pytest
+
+from benchmarks.bench_inference import compare, summarize
+from benchmarks.bench_startup import parse_importtime, run_once, top_imports
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+def report(**results):
+    return {"meta": {}, "results": results}
+
+
+def test_summarize_reports_percentiles_in_ms():
+    result = summarize([0.001] * 98 + [0.010, 0.020], items=4)
+
+    assert result["n"] == 100
+    assert result["p50_ms"] == pytest.approx(1.0)
+    assert result["p99_ms"] > result["p95_ms"] >= result["p50_ms"]
+    assert result["per_second"] == pytest.approx(400 / 0.128)
+
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    base = summarize([0.010] * 50)
+    slower = summarize([0.013] * 50)
+    baseline = report(**{"predict.numpy.single": base, "encode.texts": base})
+    current = report(**{"predict.numpy.single": slower, "encode.texts": summarize([0.0105] * 50),
+                        "endpoint.gunicorn": base})
+
+    regressions = compare(baseline, current, threshold=0.15)
+
+    assert {r["benchmark"] for r in regressions} == {"predict.numpy.single"}
+    assert {r["metric"] for r in regressions} == {"p50_ms", "p95_ms", "per_second"}
+    assert regressions[0]["change"] == pytest.approx(0.3)
+    # Faster is never a regression
+    assert compare(current, baseline, threshold=0.15) == []
+
+
+def test_compare_ignores_calls_below_timer_resolution():
+    baseline = report(**{"predict.dummy.single": summarize([0.00001] * 50)})
+    current = report(**{"predict.dummy.single": summarize([0.00003] * 50)})
+    assert compare(baseline, current) == []
+
+
+def test_stored_results_include_the_regressions_the_run_fails_on(tmp_path, monkeypatch):
+    import json
+    import sys
+    from benchmarks import bench_inference
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report(**{"predict.numpy.single": summarize([0.010] * 50)})))
+    monkeypatch.setattr(bench_inference, "run",
+                        lambda args: report(**{"predict.numpy.single": summarize([0.013] * 50)}))
+    output = tmp_path / "current.json"
+    monkeypatch.setattr(sys, "argv", ["bench_inference.py", "--compare", str(baseline), "-o", str(output)])
+
+    with pytest.raises(SystemExit) as excinfo:
+        bench_inference.main()
+
+    assert excinfo.value.code == 1
+    stored = json.loads(output.read_text())
+    assert {r["benchmark"] for r in stored["regressions"]} == {"predict.numpy.single"}
+
+
+def test_parse_importtime_keeps_depth_and_cumulative_time():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   encodings",
+        "import time:       500 |       2500 |   models",
+        "import time:      1000 |       4000 | app",
+    ])
+
+    entries = parse_importtime(stderr)
+
+    assert entries[1] == ("models", 0.0005, 0.0025, 1)
+    assert entries[2] == ("app", 0.001, 0.004, 0)
+    assert [name for name, _ in top_imports(entries, top=2)] == ["app", "models"]
+
+
+def test_site_pages_start_without_heavy_imports():
+    result = run_once("production", "/about")
+
+    assert result["status"] == 200
+    assert result["loaded"] == []
+    assert result["imports"][0][0] == "app"
+
+
+def test_sentiment_model_imports_without_sqlalchemy():
+    import subprocess
+    import sys
+
+    code = "import sys, sentiment.ml; print('sqlalchemy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sentiment.bundle import (ALIGNMENT, bundle_matches, file_sha256, load_bundle,
+                              read_manifest, sample_inputs, write_bundle)
+from sentiment.numpy_model import NumpyLSTMModel
+from tests.test_numpy_model import random_weights
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+@pytest.fixture
+def model():
+    return NumpyLSTMModel(random_weights(vocab=5000))
+
+
+def test_float32_bundle_round_trips_exactly(model, tmp_path):
+    manifest = write_bundle(model, str(tmp_path))
+
+    loaded = load_bundle(str(tmp_path))
+    assert isinstance(loaded.projection.base, np.memmap)
+    for spec in manifest["arrays"].values():
+        assert spec["offset"] % ALIGNMENT == 0
+
+    x = sample_inputs(n=16, length=30)
+    for expected, actual in zip(model.predict(x), loaded.predict(x)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+@pytest.mark.parametrize("dtype,tolerance", [("float16", 1e-2), ("int8", 5e-2)])
+def test_quantized_bundles_report_accuracy(model, tmp_path, dtype, tolerance):
+    write_bundle(model, str(tmp_path), dtype=dtype)
+
+    manifest = read_manifest(str(tmp_path))
+    assert manifest["dtype"] == dtype
+    assert 0 <= manifest["accuracy"]["emoji_max_abs_error"] < tolerance
+    assert 0 <= manifest["accuracy"]["sentiment_max_abs_error"] < tolerance
+
+    loaded = load_bundle(str(tmp_path))
+    x = sample_inputs(n=16, length=30)
+    for expected, actual in zip(model.predict(x), loaded.predict(x)):
+        np.testing.assert_allclose(actual, expected, atol=tolerance)
+
+
+def test_bundle_matches_source_hash(model, tmp_path):
+    h5_path = tmp_path / "model.h5"
+    h5_path.write_bytes(b"weights v1")
+    bundle_dir = str(tmp_path / "bundle")
+
+    write_bundle(model, bundle_dir,
+                 source={"path": "model.h5", "sha256": file_sha256(str(h5_path))})
+    assert bundle_matches(bundle_dir, str(h5_path))
+
+    h5_path.write_bytes(b"weights v2")
+    assert not bundle_matches(bundle_dir, str(h5_path))
+    assert not bundle_matches(str(tmp_path / "missing"), str(h5_path))
+
+
+def test_rejects_unknown_dtype(model, tmp_path):
+    with pytest.raises(ValueError):
+        write_bundle(model, str(tmp_path), dtype="bfloat16")
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+from sentiment.cache import PredictionCache
+from sentiment.emojis import emojis
+from sentiment.ml import SentimentModel
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+class CountingModel:
+    """Fake model that counts the rows it is asked to predict."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, x):
+        self.rows += len(x)
+        return np.full((len(x), len(emojis)), 0.5), np.full((len(x), 3), 0.7)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2)
+    cache.put(b"a", 1)
+    cache.put(b"b", 2)
+    assert cache.get(b"a") == 1  # a is now most recently used
+    cache.put(b"c", 3)
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == 1
+    assert cache.get(b"c") == 3
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["size"] == 2
+
+
+def test_cache_expires_entries_after_ttl(clock):
+    cache = PredictionCache(maxsize=10, ttl=5, clock=clock)
+    cache.put(b"a", 1)
+
+    clock.now = 4.9
+    assert cache.get(b"a") == 1
+    clock.now = 5.0
+    assert cache.get(b"a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_invalidates_when_model_file_changes(tmp_path, clock):
+    model_file = tmp_path / "model.h5"
+    model_file.write_bytes(b"v1")
+    cache = PredictionCache(maxsize=10, watch_path=str(model_file),
+                            check_interval=1.0, clock=clock)
+    cache.put(b"a", 1)
+
+    model_file.write_bytes(b"version 2")
+    os.utime(model_file, ns=(0, 10 ** 9))
+
+    # Changes are only noticed once the check interval has passed
+    assert cache.get(b"a") == 1
+    clock.now = 1.0
+    assert cache.get(b"a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_model_cache_keys_on_features_not_text():
+    backend = CountingModel()
+    model = SentimentModel(model=backend)
+    model.enable_cache(maxsize=16)
+    backend.rows = 0
+
+    first = model.score("Everything is beautiful")
+    # Emojis are stripped by Tweet.x, so this shares the cache entry
+    second = model.score("Everything is beautiful\U0001f600")
+
+    assert first == second
+    assert backend.rows == 1
+    assert model.cache.stats()["hits"] == 1
+
+
+def test_model_cache_predicts_only_missing_rows():
+    backend = CountingModel()
+    model = SentimentModel(model=backend)
+    model.enable_cache(maxsize=16)
+    model.score("We have to talk")
+    backend.rows = 0
+
+    results = model.score_batch(["We have to talk", "I'm crying", "I'm crying"])
+
+    assert len(results) == 3
+    assert backend.rows == 1
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from sentiment.batching import InferenceThread
+from sentiment.coalescing import SingleFlight
+from sentiment.emojis import emojis
+from sentiment.encoder import encode_texts
+from sentiment.ml import SentimentModel
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+class SlowModel:
+    """Fake model that records the thread and inputs of every call."""
+
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def predict(self, x):
+        self.calls.append((threading.current_thread().name, len(x)))
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return np.full((len(x), len(emojis)), 0.5), np.full((len(x), 1), 0.7)
+
+
+def score_concurrently(model, texts):
+    barrier = threading.Barrier(len(texts))
+    results, errors = [None] * len(texts), []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = model.predict(encode_texts([texts[i]]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results, errors
+
+
+def test_single_flight_shares_owner_result():
+    flight = SingleFlight()
+    owned, waiting = flight.claim(["a", "b"])
+    assert owned == ["a", "b"] and waiting == {}
+
+    owned, waiting = flight.claim(["a", "c"])
+    assert owned == ["c"] and list(waiting) == ["a"]
+
+    flight.resolve({"a": 1, "b": 2})
+    flight.fail(["c"], ValueError("boom"))
+    assert waiting["a"].result(timeout=1) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 3, "coalesced": 1}
+
+
+def test_identical_concurrent_requests_run_the_model_once():
+    slow = SlowModel()
+    model = SentimentModel(model=slow)
+    slow.calls.clear()
+    model.enable_coalescing()
+
+    results, errors = score_concurrently(model, ["same text"] * 6)
+
+    assert not errors
+    assert len(slow.calls) == 1
+    assert model.flight.stats()["coalesced"] == 5
+    for scores, sentiment in results:
+        assert scores.shape == (1, len(emojis))
+        assert sentiment[0, 0] == pytest.approx(0.7)
+
+
+def test_distinct_texts_are_not_coalesced():
+    slow = SlowModel(delay=0.05)
+    model = SentimentModel(model=slow)
+    slow.calls.clear()
+    model.enable_coalescing()
+
+    _, errors = score_concurrently(model, ["one", "two", "three"])
+
+    assert not errors
+    assert sum(n for _, n in slow.calls) == 3
+    assert model.flight.stats()["coalesced"] == 0
+
+
+def test_errors_reach_every_coalesced_caller():
+    slow = SlowModel()
+    model = SentimentModel(model=slow)
+    slow.error = RuntimeError("model exploded")
+    model.enable_coalescing()
+
+    _, errors = score_concurrently(model, ["same text"] * 4)
+
+    assert len(errors) == 4
+    assert model.flight.stats()["in_flight"] == 0
+
+
+def test_inference_thread_runs_model_off_the_request_thread():
+    slow = SlowModel(delay=0)
+    runner = InferenceThread(slow.predict)
+
+    scores, _ = runner.predict(np.zeros((3, 140), dtype=np.int32))
+
+    assert scores.shape == (3, len(emojis))
+    assert slow.calls == [("sentiment-inference", 3)]
+
+    model = SentimentModel(model=slow)
+    model.enable_inference_thread()
+    model.score("hello")
+    assert slow.calls[-1][0] == "sentiment-inference"
@@ -25,4 +25,24 @@ def test_production_config():
     assert app.config['SESSION_COOKIE_SECURE']
     assert app.config['SESSION_COOKIE_HTTPONLY']
     assert app.config['REMEMBER_COOKIE_SECURE']
-    assert app.config['REMEMBER_COOKIE_HTTPONLY']
\ No newline at end of file
+    assert app.config['REMEMBER_COOKIE_HTTPONLY']
+    # App Engine would only deliver stream frames once the stream ends
+    assert not app.config['SENTIMENT_STREAM']
+
+
+def test_production_registers_the_database_on_first_use():
+    """With LAZY_DATABASE the database is set up by get_db, with the SQLite hook on every connection."""
+    from models import get_db
+
+    app = create_app('production')
+    assert app.config['LAZY_DATABASE']
+    assert 'sqlalchemy' not in app.extensions
+
+    with app.app_context():
+        db = get_db()
+        assert 'sqlalchemy' in app.extensions
+        connection = db.engine.raw_connection()
+        try:
+            assert connection.driver_connection.text_factory is str
+        finally:
+            connection.close()
@@ -78,6 +78,40 @@ def test_app_yaml_static_handlers():
     assert 'expiration' in static_images_handler, "Images handler should have expiration"
     assert 'secure' in static_images_handler, "Images handler should have secure: always"
 
+
+def test_gcloudignore_uploads_built_assets(tmp_path):
+    """The hashed assets and their manifest are uploaded with the app."""
+    import shutil
+    import subprocess
+
+    # .gcloudignore uses .gitignore rules, so let git evaluate it in a scratch repo
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.gcloudignore'),
+                tmp_path / '.gitignore')
+    subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True)
+
+    def ignored(path):
+        return subprocess.run(['git', 'check-ignore', '-q', '--no-index', path],
+                              cwd=tmp_path).returncode == 0
+
+    assert not ignored('static/build/manifest.json')
+    assert not ignored('static/build/js/p5.0123456789.js')
+    assert ignored('build/lib/app.py')
+    assert ignored('tests/test_deployment.py')
+
+
+def test_app_yaml_build_handler():
+    """Hashed build output is served with an immutable cache lifetime."""
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app.yaml')) as f:
+        handlers = yaml.safe_load(f)['handlers']
+    urls = [handler.get('url') for handler in handlers]
+
+    assert '/static/build' in urls
+    # App Engine uses the first matching handler, so it must precede /static
+    assert urls.index('/static/build') < urls.index('/static')
+    build = handlers[urls.index('/static/build')]
+    assert build['static_dir'] == 'static/build'
+    assert 'immutable' in build['http_headers']['Cache-Control']
+
 # Removed test_workflow_static_file_copying
     
 def test_flask_app_static_config():
@@ -122,3 +156,32 @@ def test_app_yaml_min_idle_instances():
     scaling = config.get('automatic_scaling', {})
     min_idle = scaling.get('min_idle_instances', 0)
     assert min_idle >= 1, "app.yaml should set min_idle_instances >= 1"
+
+
+def test_app_yaml_warmup_and_gunicorn_config():
+    """App Engine sends warmup requests and starts gunicorn with our config."""
+    base_dir = os.path.dirname(os.path.dirname(__file__))
+    yaml_path = os.path.join(base_dir, 'app.yaml')
+
+    with open(yaml_path, 'r') as f:
+        config = yaml.safe_load(f)
+
+    assert 'warmup' in config.get('inbound_services', [])
+    assert '-c gunicorn.conf.py' in config['entrypoint']
+
+    settings = {}
+    with open(os.path.join(base_dir, 'gunicorn.conf.py')) as f:
+        exec(f.read(), settings)
+    assert settings['preload_app'] is True
+    # Coalescing, batching and streams need requests to overlap in a worker
+    if 'GUNICORN_THREADS' not in os.environ:
+        assert settings['worker_class'] == 'gthread' and settings['threads'] > 1
+
+    from config import Config
+    # A stream must end, and keep its connection alive, within the worker timeout
+    assert Config.SENTIMENT_STREAM_HEARTBEAT < Config.SENTIMENT_STREAM_LIFETIME < settings['timeout']
+    # Streams always leave threads free for the stream's own posts and other pages
+    assert Config.SENTIMENT_STREAM_MAX_SESSIONS <= settings['threads'] - 2
+    assert Config.PROFILE_MAX_SECONDS < settings['timeout']
+    for hook in ('when_ready', 'post_fork', 'post_worker_init'):
+        assert callable(settings[hook])
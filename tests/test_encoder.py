@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from sentiment.emojis import emojis, positive_emojis, negative_emojis
+from sentiment.encoder import (SENTIMENT_CLASS, emoji_indices, encode_labels,
+                               encode_sentiment, encode_texts, strip_emojis)
+from sentiment.models import Tweet
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+def legacy_x(raw):
+    """The original per-character Tweet.x implementation."""
+    text = raw
+    for e in emojis:
+        text = text.replace(e, "")
+    x = []
+    if len(text) < 140:
+        x += [0] * (140 - len(text))
+    x += [ord(c) % 5000 for c in text]
+    return np.array(x[0:140])
+
+
+def legacy_y(raw):
+    y = np.zeros(len(emojis))
+    for e in [e for e in emojis if e in raw]:
+        y[emojis.index(e)] = 1
+    return y
+
+
+def random_texts(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    alphabet = list("abc xyz!?'") + ["é", "中", "\U0001f680"] + emojis[:10] + emojis[-5:]
+    return ["".join(rng.choice(alphabet, size=rng.integers(0, 220))) for _ in range(n)]
+
+
+def test_encode_texts_matches_legacy_encoding():
+    texts = random_texts() + ["", "a" * 140, "b" * 141, emojis[0] * 5, "I love this app! \U0001f60a"]
+
+    x = encode_texts(texts)
+
+    assert x.shape == (len(texts), 140)
+    assert x.dtype == np.int32
+    for row, text in zip(x, texts):
+        np.testing.assert_array_equal(row, legacy_x(text))
+
+
+def test_encode_labels_matches_legacy_encoding():
+    texts = random_texts(seed=1)
+
+    y = encode_labels(texts)
+
+    assert y.shape == (len(texts), len(emojis))
+    assert y.dtype == np.float32
+    for row, text in zip(y, texts):
+        np.testing.assert_array_equal(row, legacy_y(text))
+
+
+def test_encode_into_preallocated_buffers():
+    out = np.full((2, 140), 7, dtype=np.int32)
+    result = encode_texts(["hi", ""], out=out)
+    assert result is out
+    assert out[1].sum() == 0
+    assert list(out[0, -2:]) == [ord("h"), ord("i")]
+
+
+def test_encode_sentiment_picks_a_present_emoji():
+    happy, sad = positive_emojis[0], negative_emojis[0]
+    labels = encode_labels(["no emoji", happy, sad, happy + sad])
+    rng = np.random.RandomState(0)
+
+    sentiment = encode_sentiment(labels, rng=rng)
+
+    np.testing.assert_array_equal(sentiment[0], [0, 0, 0])
+    np.testing.assert_array_equal(sentiment[1], [1, 0, 0])
+    np.testing.assert_array_equal(sentiment[2], [0, 0, 1])
+    assert sentiment[3].sum() == 1
+    assert sentiment[3, 1] == 0
+
+
+def test_sentiment_classes():
+    for i, e in enumerate(emojis):
+        expected = 0 if e in positive_emojis else 2 if e in negative_emojis else 1
+        assert SENTIMENT_CLASS[i] == expected
+
+
+def test_tweet_properties_use_encoder():
+    raw = "Hello \U0001f60a world \U0001f622"
+    tweet = Tweet(raw)
+
+    assert tweet.text == strip_emojis(raw) == "Hello  world "
+    assert tweet.emojis == [emojis[i] for i in emoji_indices(raw)]
+    np.testing.assert_array_equal(tweet.x, legacy_x(raw))
+    np.testing.assert_array_equal(tweet.y, legacy_y(raw))
+    assert tweet.sentiment.sum() == 1
+
+
+def test_single_text_path_matches_batch_path():
+    texts = random_texts(n=50, seed=2)
+    batch = encode_texts(texts)
+    for row, text in zip(batch, texts):
+        np.testing.assert_array_equal(encode_texts([text])[0], row)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from sentiment.emojis import negative_emojis, positive_emojis
+from sentiment.encoder import encode_labels, encode_texts
+from sentiment.feature_store import FeatureStore
+from sentiment.models import Tweet
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+HAPPY, SAD = positive_emojis[0], negative_emojis[0]
+TEXTS = ["I love this " + HAPPY, "We have to talk", "I'm crying " + SAD,
+         "mixed " + HAPPY + SAD, "plain text"]
+
+
+@pytest.fixture
+def tweets_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tweets.db'}")
+    Tweet.__table__.create(engine)
+    with Session(engine) as session:
+        session.execute(insert(Tweet.__table__), [{"raw_tweet": t} for t in TEXTS])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def test_update_encodes_whole_table(tweets_db, tmp_path):
+    store = FeatureStore(str(tmp_path / "features"))
+    with Session(tweets_db) as session:
+        assert store.update(session, chunk_size=2) == len(TEXTS)
+
+    store = FeatureStore(str(tmp_path / "features"))
+    idx = np.arange(len(TEXTS))
+    assert store.rows == len(TEXTS)
+    assert store.last_id == len(TEXTS)
+    np.testing.assert_array_equal(store.features(idx), encode_texts(TEXTS))
+    np.testing.assert_array_equal(store.labels(idx), encode_labels(TEXTS))
+    assert isinstance(store.arrays()["x.int32"], np.memmap)
+
+
+def test_update_is_incremental(tweets_db, tmp_path):
+    store = FeatureStore(str(tmp_path / "features"))
+    with Session(tweets_db) as session:
+        store.update(session)
+        session.execute(insert(Tweet.__table__), [{"raw_tweet": "new one " + SAD}])
+        session.commit()
+
+        assert store.update(session) == 1
+        assert store.update(session) == 0
+
+    assert store.rows == len(TEXTS) + 1
+    np.testing.assert_array_equal(store.labels([store.rows - 1]),
+                                  encode_labels(["new one " + SAD]))
+
+
+def test_sentiment_sampled_from_stored_emojis(tmp_path):
+    store = FeatureStore(str(tmp_path / "features"))
+    store.append(list(range(1, len(TEXTS) + 1)), TEXTS)
+
+    sentiment = store.sentiment(np.arange(len(TEXTS)), rng=np.random.RandomState(0))
+
+    np.testing.assert_array_equal(sentiment[0], [1, 0, 0])
+    np.testing.assert_array_equal(sentiment[1], [0, 0, 0])
+    np.testing.assert_array_equal(sentiment[2], [0, 0, 1])
+    assert sentiment[3].sum() == 1
+    np.testing.assert_array_equal(sentiment[4], [0, 0, 0])
+
+
+def test_interrupted_append_is_discarded(tmp_path):
+    directory = str(tmp_path / "features")
+    store = FeatureStore(directory)
+    store.append([1, 2], TEXTS[:2])
+
+    # Simulate a crash after the data files were written but before the manifest
+    with open(store._path("x.int32"), "ab") as f:
+        f.write(b"\1" * 140 * 4)
+
+    store = FeatureStore(directory)
+    store.append([3], TEXTS[2:3])
+    np.testing.assert_array_equal(store.features(np.arange(3)), encode_texts(TEXTS[:3]))
+
+
+def test_append_rejects_old_ids(tmp_path):
+    store = FeatureStore(str(tmp_path / "features"))
+    store.append([5], ["a"])
+    with pytest.raises(ValueError):
+        store.append([5], ["b"])
+
+
+def test_batches_cover_every_row_each_epoch(tmp_path):
+    store = FeatureStore(str(tmp_path / "features"))
+    store.append(list(range(1, 11)), [f"tweet {i}" for i in range(10)])
+
+    seen = []
+    for x, (y, s) in store.batches(batch_size=5, epochs=1):
+        assert x.shape == (5, 140)
+        assert y.shape == (5, 98)
+        assert s.shape == (5, 3)
+        seen.extend(x[:, -1].tolist())
+
+    assert sorted(seen) == sorted(ord(str(i)) for i in range(10))
@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from sentiment.emojis import positive_emojis
+from sentiment.encoder import encode_texts
+from sentiment.feature_store import FeatureStore
+from sentiment.ingest import ingest, parse_lines, read_checkpoint
+from sentiment.models import Tweet
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+HAPPY = positive_emojis[0]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tweets.db'}")
+    yield engine
+    engine.dispose()
+
+
+def write_jsonl(path, texts):
+    with open(path, "w", encoding="utf-8") as f:
+        for text in texts:
+            f.write(json.dumps({"id_str": "1", "text": text}) + "\n")
+    return str(path)
+
+
+def stored_texts(engine):
+    with Session(engine) as session:
+        return list(session.execute(select(Tweet.raw_tweet).order_by(Tweet.id)).scalars())
+
+
+def test_parse_lines_jsonl_and_csv():
+    lines = [b'{"text": "a"}\n', b'"b"\n', b'\n', b'not json\n', b'{"full_text": "c"}\n']
+    assert parse_lines(lines, "jsonl") == (["a", "b", "c"], 1)
+
+    lines = [b'1,"hello, world"\n', b'2,\n', b'3,bye\n']
+    assert parse_lines(lines, "csv", column=1) == (["hello, world", "bye"], 1)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_ingest_loads_tweets_and_features(engine, tmp_path, workers):
+    texts = [f"tweet {i} {HAPPY}" for i in range(250)]
+    path = write_jsonl(tmp_path / "tweets.jsonl", texts)
+    store = FeatureStore(str(tmp_path / "features"))
+
+    stats = ingest(engine, path, chunk_size=40, workers=workers, store=store)
+
+    assert stats["rows"] == len(texts)
+    assert stored_texts(engine) == texts
+    assert store.rows == len(texts)
+    np.testing.assert_array_equal(store.features(np.arange(len(texts))), encode_texts(texts))
+
+
+def test_ingest_restores_journal_mode(engine, tmp_path):
+    path = write_jsonl(tmp_path / "tweets.jsonl", ["a", "b"])
+
+    ingest(engine, path, workers=0)
+
+    engine.dispose()
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    assert not (tmp_path / "tweets.db-wal").exists()
+
+
+def test_ingest_csv(engine, tmp_path):
+    path = tmp_path / "tweets.csv"
+    path.write_text('id,text\n1,"hi, there"\n2,second\n', encoding="utf-8")
+
+    ingest(engine, str(path), workers=0)
+
+    assert stored_texts(engine) == ["hi, there", "second"]
+
+
+def test_ingest_resumes_from_checkpoint(engine, tmp_path):
+    texts = [f"tweet {i}" for i in range(100)]
+    path = write_jsonl(tmp_path / "tweets.jsonl", texts)
+
+    def interrupt(stats):
+        if stats["rows"] >= 30:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        ingest(engine, path, chunk_size=30, workers=0, progress=interrupt)
+    assert len(stored_texts(engine)) == 30
+
+    stats = ingest(engine, path, chunk_size=30, workers=0)
+
+    assert stats["rows"] == 70
+    assert stored_texts(engine) == texts
+    with engine.connect() as connection:
+        assert read_checkpoint(connection, path).rows == 100
+
+    # A finished file loads nothing more
+    assert ingest(engine, path, workers=0)["rows"] == 0
+
+
+def test_ingest_command(app, runner, tmp_path, monkeypatch):
+    monkeypatch.setattr("sentiment.ml.data_path", lambda *parts: str(tmp_path.joinpath(*parts)))
+    path = write_jsonl(tmp_path / "tweets.jsonl", ["from the cli " + HAPPY])
+
+    result = runner.invoke(args=["sentiment", "ingest", path, "--workers", "0"])
+
+    assert result.exit_code == 0, result.output
+    assert "Loaded 1 tweets" in result.output
+    # The store also catches up on tweets that were already in the database
+    with app.app_context():
+        assert FeatureStore(str(tmp_path / "features")).rows == Tweet.query.count()
@@ -10,4 +10,17 @@ def test_makefile_deploy_target():
     output = result.stdout
     assert "npm run build" in output
     assert "elm make" in output
-    assert "gcloud app deploy" in output
+    assert "flask assets build" in output
+    assert output.index("flask assets build") < output.index("gcloud app deploy")
+
+
+def test_makefile_bench_target():
+    """`make bench` writes JSON results and compares them to a stored baseline."""
+    result = subprocess.run(["make", "--dry-run", "bench"], capture_output=True, text=True, check=False)
+    assert "benchmarks/bench_inference.py --output" in result.stdout
+    assert "--compare" in result.stdout
+
+
+def test_makefile_bench_startup_target():
+    result = subprocess.run(["make", "--dry-run", "bench-startup"], capture_output=True, text=True, check=False)
+    assert "benchmarks/bench_startup.py --config production" in result.stdout
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from sentiment.metrics import Metrics, end_trace, phase, start_trace
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+def test_phases_only_record_inside_a_trace():
+    with phase("predict"):
+        pass
+    assert end_trace() is None
+
+    trace = start_trace()
+    with phase("predict"):
+        pass
+    with phase("predict"):
+        pass
+    with phase("serialize"):
+        pass
+    assert end_trace() is trace
+    assert set(trace.phases) == {"predict", "serialize"}
+    assert trace.server_timing(0.0125).endswith("total;dur=12.500")
+    assert trace.server_timing().startswith("predict;dur=")
+
+
+def test_histograms_merge_across_threads():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    route = (("route", "score"),)
+
+    def work():
+        for _ in range(100):
+            metrics.observe("latency", 0.05, route)
+            metrics.inc("requests", labels=route)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.observe("latency", 0.005, route)
+    metrics.observe("latency", 3.0, route)
+
+    histograms, counters = metrics.snapshot()
+    assert histograms[("latency", route)].counts == [1, 400, 1]
+    assert counters[("requests", route)] == 400
+    assert metrics.count("requests", route) == 400
+
+
+def test_shards_of_exited_threads_are_folded_in():
+    """A thread per request must not leave a shard per request behind."""
+    metrics = Metrics(buckets=(0.01, 0.1))
+
+    for batch in range(5):
+        threads = [threading.Thread(target=metrics.inc, args=("requests",)) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert metrics.count("requests") == 20 * (batch + 1)
+        assert metrics.shard_count() <= 1
+
+
+def test_render_prometheus_text():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.help["latency"] = "Request latency."
+    metrics.observe("latency", 0.05, (("route", "score"),))
+    metrics.inc("failures_total")
+
+    text = metrics.render(extra=[("cache_hits", "counter", (), 7),
+                                 ("info", "gauge", (("version", 'a"b'),), 1)])
+
+    assert "# HELP latency Request latency.\n# TYPE latency histogram" in text
+    assert 'latency_bucket{route="score",le="0.01"} 0' in text
+    assert 'latency_bucket{route="score",le="0.1"} 1' in text
+    assert 'latency_bucket{route="score",le="+Inf"} 1' in text
+    assert 'latency_count{route="score"} 1' in text
+    assert "# TYPE failures_total counter\nfailures_total 1" in text
+    assert "cache_hits 7" in text
+    assert 'info{version="a\\"b"} 1' in text
@@ -0,0 +1,162 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from sentiment.emojis import emojis
+from sentiment.ml import SentimentModel
+from sentiment.models import Tweet
+from sentiment.numpy_model import NumpyLSTMModel
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'model.h5')
+TEXTS = ["I love this app!", "We have to talk", "", "x" * 200, "I'm crying \U0001f62d"]
+
+
+def random_weights(seed=0, vocab=50, dim=8, units=6):
+    rng = np.random.default_rng(seed)
+    return {
+        "embeddings": rng.normal(size=(vocab, dim)).astype(np.float32),
+        "lstm_kernel": rng.normal(size=(dim, 4 * units)).astype(np.float32),
+        "lstm_recurrent_kernel": rng.normal(size=(units, 4 * units)).astype(np.float32),
+        "lstm_bias": rng.normal(size=(4 * units,)).astype(np.float32),
+        "emoji_kernel": rng.normal(size=(units, len(emojis))).astype(np.float32),
+        "emoji_bias": rng.normal(size=(len(emojis),)).astype(np.float32),
+        "sentiment_kernel": rng.normal(size=(units, 3)).astype(np.float32),
+        "sentiment_bias": rng.normal(size=(3,)).astype(np.float32),
+    }
+
+
+def has_keras_model(path):
+    if not os.path.exists(path):
+        return False
+    with h5py.File(path, 'r') as f:
+        return 'model_config' in f.attrs
+
+
+def test_padding_shortcut_matches_full_recurrence():
+    """Skipping leading zeros gives the same states as running every step."""
+    model = NumpyLSTMModel(random_weights())
+    rng = np.random.default_rng(1)
+    x = rng.integers(1, 50, size=(6, 20))
+    for i, pad in enumerate([0, 3, 3, 19, 20, 7]):
+        x[i, :pad] = 0
+
+    h, c = model.run_lstm(x)
+
+    for i in range(len(x)):
+        h_ref = np.zeros((1, model.units), dtype=np.float32)
+        c_ref = np.zeros((1, model.units), dtype=np.float32)
+        for token in x[i]:
+            h_ref, c_ref = model._step(model.projection[[token]], h_ref, c_ref)
+        np.testing.assert_allclose(h[i], h_ref[0], atol=1e-6)
+        np.testing.assert_allclose(c[i], c_ref[0], atol=1e-6)
+
+
+def test_predict_shapes():
+    model = NumpyLSTMModel(random_weights())
+    scores, sentiment = model.predict(np.zeros((3, 140), dtype=int))
+    assert scores.shape == (3, len(emojis))
+    assert sentiment.shape == (3, 3)
+    assert scores.dtype == np.float32
+
+
+def left_pad(tokens, length=30):
+    row = np.zeros((1, length), dtype=np.int64)
+    if len(tokens):
+        row[0, length - len(tokens):] = tokens
+    return row
+
+
+def test_prefix_cache_matches_full_passes():
+    """Appending, editing and deleting tokens give the same outputs as a full pass."""
+    reference = NumpyLSTMModel(random_weights())
+    model = NumpyLSTMModel(random_weights())
+    cache = model.enable_prefix_cache(maxsize=16, window=4)
+
+    rng = np.random.default_rng(3)
+    typed = list(rng.integers(1, 50, size=12))
+    edits = [typed[:i] for i in range(1, 13)]              # typing, past the window
+    edits += [typed[:5] + [7] + typed[6:12]]               # change in the middle
+    edits += [typed[:i] for i in range(11, 3, -1)]         # backspacing
+    edits += [list(rng.integers(1, 50, size=30)), []]      # full length and empty
+
+    for tokens in edits:
+        x = left_pad(tokens)
+        for expected, actual in zip(reference.predict(x), model.predict(x)):
+            np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+    stats = cache.stats()
+    assert stats["hits"] > stats["misses"]
+    # Typing one more token costs a single recurrence step
+    assert stats["steps"] < sum(len(tokens) for tokens in edits) / 2
+
+
+def test_prefix_cache_is_skipped_for_batches():
+    model = NumpyLSTMModel(random_weights())
+    cache = model.enable_prefix_cache()
+    model.predict(np.ones((2, 30), dtype=np.int64))
+    assert cache.stats()["misses"] == 0
+
+
+def test_sentiment_model_prefix_cache_needs_numpy_backend():
+    assert SentimentModel(model="dummy").enable_prefix_cache() is None
+    model = SentimentModel(model=NumpyLSTMModel(random_weights()))
+    assert model.enable_prefix_cache(maxsize=8) is model._model.prefix_cache
+
+
+def test_matches_keras_on_built_model(tmp_path):
+    """Weights exported by Keras reproduce the Keras predictions."""
+    pytest.importorskip("tensorflow")
+    keras_model = SentimentModel(model="dummy")._build_model()
+    path = str(tmp_path / "model.h5")
+    keras_model.save(path)
+
+    numpy_model = NumpyLSTMModel.from_h5(path)
+    assert numpy_model.recurrent_activation == keras_model.layers[2].recurrent_activation.__name__
+
+    x = np.stack([Tweet(t).x for t in TEXTS])
+    expected = keras_model.predict(x, verbose=0)
+    actual = numpy_model.predict(x)
+    for e, a in zip(expected, actual):
+        np.testing.assert_allclose(a, e, atol=1e-5)
+
+
+@pytest.mark.skipif(not has_keras_model(MODEL_PATH), reason="Trained model not available")
+def test_matches_keras_on_trained_model():
+    tf = pytest.importorskip("tensorflow")
+    keras_model = tf.keras.models.load_model(MODEL_PATH)
+    numpy_model = NumpyLSTMModel.from_h5(MODEL_PATH)
+
+    x = np.stack([Tweet(t).x for t in TEXTS])
+    expected = keras_model.predict(x, verbose=0)
+    actual = numpy_model.predict(x)
+    for e, a in zip(expected, actual):
+        np.testing.assert_allclose(a, e, atol=1e-5)
+
+
+@pytest.mark.skipif(not has_keras_model(MODEL_PATH), reason="Trained model not available")
+def test_sentiment_model_numpy_backend(app):
+    with app.app_context():
+        model = SentimentModel(model="numpy")
+        assert isinstance(model._model, NumpyLSTMModel)
+        res = model.score("Everything is beautiful")
+        assert set(res["emoji"]) == set(emojis)
+
+
+def test_prefix_cache_widens_only_for_typed_text():
+    """A one-off text runs a single row; the window rows are built once it is extended."""
+    model = NumpyLSTMModel(random_weights())
+    cache = model.enable_prefix_cache(window=4)
+
+    model.predict(left_pad([5, 6, 7]))
+    assert [len(h) for h, _ in cache._data.values()] == [1]
+
+    model.predict(left_pad([5, 6, 7, 8]))
+    assert len(cache._data[np.array([5, 6, 7, 8]).tobytes()][0]) == 5
+    assert cache.stats()["misses"] == 2
+
+    model.predict(left_pad([5, 6, 7, 8, 9]))
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,78 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask, render_template
+
+from app import ABOUT_TEXT
+from pagecache import PageCache
+
+pytestmark = [pytest.mark.unit]
+
+
+def test_pages_are_rendered_once(app, client):
+    cache = app.extensions["page_cache"]
+    cache.clear()
+    renders = cache.renders
+
+    first = client.get('/demos')
+    second = client.get('/demos')
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data and b'html' in first.data
+    assert cache.renders == renders + 1
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert not first.headers['ETag'].startswith('W/')
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get('/contact').headers['ETag']
+
+    response = client.get('/contact', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_gzip_variant(client):
+    plain = client.get('/asteroids', headers={'Accept-Encoding': 'identity'})
+    compressed = client.get('/asteroids', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+
+
+def test_curl_variant_is_cached_separately(client):
+    html = client.get('/about')
+    text = client.get('/about', headers={'User-Agent': 'curl/8.0'})
+
+    assert b'<' in html.data
+    assert text.get_data(as_text=True) == ABOUT_TEXT
+    assert text.headers['ETag'] != html.headers['ETag']
+    assert 'User-Agent' in text.headers['Vary']
+    # / and /about share the plain text page
+    assert client.get('/', headers={'User-Agent': 'curl/8.0'}).headers['ETag'] == text.headers['ETag']
+
+
+def test_template_changes_invalidate_with_auto_reload(tmp_path):
+    (tmp_path / 'page.html').write_text('one')
+    app = Flask(__name__, template_folder=str(tmp_path))
+    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    cache = PageCache(app)
+
+    @app.route('/page')
+    def page():
+        return cache.serve('page.html', lambda: render_template('page.html'))
+
+    client = app.test_client()
+    assert client.get('/page').data == b'one'
+
+    (tmp_path / 'page.html').write_text('two')
+    stat = os.stat(tmp_path / 'page.html')
+    os.utime(tmp_path / 'page.html', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert client.get('/page').data == b'two'
+    assert cache.renders == 2
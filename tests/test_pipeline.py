@@ -0,0 +1,80 @@
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from sentiment.pipeline import Prefetcher, shuffle_buffer, stream_batches
+from sentiment.models import Tweet
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+N_TWEETS = 1000
+
+
+@pytest.fixture
+def tweets_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tweets.db'}")
+    Tweet.__table__.create(engine)
+    with Session(engine) as session:
+        # The last character encodes the tweet number so batches can be traced
+        session.execute(insert(Tweet.__table__),
+                        [{"raw_tweet": f"tweet {chr(1000 + i)}"} for i in range(N_TWEETS)])
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def test_shuffle_buffer_is_a_permutation():
+    rng = np.random.RandomState(0)
+    items = list(range(100))
+    shuffled = list(shuffle_buffer(iter(items), buffer_size=10, rng=rng))
+    assert sorted(shuffled) == items
+    assert shuffled != items
+
+
+def test_stream_batches_covers_corpus_once_per_epoch(tweets_engine):
+    batches = stream_batches(tweets_engine, batch_size=100, chunk_size=128,
+                             shuffle_size=200, prefetch=2, epochs=1,
+                             rng=np.random.RandomState(0))
+
+    seen = []
+    for x, (y, s) in batches:
+        assert x.shape == (100, 140) and x.dtype == np.int32
+        assert y.shape == (100, 98)
+        assert s.shape == (100, 3)
+        seen.extend(x[:, -1].tolist())
+
+    assert sorted(seen) == [1000 + i for i in range(N_TWEETS)]
+    assert seen != sorted(seen)
+
+
+def test_stream_batches_reuses_preallocated_buffers(tweets_engine):
+    batches = stream_batches(tweets_engine, batch_size=10, prefetch=0, epochs=1)
+    buffers = {id(next(batches)[0]) for _ in range(12)}
+    assert len(buffers) == 2
+
+
+def test_stream_batches_requires_tweets(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    Tweet.__table__.create(engine)
+    with pytest.raises(ValueError):
+        next(stream_batches(engine, batch_size=10))
+
+
+def test_prefetcher_runs_ahead_and_propagates_errors():
+    produced = threading.Semaphore(0)
+
+    def items():
+        for i in range(3):
+            produced.release()
+            yield i
+        raise RuntimeError("boom")
+
+    prefetcher = Prefetcher(items(), size=2)
+    # The background thread fills the queue before anything is consumed
+    assert produced.acquire(timeout=5) and produced.acquire(timeout=5)
+    assert [next(prefetcher) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        next(prefetcher)
@@ -0,0 +1,122 @@
+import os
+import pstats
+import threading
+
+import pytest
+
+from profiling import RequestProfiler, StackSampler, capture
+
+pytestmark = [pytest.mark.unit]
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,))
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_capture_writes_folded_stacks(busy_thread, tmp_path):
+    sampler = capture(0.3, interval=0.005)
+
+    assert sampler.samples > 0 and not sampler.running
+    folded = sampler.folded()
+    busy = [line for line in folded.splitlines() if "busy_loop (test_profiling.py:" in line]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[0].startswith("_bootstrap (threading.py:")
+    # The capturing thread itself is left out
+    assert "capture (profiling.py" not in folded
+
+    path = sampler.dump(str(tmp_path / "capture.folded"))
+    assert open(path).read() == folded
+
+
+def test_idle_threads_are_skipped():
+    event = threading.Event()
+    waiter = threading.Thread(target=event.wait)
+    waiter.start()
+    try:
+        sampler = StackSampler(exclude=[threading.get_ident()])
+        sampler.sample()
+        assert sampler.folded() == ""
+        sampler.idle = True
+        sampler.sample()
+        assert "wait (threading.py" in sampler.folded()
+    finally:
+        event.set()
+        waiter.join()
+
+
+def test_request_profiler_merges_runs(tmp_path):
+    profiler = RequestProfiler(str(tmp_path / "requests.prof"), dump_every=2)
+    for _ in range(2):
+        profile = profiler.begin()
+        sorted(range(1000), key=lambda i: -i)
+        profiler.end(profile)
+
+    assert profiler.requests == 2
+    assert os.path.exists(profiler.path)
+    stats = pstats.Stats(profiler.path)
+    assert any(func[2] == "<lambda>" for func in stats.stats)
+
+
+def test_profile_endpoint_requires_token(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(client.application, "instance_path", str(tmp_path))
+    config = client.application.config
+    monkeypatch.setitem(config, 'PROFILE_TOKEN', '')
+    assert client.post('/debug/profile').status_code == 404
+
+    monkeypatch.setitem(config, 'PROFILE_TOKEN', 'secret')
+    assert client.post('/debug/profile', headers={"Authorization": "Bearer nope"}).status_code == 403
+
+    response = client.post('/debug/profile?seconds=0.05',
+                           headers={"Authorization": "Bearer secret"},
+                           environ_overrides={"wsgi.multithread": True})
+    assert response.status_code == 200
+    assert response.headers["X-Profile-File"].endswith(".folded")
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    assert (tmp_path / "profiles" / response.headers["X-Profile-File"]).exists()
+
+
+def test_profile_endpoint_refuses_single_threaded_workers(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'PROFILE_TOKEN', 'secret')
+    response = client.post('/debug/profile?seconds=0.05',
+                           headers={"Authorization": "Bearer secret"},
+                           environ_overrides={"wsgi.multithread": False})
+    assert response.status_code == 503
+    assert "GUNICORN_THREADS" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("query", ["seconds=-1", "seconds=0", "seconds=nan", "seconds=21", "seconds=x",
+                                   "interval=nan&seconds=0.05", "interval=inf&seconds=0.05",
+                                   "interval=0&seconds=0.05"])
+def test_profile_endpoint_rejects_bad_durations(client, monkeypatch, query):
+    monkeypatch.setitem(client.application.config, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setitem(client.application.config, 'PROFILE_MAX_SECONDS', 20)
+    response = client.post(f'/debug/profile?{query}',
+                           headers={"Authorization": "Bearer secret"},
+                           environ_overrides={"wsgi.multithread": True})
+    assert response.status_code == 400
+    assert query.split("=")[0] in response.get_json()["error"]
+
+
+def test_sampled_requests_are_profiled(client, monkeypatch, tmp_path):
+    import app as app_module
+    monkeypatch.setitem(client.application.config, 'PROFILE_REQUEST_RATE', 1.0)
+    profiler = RequestProfiler(str(tmp_path / "requests.prof"), dump_every=1)
+    monkeypatch.setattr(app_module, "_request_profiler", profiler)
+
+    client.get('/about')
+
+    assert profiler.requests == 1
+    assert any(func[2] == "about" for func in pstats.Stats(profiler.path).stats)
@@ -0,0 +1,130 @@
+import gc
+import os
+import weakref
+
+import numpy as np
+import pytest
+
+from sentiment.registry import ModelRegistry
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+class FakeModel:
+    def __init__(self, version):
+        self.version = version
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def touch(path, mtime):
+    with open(path, "ab") as f:
+        f.write(b"x")
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = tmp_path / "model.h5"
+    path.write_bytes(b"weights")
+    return str(path)
+
+
+def make_registry(model_file, load, clock):
+    return ModelRegistry(FakeModel("v1"), load, model_file, check_interval=5.0, clock=clock)
+
+
+def test_reloads_in_background_when_the_file_changes(model_file, clock):
+    versions = iter(["v2", "v3"])
+    registry = make_registry(model_file, lambda: FakeModel(next(versions)), clock)
+    old = registry.current()
+
+    # Unchanged file, or not yet time to check: nothing happens
+    assert registry.poll() is None
+    touch(model_file, 10**18)
+    assert registry.poll() is None
+
+    clock.now = 5.0
+    thread = registry.poll()
+    assert thread is not None
+    thread.join(timeout=5)
+
+    assert registry.current().version == "v2"
+    assert old.closed
+    stats = registry.stats()
+    assert stats["reloads"] == 1 and stats["version"] == "v2" and not stats["loading"]
+
+    clock.now = 10.0
+    assert registry.poll() is None
+
+
+def test_failed_reload_keeps_the_current_model(model_file, clock):
+    calls = []
+
+    def load():
+        calls.append(1)
+        raise RuntimeError("truncated file")
+
+    registry = make_registry(model_file, load, clock)
+    touch(model_file, 10**18)
+    clock.now = 5.0
+    registry.poll().join(timeout=5)
+
+    assert registry.current().version == "v1"
+    assert registry.stats()["failures"] == 1
+    assert "truncated" in registry.stats()["last_error"]
+
+    # Not retried until the file changes again
+    clock.now = 10.0
+    assert registry.poll() is None
+    assert len(calls) == 1
+
+
+def test_file_changing_during_load_is_retried(model_file, clock):
+    def load():
+        touch(model_file, 2 * 10**18)
+        return FakeModel("partial")
+
+    registry = make_registry(model_file, load, clock)
+    touch(model_file, 10**18)
+
+    assert registry.reload() is None
+    assert registry.current().version == "v1"
+
+
+def test_replaced_models_are_released(model_file, clock):
+    registry = make_registry(model_file, lambda: FakeModel("v2"), clock)
+    old = weakref.ref(registry.current())
+
+    touch(model_file, 10**18)
+    assert registry.reload().version == "v2"
+    gc.collect()
+    assert old() is None
+    assert registry.stats()["retired_alive"] == 0
+
+
+def test_late_calls_on_a_replaced_model_do_not_restart_its_thread(model_file, clock):
+    from sentiment.ml import SentimentModel
+
+    def load():
+        model = SentimentModel(model="dummy")
+        model.enable_inference_thread()
+        return model
+
+    registry = ModelRegistry(load(), load, model_file, clock=clock)
+    old = registry.current()
+    x = np.zeros((1, 140), dtype=np.int64)
+    old.predict(x)
+    worker = old.inference_thread._thread
+
+    touch(model_file, 10**18)
+    assert registry.reload() is not None
+    worker.join(timeout=5)
+
+    # A request that fetched the old model before the swap still gets an answer
+    scores, sentiment = old.predict(x)
+    assert len(scores) == len(sentiment) == 1
+    assert old.inference_thread.closed and old.inference_thread._thread is None
+    assert not worker.is_alive()
@@ -164,3 +164,60 @@ def test_favicon_fallback(client, monkeypatch):
     assert response.status_code == 200
     assert response.data == expected_data
 
+
+
+def test_debug_file_streams_with_validators(client):
+    """The debug file route streams from disk and honors ETag and Range requests."""
+    with open(os.path.join(current_app.static_folder, 'js', 'p5.js'), 'rb') as f:
+        body = f.read()
+
+    response = client.get('/debug/file/js/p5.js')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers['Content-Length'] == str(len(body))
+    assert 'javascript' in response.headers['Content-Type']
+    assert response.data == body
+
+    etag = response.headers['ETag']
+    assert client.get('/debug/file/js/p5.js', headers={'If-None-Match': etag}).status_code == 304
+
+    response = client.get('/debug/file/js/p5.js', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(body)}'
+    assert response.data == body[100:200]
+
+
+def test_debug_file_stays_inside_static(client):
+    assert client.get('/debug/file/js/missing.js').status_code == 404
+    assert client.get('/debug/file/..%2Fapp.py').status_code == 404
+
+
+def test_debug_css_route(app, client, monkeypatch, tmp_path):
+    css_dir = tmp_path / 'dist' / 'css'
+    css_dir.mkdir(parents=True)
+    (css_dir / 'main.css').write_text('body { color: red; }')
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+
+    for url in ('/debug/css/main.css', '/debug/css/dist/css/main.css'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/css'
+        assert response.data == b'body { color: red; }'
+    assert client.get('/debug/css/main.js').status_code == 400
+    assert client.get('/debug/css/other.css').status_code == 404
+
+
+def test_debug_static_filters_and_pages(client):
+    """The debug static listing pages through the index and filters it."""
+    data = client.get('/debug/static?prefix=js/&ext=js&limit=2').get_json()
+    assert data['limit'] == 2 and len(data['files']) == 2
+    assert data['total'] > 2 and data['next_offset'] == 2
+    assert all(f['path'].startswith('js/') and f['path'].endswith('.js') for f in data['files'])
+    assert data['files'][0]['url'].startswith('/static/')
+
+    rest = client.get(f"/debug/static?prefix=js/&ext=js&offset=2&limit={data['total']}").get_json()
+    assert len(rest['files']) == data['total'] - 2 and rest['next_offset'] is None
+
+    css = client.get('/debug/static?mime=text/css').get_json()
+    assert css['files'] and all(f['mime_type'] == 'text/css' for f in css['files'])
+    assert client.get('/debug/static?limit=100000').get_json()['limit'] == 1000
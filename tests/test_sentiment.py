@@ -1,5 +1,6 @@
 import pytest
 import json
+from sentiment.emojis import emojis
 from sentiment.ml import SentimentModel
 from sentiment.models import Tweet
 
@@ -63,4 +64,268 @@ def test_tweet_model(session):
     
     # Test retrieval
     retrieved = session.query(Tweet).filter_by(raw_tweet="Hello world! 😊").first()
-    assert retrieved.raw_tweet == "Hello world! 😊"
\ No newline at end of file
+    assert retrieved.raw_tweet == "Hello world! 😊"
+
+@pytest.fixture
+def dummy_sentiment_model(monkeypatch):
+    """Install a dummy-backed SentimentModel as the app's cached model."""
+    model = SentimentModel(model="dummy")
+    monkeypatch.setattr("app._sentiment_model", model)
+    return model
+
+def test_score_batch_matches_single_scores():
+    """Batch scoring returns one result per text, identical to score()."""
+    model = SentimentModel(model="dummy")
+    texts = ["I love this!", "We have to talk", ""]
+
+    results = model.score_batch(texts)
+
+    assert len(results) == len(texts)
+    for text, res in zip(texts, results):
+        assert res == model.score(text)
+    assert model.score_batch([]) == []
+
+def test_score_top_k_matches_full_scores():
+    """top_k keeps only the best emojis, best first, with their indices."""
+    model = SentimentModel(model="dummy")
+    texts = ["I love this!", "We have to talk", ""]
+
+    full = model.score(texts[0])
+    top = model.score(texts[0], top_k=5)
+    assert list(top["emoji"].values()) == sorted(full["emoji"].values(), reverse=True)[:5]
+    assert all(full["emoji"][e] == s for e, s in top["emoji"].items())
+    assert [emojis[i] for i in top["indices"]] == list(top["emoji"])
+    assert top["sentiment"] == full["sentiment"]
+
+    assert model.score_batch(texts, top_k=5) == [model.score(t, top_k=5) for t in texts]
+
+def test_sentiment_api_score_batch(client, dummy_sentiment_model):
+    """The batch endpoint accepts a JSON array and returns a list of results."""
+    response = client.post('/sentiment/api/score_batch',
+                           json=["Everything is beautiful", "I'm crying"])
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert isinstance(data, list)
+    assert len(data) == 2
+    for res in data:
+        assert isinstance(res["emoji"], dict)
+        assert isinstance(res["sentiment"], (int, float))
+
+    # The {"texts": [...]} form is accepted too
+    response = client.post('/sentiment/api/score_batch',
+                           json={"texts": ["We have to talk"]})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+
+def test_sentiment_api_score_batch_rejects_bad_input(client, dummy_sentiment_model):
+    """Malformed or oversized batches are rejected."""
+    response = client.post('/sentiment/api/score_batch', json={"text": "nope"})
+    assert response.status_code == 400
+
+    response = client.post('/sentiment/api/score_batch', json=["ok", 3])
+    assert response.status_code == 400
+
+    max_texts = client.application.config['SENTIMENT_MAX_BATCH_TEXTS']
+    response = client.post('/sentiment/api/score_batch',
+                           json=["x"] * (max_texts + 1))
+    assert response.status_code == 413
+
+def test_warm_up_records_phase_timings():
+    """Start-up phases are timed so preloading can be logged."""
+    model = SentimentModel(model="dummy")
+    assert set(model.timings) == {"load", "baseline"}
+
+    model.warm_up()
+    assert model.timings["warmup"] >= 0
+
+def test_app_engine_warmup_route(client, dummy_sentiment_model):
+    """The App Engine warmup handler loads and warms the model."""
+    response = client.get('/_ah/warmup')
+    assert response.status_code == 200
+    assert "warmup" in dummy_sentiment_model.timings
+
+def test_debug_route_reports_baseline_source(client, dummy_sentiment_model):
+    """The debug route shows where the normalization baseline came from."""
+    data = client.get('/debug/sentiment').get_json()
+    assert data["baseline"] == "computed"
+    assert data["baseline_fallbacks"] == SentimentModel.baseline_fallbacks
+
+def test_sentiment_stream_route(client, dummy_sentiment_model):
+    """Edits posted to a stream session come back as SSE score frames."""
+    response = client.get('/sentiment/api/stream?top_k=3&delta=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    chunks = iter(response.response)
+    session = json.loads(next(chunks).decode().split("data: ")[1])
+    assert session["top_k"] == 3 and session["delta"] is True
+
+    update = client.post(f'/sentiment/api/stream/{session["id"]}',
+                         json={"text": "We have to talk", "seq": 1})
+    assert update.status_code == 202
+
+    frame = json.loads(next(chunks).decode().split("data: ")[1])
+    assert frame["seq"] == 1
+    assert len(frame["emoji"]) == 3
+    response.close()
+
+def test_sentiment_stream_update_without_session(client, dummy_sentiment_model):
+    """Posts for a stream held by another worker are scored directly."""
+    response = client.post('/sentiment/api/stream/elsewhere', json={"text": "hi", "seq": 4})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["seq"] == 4
+    assert len(data["emoji"]) == client.application.config['SENTIMENT_STREAM_TOP_K']
+
+    response = client.post('/sentiment/api/stream/elsewhere',
+                           data={"text": "hi", "seq": "5", "top_k": "3"})
+    assert len(response.get_json()["emoji"]) == 3
+
+    response = client.post('/sentiment/api/stream/elsewhere', json={"seq": 4})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("payload", [
+    ["hi"],
+    {"text": "hi", "top_k": 0},
+    {"text": "hi", "top_k": "many"},
+    {"text": "hi", "top_k": True},
+])
+def test_sentiment_stream_update_rejects_bad_payloads(client, dummy_sentiment_model, payload):
+    """Non-object bodies and out-of-range top_k are 400s, not server errors or all emojis."""
+    response = client.post('/sentiment/api/stream/elsewhere', json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+@pytest.mark.parametrize("top_k", ["0", "-2", "x"])
+def test_sentiment_stream_rejects_bad_top_k(client, dummy_sentiment_model, top_k):
+    """A stream is not opened for a top_k the scoring routes would refuse."""
+    response = client.get(f'/sentiment/api/stream?top_k={top_k}')
+    assert response.status_code == 400
+
+def test_sentiment_stream_can_be_turned_off(client, dummy_sentiment_model, monkeypatch):
+    """Without SENTIMENT_STREAM both endpoints are gone and the page doesn't ask for them."""
+    page_cache = client.application.extensions["page_cache"]
+    page_cache.clear()
+    assert b'data-stream' in client.get('/sentiment').data
+
+    monkeypatch.setitem(client.application.config, 'SENTIMENT_STREAM', False)
+    page_cache.clear()
+    try:
+        assert client.get('/sentiment/api/stream').status_code == 404
+        assert client.post('/sentiment/api/stream/elsewhere', json={"text": "hi"}).status_code == 404
+        assert b'data-stream' not in client.get('/sentiment').data
+    finally:
+        page_cache.clear()
+
+def test_sentiment_stream_limit(client, dummy_sentiment_model, monkeypatch):
+    """Streams beyond the per-process limit are refused so clients fall back."""
+    from sentiment.streaming import StreamHub
+    monkeypatch.setattr("app._stream_hub", StreamHub(max_sessions=0))
+    assert client.get('/sentiment/api/stream').status_code == 503
+
+def test_sentiment_api_compact_formats(client, dummy_sentiment_model):
+    """Scores can be requested positionally, truncated to the top k."""
+    response = client.post('/sentiment/api/score?format=array&top_k=3',
+                           data={'text': 'I love this app!'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data["indices"]) == len(data["scores"]) == 3
+    assert data["sentiment"] == pytest.approx(0.7)
+
+    response = client.post('/sentiment/api/score_batch?format=f16', json=["a", "b"])
+    assert response.get_json()["shape"] == [2, len(emojis)]
+
+    response = client.post('/sentiment/api/score?top_k=2', data={'text': 'I love this app!'})
+    data = response.get_json()
+    assert list(data["emoji"]) == [emojis[i] for i in data["indices"]]
+    assert len(data["indices"]) == 2
+
+    response = client.post('/sentiment/api/score_batch?top_k=2', json=["a", "b"])
+    assert [len(res["emoji"]) for res in response.get_json()] == [2, 2]
+
+    response = client.post('/sentiment/api/score?format=yaml', data={'text': 'hi'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query", ["top_k=0", "top_k=-1", "top_k=x", "precision=-5", "precision=11"])
+def test_sentiment_api_rejects_bad_options(client, dummy_sentiment_model, query):
+    """Out-of-range top_k and precision are errors, not empty or zeroed scores."""
+    response = client.post(f'/sentiment/api/score?format=array&{query}', data={'text': 'hi'})
+    assert response.status_code == 400
+    assert query.split("=")[0] in response.get_json()["error"]
+
+    response = client.post(f'/sentiment/api/score_batch?{query}', json=["a"])
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("fmt", ["dict", "f16", "msgpack"])
+def test_sentiment_api_precision_only_applies_to_arrays(client, dummy_sentiment_model, fmt):
+    """precision would be silently ignored by the other formats, so it is refused."""
+    response = client.post(f'/sentiment/api/score?format={fmt}&precision=2', data={'text': 'hi'})
+    assert response.status_code == 400
+    assert "precision" in response.get_json()["error"]
+
+def test_sentiment_api_empty_batch(client, dummy_sentiment_model, monkeypatch):
+    """An empty batch is answered without running the model."""
+    from sentiment.metrics import metrics
+    failures = metrics.count("sentiment_score_failures_total")
+
+    def no_predict(*args, **kwargs):
+        raise AssertionError("the model ran on an empty batch")
+
+    monkeypatch.setattr(dummy_sentiment_model, "score_arrays", no_predict)
+    monkeypatch.setattr(dummy_sentiment_model, "predict", no_predict)
+
+    response = client.post('/sentiment/api/score_batch?format=array', json=[])
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["scores"] == [] and data["sentiment"] == []
+    assert client.post('/sentiment/api/score_batch?format=f16', json=[]).get_json()["shape"] == [0, len(emojis)]
+    assert client.post('/sentiment/api/score_batch', json=[]).get_json() == []
+    assert metrics.count("sentiment_score_failures_total") == failures
+
+
+def test_sentiment_emoji_vocabulary(client):
+    """The vocabulary for positional formats is cacheable and versioned."""
+    response = client.get('/sentiment/api/emojis')
+    assert response.status_code == 200
+    assert response.get_json()["emojis"] == emojis
+    assert response.cache_control.max_age == 86400
+
+    etag = response.headers["ETag"]
+    response = client.get('/sentiment/api/emojis', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+def test_hot_reload_swaps_model_version(client, dummy_sentiment_model, monkeypatch, tmp_path):
+    """Responses carry the version of the model that served them, across a reload."""
+    from sentiment.registry import ModelRegistry
+    path = tmp_path / "model.h5"
+    path.write_bytes(b"v1")
+    dummy_sentiment_model.version = "v1"
+    registry = ModelRegistry(dummy_sentiment_model, lambda: replacement, str(path))
+    monkeypatch.setattr("app._model_registry", registry)
+
+    response = client.post('/sentiment/api/score', data={'text': 'hi'})
+    assert response.headers["X-Model-Version"] == "v1"
+
+    replacement = SentimentModel(model="dummy")
+    replacement.version = "v2"
+    registry.reload()
+    response = client.post('/sentiment/api/score', data={'text': 'hi'})
+    assert response.headers["X-Model-Version"] == "v2"
+    assert client.get('/debug/sentiment').get_json()["registry"]["reloads"] == 1
+    assert "X-Model-Version" not in client.get('/about').headers
+
+def test_score_timings_and_metrics(client, dummy_sentiment_model):
+    """Scoring reports per-phase timings and feeds the /metrics histograms."""
+    dummy_sentiment_model.enable_cache()
+    response = client.post('/sentiment/api/score', data={'text': 'I love this app!'})
+    timing = response.headers["Server-Timing"]
+    for name in ("parse", "featurize", "predict", "normalize", "serialize", "total"):
+        assert f"{name};dur=" in timing
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'sentiment_request_seconds_count{route="sentiment_score"}' in text
+    assert 'sentiment_phase_seconds_bucket{route="sentiment_score",phase="predict",le="+Inf"}' in text
+    assert "sentiment_cache_misses 1" in text
+    assert 'sentiment_model_info{baseline="computed",version="none"} 1' in text
@@ -0,0 +1,84 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from sentiment.emojis import emojis
+from sentiment.serializers import (VOCABULARY_VERSION, encode_scores, negotiate,
+                                   top_k_indices, vocabulary)
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+@pytest.fixture
+def scores():
+    rng = np.random.default_rng(0)
+    return rng.random((3, len(emojis))), np.array([0.1, 0.5, 0.9])
+
+
+def test_negotiate():
+    assert negotiate() == "dict"
+    assert negotiate("array") == "array"
+    assert negotiate("xml") is None
+    assert negotiate(accept="application/msgpack, */*") == "msgpack"
+
+
+def test_top_k_indices_are_sorted_best_first(scores):
+    s, _ = scores
+    idx = top_k_indices(s, 5)
+    np.testing.assert_array_equal(idx, np.argsort(-s, axis=1)[:, :5])
+    assert top_k_indices(s, 200).shape == (3, len(emojis))
+
+
+def test_dict_format_matches_score_dicts(scores):
+    s, sentiment = scores
+    body, mimetype = encode_scores(s, sentiment, "dict", single=False)
+    rows = json.loads(body)
+    assert mimetype == "application/json"
+    assert rows[1]["emoji"] == dict(zip(emojis, s[1].tolist()))
+    assert rows[1]["sentiment"] == 0.5
+    # Emojis are sent as UTF-8, not escaped
+    assert emojis[0] in body
+
+
+def test_array_format_is_positional_and_rounded(scores):
+    s, sentiment = scores
+    payload = json.loads(encode_scores(s[:1], sentiment[:1], "array", precision=2)[0])
+    assert payload["version"] == VOCABULARY_VERSION
+    assert payload["scores"] == np.round(s[0], 2).tolist()
+    assert payload["sentiment"] == 0.1
+
+    payload = json.loads(encode_scores(s, sentiment, "array", top_k=3, single=False)[0])
+    assert payload["indices"] == top_k_indices(s, 3).tolist()
+    assert payload["scores"][0][0] == round(s[0].max(), 4)
+
+
+def test_f16_format_round_trips(scores):
+    s, sentiment = scores
+    payload = json.loads(encode_scores(s, sentiment, "f16", single=False)[0])
+    decoded = np.frombuffer(base64.b64decode(payload["scores_f16"]), dtype="<f2")
+    np.testing.assert_allclose(decoded.reshape(payload["shape"]), s, atol=1e-3)
+
+
+def test_msgpack_format(scores):
+    msgpack = pytest.importorskip("msgpack")
+    s, sentiment = scores
+    body, mimetype = encode_scores(s[:1], sentiment[:1], "msgpack")
+    payload = msgpack.unpackb(body)
+    assert mimetype == "application/msgpack"
+    np.testing.assert_allclose(payload["scores"], s[0], rtol=1e-6)
+
+
+def test_compact_formats_are_smaller(scores):
+    s, sentiment = scores
+    sizes = {fmt: len(encode_scores(s[:1], sentiment[:1], fmt)[0].encode("utf-8"))
+             for fmt in ("dict", "array", "f16")}
+    assert sizes["array"] < sizes["dict"] / 2
+    assert sizes["f16"] < sizes["array"]
+
+
+def test_vocabulary():
+    data = vocabulary()
+    assert data["emojis"] == emojis
+    assert len(data["sentiment_class"]) == len(emojis)
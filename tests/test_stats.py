@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from sentiment.emojis import emojis, positive_emojis
+from sentiment.feature_store import FeatureStore
+from sentiment.ml import SentimentModel
+from sentiment.numpy_model import NumpyLSTMModel
+from sentiment.stats import STATS_FILE, compute_stats, emoji_priors, load_stats, write_stats
+from tests.test_numpy_model import random_weights
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+HAPPY = positive_emojis[0]
+
+
+class CountingModel(NumpyLSTMModel):
+    calls = 0
+
+    def predict(self, x, **kwargs):
+        CountingModel.calls += 1
+        return super().predict(x, **kwargs)
+
+
+@pytest.fixture
+def model_dir(app, tmp_path, monkeypatch):
+    """A data directory with a fake model.h5, served by a small NumPy model."""
+    (tmp_path / "model.h5").write_bytes(b"weights v1")
+    monkeypatch.setattr("sentiment.ml.data_path", lambda *parts: str(tmp_path.joinpath(*parts)))
+    monkeypatch.setattr(SentimentModel, "_load_numpy_model",
+                        lambda self: CountingModel(random_weights()))
+    with app.app_context():
+        yield tmp_path
+
+
+def test_emoji_priors_from_texts_and_store(tmp_path):
+    texts = ["a " + HAPPY, "b", "c " + HAPPY + HAPPY, "d"]
+    priors, rows = emoji_priors(texts=texts)
+    assert rows == 4
+    assert priors[emojis.index(HAPPY)] == 0.5
+    assert priors.sum() == 0.5
+
+    store = FeatureStore(str(tmp_path / "features"))
+    store.append([1, 2, 3, 4], texts)
+    np.testing.assert_array_equal(emoji_priors(store=store)[0], priors)
+
+    assert emoji_priors(texts=[]) == (None, 0)
+
+
+def test_stats_are_tied_to_the_model_file(tmp_path):
+    h5_path = tmp_path / "model.h5"
+    h5_path.write_bytes(b"weights v1")
+    path = str(tmp_path / STATS_FILE)
+
+    stats = write_stats(path, compute_stats(NumpyLSTMModel(random_weights()), str(h5_path)))
+    assert load_stats(path, str(h5_path)) == stats
+    assert len(stats["baseline"]) == len(emojis)
+
+    h5_path.write_bytes(b"retrained weights")
+    assert load_stats(path, str(h5_path)) is None
+    assert load_stats(str(tmp_path / "missing.json"), str(h5_path)) is None
+
+
+def test_stored_baseline_skips_predict_at_startup(model_dir):
+    model = SentimentModel(model="numpy")
+    assert model.baseline_source == "computed"
+    stats = model.export_stats(texts=["hi " + HAPPY, "there"])
+
+    CountingModel.calls = 0
+    model = SentimentModel(model="numpy")
+
+    assert CountingModel.calls == 0
+    assert model.baseline_source == "stats"
+    np.testing.assert_array_equal(model.baseline, [stats["baseline"]])
+    assert model.emoji_priors[emojis.index(HAPPY)] == 0.5
+
+    # Replacing model.h5 makes the stored stats stale
+    (model_dir / "model.h5").write_bytes(b"retrained weights")
+    assert SentimentModel(model="numpy").baseline_source == "computed"
+
+
+def test_failed_baseline_is_counted():
+    class Broken:
+        def predict(self, x):
+            raise RuntimeError("no weights")
+
+    before = SentimentModel.baseline_fallbacks
+    model = SentimentModel(model=Broken())
+
+    assert model.baseline_source == "fallback"
+    np.testing.assert_array_equal(model.baseline, np.ones((1, len(emojis))))
+    assert SentimentModel.baseline_fallbacks == before + 1
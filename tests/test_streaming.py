@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from sentiment.streaming import StreamHub, build_frame, event_stream, top_emojis
+
+pytestmark = [pytest.mark.sentiment, pytest.mark.unit]
+
+
+def parse(message):
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def fake_score(text):
+    return {"emoji": {"a": len(text) / 10, "b": 0.5, "c": 0.1}, "sentiment": 0.25}
+
+
+def test_top_emojis():
+    scores = {"a": 0.1, "b": 0.9, "c": 0.5}
+    assert top_emojis(scores, 2) == {"b": 0.9, "c": 0.5}
+    assert top_emojis(scores, 0) == scores
+
+
+def test_delta_frames_only_send_changes():
+    frame, state = build_frame(1, fake_score(""), top_k=2)
+    assert frame == {"seq": 1, "sentiment": 0.25, "emoji": {"b": 0.5, "c": 0.1}}
+
+    frame, state = build_frame(2, fake_score("xxxxxxxx"), top_k=2, previous=state)
+    assert frame["emoji"] == {"a": 0.8}
+    assert frame["drop"] == ["c"]
+    assert state == {"a": 0.8, "b": 0.5}
+
+
+def test_stream_scores_only_the_newest_text():
+    hub = StreamHub()
+    session = hub.open()
+
+    def score(text):
+        if text == "old":
+            # Newer text arrives while the model is busy with this one
+            session.push("newest")
+        return fake_score(text)
+
+    stream = event_stream(hub, session, score, heartbeat=1)
+    assert parse(next(stream)) == ("session", {"id": session.id, "top_k": 0, "delta": False})
+
+    session.push("older", seq=1)
+    session.push("old", seq=2)
+    session.push("stale", seq=1)
+
+    event, frame = parse(next(stream))
+    assert event == "score"
+    assert frame["seq"] == 3
+    assert frame["emoji"]["a"] == pytest.approx(0.6)
+    assert hub.stats()["dropped"] == 1
+
+    stream.close()
+    assert hub.stats()["open"] == 0
+
+
+def test_hub_rejects_sessions_over_the_limit():
+    hub = StreamHub(max_sessions=1)
+    session = hub.open()
+    assert hub.open() is None
+    hub.close(session)
+    assert hub.open() is not None
+    assert hub.stats()["rejected"] == 1